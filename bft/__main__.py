@@ -0,0 +1,5 @@
+import sys
+
+from bft.cli import main
+
+sys.exit(main())
@@ -0,0 +1,244 @@
+import contextlib
+import importlib
+import io
+import json
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Tuple
+
+from bft.cases.parser import CaseFileParser
+from bft.cases.types import Case
+from bft.core.index_parser import load_index
+from bft.dialects.loader import load_dialects
+from bft.dialects.parser import DialectFileParser
+from bft.dialects.types import DialectsLibrary
+from bft.html.builder import build_site
+from bft.substrait.extension_file_parser import (
+    ExtensionFileParser,
+    LibraryBuilder,
+    add_extensions_file_to_library,
+)
+from bft.supplements.parser import load_supplements
+from tools.generate_corpus.generate_corpus import (
+    EVALUABLE_DIALECTS,
+    TEMPLATES,
+    Corpus,
+    CorpusSpec,
+    generate_corpus,
+)
+
+# Runners benchmarked when their engine is installed, dialect -> runner class
+RUNNERS = {
+    "sqlite": "bft.testers.sqlite.runner.SqliteRunner",
+    "duckdb": "bft.testers.duckdb.runner.DuckDBRunner",
+    "datafusion": "bft.testers.datafusion.runner.DatafusionRunner",
+}
+
+
+def benchmark_spec(size: int, cases_per_function: int, seed: int = 0) -> CorpusSpec:
+    """An evaluable corpus with size copies of each template function"""
+    return CorpusSpec(
+        functions=size * len(TEMPLATES),
+        groups_per_function=1,
+        cases_per_group=cases_per_function,
+        dialects=len(EVALUABLE_DIALECTS),
+        seed=seed,
+        evaluable=True,
+    )
+
+
+class BenchmarkResult(NamedTuple):
+    stage: str
+    size: int
+    items: int
+    seconds: float
+
+    @property
+    def items_per_second(self) -> float:
+        if self.seconds == 0:
+            return float("inf")
+        return self.items / self.seconds
+
+
+class Regression(NamedTuple):
+    stage: str
+    size: int
+    baseline_seconds: float
+    seconds: float
+
+
+# A stage takes a corpus and returns the workload to time and how many items
+# (files, functions, cases...) one run of it processes
+Stage = Callable[[Corpus], Tuple[Callable[[], object], int]]
+
+
+def parse_cases(corpus: Corpus) -> List[Case]:
+    parser = CaseFileParser()
+    cases = []
+    for case_path in corpus.case_paths:
+        with open(case_path, "rb") as case_f:
+            for case_file in parser.parse(case_f):
+                cases.extend(case_file.cases)
+    return cases
+
+
+def index_stage(corpus: Corpus):
+    return lambda: load_index(corpus.index_path), 1
+
+
+def extensions_stage(corpus: Corpus):
+    def parse_extensions():
+        library_builder = LibraryBuilder()
+        for path in corpus.extension_paths:
+            with open(path, "rb") as f:
+                add_extensions_file_to_library(
+                    path, ExtensionFileParser().parse(f), library_builder
+                )
+        return library_builder.finish()
+
+    return parse_extensions, corpus.num_functions
+
+
+def cases_stage(corpus: Corpus):
+    return lambda: parse_cases(corpus), corpus.num_cases
+
+
+def dialects_stage(corpus: Corpus):
+    return lambda: load_dialects(corpus.dialects_dir), len(corpus.dialects)
+
+
+def mapping_stage(corpus: Corpus):
+    cases = parse_cases(corpus)
+    parser = DialectFileParser()
+    dialect_files = []
+    for dialect_path in sorted(corpus.dialects_dir.glob("*.yaml")):
+        with open(dialect_path, "rb") as dialect_f:
+            dialect_files.extend(parser.parse(dialect_f))
+
+    def map_cases():
+        # A new library every run, dialects cache the mappings they looked up
+        library = DialectsLibrary(dialect_files)
+        for dialect in library.dialects.values():
+            for case in cases:
+                dialect.mapping_for_case(case)
+
+    return map_cases, len(cases) * len(dialect_files)
+
+
+def supplements_stage(corpus: Corpus):
+    return lambda: load_supplements(corpus.supplements_dir), corpus.num_functions
+
+
+def site_stage(corpus: Corpus):
+    def render_site():
+        with tempfile.TemporaryDirectory() as dest_dir:
+            # build_site reports every page it creates
+            with contextlib.redirect_stdout(io.StringIO()):
+                build_site(corpus.index_path, dest_dir)
+
+    return render_site, corpus.num_functions + 1
+
+
+def runner_stage(dialect_name: str) -> Stage:
+    def stage(corpus: Corpus):
+        module_name, class_name = RUNNERS[dialect_name].rsplit(".", 1)
+        runner_type = getattr(importlib.import_module(module_name), class_name)
+        cases = parse_cases(corpus)
+        dialect = load_dialects(corpus.dialects_dir).get_dialect_by_name(dialect_name)
+
+        def run_cases():
+            runner = runner_type(dialect)
+            runner.batch_cases(cases)
+            for case in cases:
+                runner.run_case(case)
+
+        return run_cases, len(cases)
+
+    return stage
+
+
+STAGES: Dict[str, Stage] = {
+    "index": index_stage,
+    "extensions": extensions_stage,
+    "cases": cases_stage,
+    "dialects": dialects_stage,
+    "mapping": mapping_stage,
+    "supplements": supplements_stage,
+    "site": site_stage,
+    **{f"runner_{name}": runner_stage(name) for name in RUNNERS},
+}
+
+
+def time_workload(workload: Callable[[], object], repeat: int) -> float:
+    """Returns the best wall time of repeat runs of workload"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        workload()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_benchmarks(
+    stages: List[str],
+    sizes: List[int],
+    cases_per_function: int = 20,
+    repeat: int = 3,
+    seed: int = 0,
+) -> List[BenchmarkResult]:
+    """
+    Times each stage on a synthetic corpus of each size
+
+    The size is the number of copies of each template function in the corpus.
+    Runner stages whose engine isn't installed are skipped.
+    """
+    results = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as corpus_dir:
+            corpus = generate_corpus(corpus_dir, benchmark_spec(size, cases_per_function, seed))
+            for stage in stages:
+                try:
+                    workload, items = STAGES[stage](corpus)
+                except ImportError as err:
+                    print(f"Skipping {stage}: {err}")
+                    continue
+                seconds = time_workload(workload, repeat)
+                results.append(BenchmarkResult(stage, size, items, seconds))
+    return results
+
+
+def save_baseline(path: str | Path, results: List[BenchmarkResult]):
+    with open(path, "w") as f:
+        json.dump([result._asdict() for result in results], f, indent=2)
+
+
+def load_baseline(path: str | Path) -> List[BenchmarkResult]:
+    with open(path) as f:
+        return [BenchmarkResult(**result) for result in json.load(f)]
+
+
+def find_regressions(
+    results: List[BenchmarkResult],
+    baseline: List[BenchmarkResult],
+    tolerance: float,
+) -> List[Regression]:
+    """
+    Returns the results that are more than tolerance (a fraction) slower than the
+    baseline for the same stage and corpus
+
+    Results the baseline has no entry for are not compared.
+    """
+    # The number of items tells corpora of the same size but with a different
+    # number of cases per function apart
+    baseline_seconds = {
+        (result.stage, result.size, result.items): result.seconds for result in baseline
+    }
+    regressions = []
+    for result in results:
+        expected = baseline_seconds.get((result.stage, result.size, result.items), None)
+        if expected is not None and result.seconds > expected * (1 + tolerance):
+            regressions.append(
+                Regression(result.stage, result.size, expected, result.seconds)
+            )
+    return regressions
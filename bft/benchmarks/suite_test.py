@@ -0,0 +1,54 @@
+from bft.benchmarks.suite import (
+    BenchmarkResult,
+    Regression,
+    benchmark_spec,
+    find_regressions,
+    load_baseline,
+    parse_cases,
+    run_benchmarks,
+    save_baseline,
+)
+from bft.dialects.loader import load_dialects
+from bft.testers.sqlite.runner import SqliteRunner
+from tools.generate_corpus.generate_corpus import generate_corpus
+
+
+def test_generated_cases_pass(tmp_path):
+    corpus = generate_corpus(tmp_path, benchmark_spec(2, 5))
+    cases = parse_cases(corpus)
+    assert len(cases) == corpus.num_cases
+
+    dialect = load_dialects(corpus.dialects_dir).get_dialect_by_name("sqlite")
+    runner = SqliteRunner(dialect)
+    runner.batch_cases(cases)
+    results = [runner.run_case(case) for case in cases]
+    assert all(result.passed and result.expected_pass for result in results)
+
+
+def test_run_benchmarks():
+    results = run_benchmarks(["index", "cases", "site"], [1, 2], 2, repeat=1)
+    assert [(result.stage, result.size) for result in results] == [
+        ("index", 1),
+        ("cases", 1),
+        ("site", 1),
+        ("index", 2),
+        ("cases", 2),
+        ("site", 2),
+    ]
+    assert results[4].items == 2 * results[1].items
+
+
+def test_baseline_regressions(tmp_path):
+    baseline = [
+        BenchmarkResult("cases", 1, 80, 1.0),
+        BenchmarkResult("site", 1, 5, 1.0),
+    ]
+    save_baseline(tmp_path / "baseline.json", baseline)
+    assert load_baseline(tmp_path / "baseline.json") == baseline
+
+    results = [
+        BenchmarkResult("cases", 1, 80, 1.1),
+        BenchmarkResult("site", 1, 5, 1.5),
+        BenchmarkResult("index", 1, 1, 9.0),
+    ]
+    assert find_regressions(results, baseline, 0.2) == [Regression("site", 1, 1.0, 1.5)]
@@ -0,0 +1,193 @@
+import asyncio
+import sys
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Set
+
+from bft.dialects.types import Dialect, SqlMapping
+
+from .cache import source_version
+from .runner import (
+    CaseResult,
+    CaseRunner,
+    SqlCaseResult,
+    case_result,
+    unsupported_function_result,
+)
+from .timing import CaseTimings, case_timings
+from .types import Case
+
+
+class ConnectionPool(object):
+    """
+    A pool of at most size connections, each used by one case at a time
+
+    Connections are opened with connect the first time they are needed and kept
+    open until close is called.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Awaitable[Any]],
+        size: int,
+        close_connection: Callable[[Any], Awaitable[None]] = None,
+    ):
+        self.size = size
+        self.__connect = connect
+        self.__close_connection = close_connection
+        self.__idle: asyncio.LifoQueue = None
+        self.__slots: asyncio.Semaphore = None
+        self.__connections: List[Any] = []
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[Any]:
+        if self.__slots is None:
+            # Created here so that they belong to the running event loop
+            self.__slots = asyncio.Semaphore(self.size)
+            self.__idle = asyncio.LifoQueue()
+        async with self.__slots:
+            if self.__idle.empty():
+                conn = await self.__connect()
+                self.__connections.append(conn)
+            else:
+                conn = self.__idle.get_nowait()
+            try:
+                yield conn
+            finally:
+                self.__idle.put_nowait(conn)
+
+    async def close(self):
+        if self.__close_connection is not None:
+            for conn in self.__connections:
+                await self.__close_connection(conn)
+        self.__connections = []
+        self.__idle = None
+        self.__slots = None
+
+
+class AsyncSqlCaseRunner(ABC):
+    """
+    The contract of SqlCaseRunner for engines that are waited on over the network
+
+    While one case waits for a reply other cases can be sent, see run_cases_async.
+    Results are classified, and cases timed, exactly like SqlCaseRunner.run_case
+    does.  Each case is timed in its own task, see CaseTimings.
+    """
+
+    def __init__(self, dialect: Dialect):
+        self.dialect = dialect
+        # Runners mark the phases of a case with self.timings.phase
+        self.timings: CaseTimings = case_timings
+
+    @abstractmethod
+    async def run_sql_case(self, case: Case, mapping: SqlMapping) -> SqlCaseResult:
+        pass
+
+    async def run_case(self, case: Case) -> CaseResult:
+        self.timings.start_case(self.dialect.name, case.function, case.group.id, "mapping")
+        try:
+            return await self.__run_case(case)
+        finally:
+            self.timings.end_case()
+
+    async def __run_case(self, case: Case) -> CaseResult:
+        mapping = self.dialect.mapping_for_case(case)
+        self.timings.phase("execute")
+        if mapping is None:
+            return unsupported_function_result(self.dialect, case)
+        return case_result(case, mapping, await self.run_sql_case(case, mapping))
+
+    def cache_version(self) -> str:
+        """See CaseRunner.cache_version"""
+        return f"{type(self).__name__} " + source_version(
+            sys.modules[type(self).__module__],
+            sys.modules[__name__],
+            sys.modules[CaseRunner.__module__],
+        )
+
+    async def close(self):
+        pass
+
+
+async def run_cases_async(
+    runner: AsyncSqlCaseRunner, cases: List[Case], in_flight: int
+) -> List[CaseResult | Exception]:
+    """
+    Runs cases with at most in_flight of them running at any time
+
+    Returns the results in the order of cases.  A case that raised gets the
+    exception as its result, it doesn't stop the other cases.
+    """
+    results: List[CaseResult | Exception] = [None] * len(cases)
+    next_idx = 0
+
+    async def worker():
+        nonlocal next_idx
+        while next_idx < len(cases):
+            idx = next_idx
+            next_idx += 1
+            try:
+                results[idx] = await runner.run_case(cases[idx])
+            except Exception as err:
+                results[idx] = err
+
+    await asyncio.gather(*(worker() for _ in range(max(1, min(in_flight, len(cases))))))
+    return results
+
+
+class ConcurrentCaseRunner(CaseRunner):
+    """
+    Runs an AsyncSqlCaseRunner behind the synchronous CaseRunner interface
+
+    The cases registered with batch_cases are all run, in_flight at a time, the
+    first time run_case is asked for one of them.  The results are then handed out
+    one at a time like those of a batching SqlCaseRunner.
+    """
+
+    def __init__(self, runner: AsyncSqlCaseRunner, in_flight: int):
+        self.runner = runner
+        self.in_flight = in_flight
+        # The async connections belong to the loop they were opened in, so every
+        # case runs in this one
+        self.__loop = asyncio.new_event_loop()
+        self.__pending: List[Case] = []
+        self.__pending_ids: Set[int] = set()
+        # id(case) -> result computed with the pending cases but not yet claimed
+        self.__results: Dict[int, CaseResult | Exception] = {}
+
+    def batch_cases(self, cases: List[Case]):
+        for case in cases:
+            # Unsupported functions are left to run_case, under pytest looking
+            # up their mapping skips the test
+            if self.runner.dialect.supports_function(case):
+                self.__pending.append(case)
+                self.__pending_ids.add(id(case))
+
+    def __run_pending(self):
+        cases = self.__pending
+        self.__pending = []
+        self.__pending_ids = set()
+        results = self.__loop.run_until_complete(
+            run_cases_async(self.runner, cases, self.in_flight)
+        )
+        for case, result in zip(cases, results):
+            self.__results[id(case)] = result
+
+    def run_case(self, case: Case) -> CaseResult:
+        if id(case) in self.__pending_ids:
+            self.__run_pending()
+        if id(case) in self.__results:
+            result = self.__results.pop(id(case))
+        else:
+            result = self.__loop.run_until_complete(self.runner.run_case(case))
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def cache_version(self) -> str:
+        # The results come from the wrapped runner, its code and mode decide them
+        return self.runner.cache_version()
+
+    def close(self):
+        self.__loop.run_until_complete(self.runner.close())
+        self.__loop.close()
@@ -0,0 +1,139 @@
+import asyncio
+
+import pytest
+
+from bft.cases.async_runner import (
+    AsyncSqlCaseRunner,
+    ConcurrentCaseRunner,
+    ConnectionPool,
+    run_cases_async,
+)
+from bft.cases.runner import SqlCaseResult, SqlCaseRunner
+from bft.cases.timing import CaseTimings
+from bft.cases.types import Case, CaseGroup, CaseLiteral
+from bft.dialects.types import SqlMapping
+
+MAPPING = SqlMapping("f", False, False, False, False, False, False, True, None)
+
+
+class FakeDialect(object):
+    name = "fake"
+
+    def supports_function(self, case: Case) -> bool:
+        return case.function == "f"
+
+    def mapping_for_case(self, case: Case) -> SqlMapping:
+        return MAPPING if self.supports_function(case) else None
+
+
+def evaluate(case: Case) -> SqlCaseResult:
+    value = case.args[0].value
+    if value == "raise":
+        raise Exception("connection lost")
+    if value == "error":
+        return SqlCaseResult.error("division by zero")
+    if value == case.result.value:
+        return SqlCaseResult.success()
+    return SqlCaseResult.mismatch(value)
+
+
+class FakeDriver(object):
+    """An engine that answers each case after a delay, counting the cases in flight"""
+
+    def __init__(self):
+        self.connections = 0
+        self.active = 0
+        self.max_active = 0
+
+    async def connect(self):
+        self.connections += 1
+        return self
+
+
+class FakeAsyncRunner(AsyncSqlCaseRunner):
+    def __init__(self, dialect, driver: FakeDriver, connections: int):
+        super().__init__(dialect)
+        self.driver = driver
+        self.pool = ConnectionPool(driver.connect, connections)
+
+    async def run_sql_case(self, case: Case, mapping: SqlMapping) -> SqlCaseResult:
+        self.timings.phase("setup")
+        async with self.pool.connection() as driver:
+            self.timings.phase("query")
+            driver.active += 1
+            driver.max_active = max(driver.max_active, driver.active)
+            try:
+                await asyncio.sleep(0.001)
+                return evaluate(case)
+            finally:
+                driver.active -= 1
+
+
+class FakeSyncRunner(SqlCaseRunner):
+    def run_sql_case(self, case: Case, mapping: SqlMapping) -> SqlCaseResult:
+        return evaluate(case)
+
+
+def make_case(function: str, value: str, expected: str = "x") -> Case:
+    return Case(
+        function,
+        "uri",
+        CaseGroup("basic", ""),
+        [CaseLiteral(value, "string")],
+        CaseLiteral(expected, "string"),
+        [],
+    )
+
+
+CASES = [make_case("f", "x") for _ in range(10)] + [
+    make_case("f", "y"),
+    make_case("f", "error"),
+    make_case("g", "x"),
+]
+
+
+def test_run_cases_async_bounds_cases_in_flight():
+    driver = FakeDriver()
+    runner = FakeAsyncRunner(FakeDialect(), driver, connections=3)
+    results = asyncio.run(run_cases_async(runner, CASES, in_flight=4))
+
+    sync_runner = FakeSyncRunner(FakeDialect())
+    assert results == [sync_runner.run_case(case) for case in CASES]
+    assert driver.connections == 3
+    assert driver.max_active == 3
+
+
+def test_concurrent_case_runner():
+    driver = FakeDriver()
+    runner = ConcurrentCaseRunner(FakeAsyncRunner(FakeDialect(), driver, connections=2), 2)
+    cases = CASES + [make_case("f", "raise")]
+    runner.batch_cases(cases)
+
+    sync_runner = FakeSyncRunner(FakeDialect())
+    for case in CASES:
+        assert runner.run_case(case) == sync_runner.run_case(case)
+    with pytest.raises(Exception, match="connection lost"):
+        runner.run_case(cases[-1])
+    assert driver.max_active == 2
+    runner.close()
+
+
+def test_cases_in_flight_are_timed_separately():
+    runner = FakeAsyncRunner(FakeDialect(), FakeDriver(), connections=3)
+    runner.timings = CaseTimings(enabled=True)
+    asyncio.run(run_cases_async(runner, CASES, in_flight=4))
+
+    # The phases of cases waiting on each other don't end one another
+    assert len(runner.timings.case_timings()) == len(CASES)
+    calls = {
+        (timing.function, timing.phase): timing.calls
+        for timing in runner.timings.phase_timings()
+    }
+    assert calls == {
+        ("f", "mapping"): 12,
+        ("f", "execute"): 12,
+        ("f", "setup"): 12,
+        ("f", "query"): 12,
+        ("g", "mapping"): 1,
+        ("g", "execute"): 1,
+    }
@@ -0,0 +1,137 @@
+import hashlib
+import os
+import pickle
+from pathlib import Path
+from typing import List
+
+import bft.cases.parser
+import bft.cases.types
+import bft.core.yaml_parser
+
+from .parser import CaseFileParser
+from .types import CaseFile
+
+# Any change to these modules can change what a case file parses to
+PARSER_MODULES = [bft.cases.parser, bft.cases.types, bft.core.yaml_parser]
+
+# Most parsed case files kept, set BFT_CACHE_MAX_ENTRIES to change it
+DEFAULT_MAX_ENTRIES = 50000
+
+
+def default_cache_dir() -> Path:
+    cache_dir = os.environ.get("BFT_CACHE_DIR", None)
+    if cache_dir is not None:
+        return Path(cache_dir)
+    return Path(__file__).parent.parent.parent / ".bft_cache"
+
+
+def source_version(*modules) -> str:
+    """A hash of the source of modules, so results are dropped when a runner changes"""
+    hasher = hashlib.sha256()
+    for module in modules:
+        with open(module.__file__, "rb") as f:
+            hasher.update(f.read())
+    return hasher.hexdigest()
+
+
+def parser_version() -> bytes:
+    """A hash of the parser source, so cached entries are dropped when the parser changes"""
+    hasher = hashlib.sha256()
+    for module in PARSER_MODULES:
+        with open(module.__file__, "rb") as f:
+            hasher.update(f.read())
+    return hasher.digest()
+
+
+class CaseFileCache(object):
+    """
+    On-disk cache of parsed case files
+
+    Entries are keyed by a hash of the file content and of the parser version and
+    hold the pickled CaseFile objects.  A file whose content changed simply misses
+    the cache and is re-parsed on its own.
+
+    The entry of the old content is left behind, so once there are more than
+    max_entries entries the least recently used ones are removed, see prune.
+    """
+
+    def __init__(self, cache_dir: str | Path = None, max_entries: int = None):
+        if cache_dir is None:
+            cache_dir = default_cache_dir()
+        if max_entries is None:
+            max_entries = int(os.environ.get("BFT_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+        self.cache_dir = Path(cache_dir) / "cases"
+        self.max_entries = max_entries
+        self.__parser = CaseFileParser()
+        self.__parser_version = parser_version()
+        # Entries in cache_dir, counted the first time one is written
+        self.__num_entries: int = None
+
+    def __entry_path(self, content: bytes) -> Path:
+        key = hashlib.sha256(self.__parser_version + content).hexdigest()
+        return self.cache_dir / f"{key}.pickle"
+
+    def __read_entry(self, entry_path: Path) -> List[CaseFile]:
+        try:
+            with open(entry_path, "rb") as entry_f:
+                case_files = pickle.load(entry_f)
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            # Corrupt or written by an incompatible version, re-parse
+            return None
+        try:
+            # The modification time marks when the entry was last used, see prune
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return case_files
+
+    def __write_entry(self, entry_path: Path, case_files: List[CaseFile]):
+        tmp_path = entry_path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "wb") as entry_f:
+                pickle.dump(case_files, entry_f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, entry_path)
+        except OSError:
+            # The cache is an optimization, a read-only checkout still works
+            tmp_path.unlink(missing_ok=True)
+            return
+        if self.__num_entries is None:
+            self.__num_entries = sum(1 for _ in self.cache_dir.glob("*.pickle"))
+        else:
+            self.__num_entries += 1
+        if self.__num_entries > self.max_entries:
+            self.prune()
+
+    def prune(self):
+        """
+        Removes the least recently used entries until a quarter of max_entries is free
+
+        Leaving room means a large run doesn't have to prune on every write.
+        """
+        entries = []
+        for entry_path in self.cache_dir.glob("*.pickle"):
+            try:
+                entries.append((entry_path.stat().st_mtime_ns, entry_path))
+            except FileNotFoundError:
+                # Pruned by a concurrent run
+                continue
+        entries.sort()
+        keep = self.max_entries * 3 // 4
+        for _, entry_path in entries[: max(0, len(entries) - keep)]:
+            entry_path.unlink(missing_ok=True)
+        self.__num_entries = min(len(entries), keep)
+
+    def parse(self, case_path: str | Path) -> List[CaseFile]:
+        with open(case_path, "rb") as case_f:
+            return self.parse_content(case_f.read())
+
+    def parse_content(self, content: bytes) -> List[CaseFile]:
+        entry_path = self.__entry_path(content)
+        case_files = self.__read_entry(entry_path)
+        if case_files is None:
+            case_files = self.__parser.parse(content)
+            self.__write_entry(entry_path, case_files)
+        return case_files
@@ -0,0 +1,67 @@
+import os
+
+from bft.cases.cache import CaseFileCache
+from bft.cases.parser import CaseFileParser
+
+CASE_FILE = b"""
+base_uri: https://github.com/substrait-io/substrait/blob/main/extensions/functions_arithmetic.yaml
+function: add
+cases:
+  - group:
+      id: basic
+      description: Basic examples without any special cases
+    args:
+      - value: 1
+        type: i8
+      - value: !decimal 2.5
+        type: decimal<38, 1>
+    result:
+      value: inf
+      type: fp64
+"""
+
+
+def fail_parse(self, content):
+    raise AssertionError("parsed a cached case file")
+
+
+def test_case_file_cache(tmp_path, monkeypatch):
+    case_path = tmp_path / "add.yaml"
+    case_path.write_bytes(CASE_FILE)
+    expected = CaseFileParser().parse(CASE_FILE)
+
+    cache = CaseFileCache(tmp_path / "cache")
+    assert cache.parse(case_path) == expected
+    entries = list(cache.cache_dir.iterdir())
+    assert len(entries) == 1
+
+    # A warm cache is served from the stored entry, without parsing
+    with monkeypatch.context() as patch:
+        patch.setattr(CaseFileParser, "parse", fail_parse)
+        assert CaseFileCache(tmp_path / "cache").parse(case_path) == expected
+    assert list(cache.cache_dir.iterdir()) == entries
+
+    # Changed content misses the cache and is parsed again
+    case_path.write_bytes(CASE_FILE.replace(b"function: add", b"function: subtract"))
+    assert cache.parse(case_path)[0].function == "subtract"
+    assert len(list(cache.cache_dir.iterdir())) == 2
+
+
+def test_least_recently_used_entries_are_pruned(tmp_path):
+    cache = CaseFileCache(tmp_path / "cache", max_entries=4)
+    entries = {}
+    for function in ["a", "b", "c", "d"]:
+        content = CASE_FILE.replace(b"function: add", f"function: {function}".encode())
+        before = set(cache.cache_dir.glob("*.pickle"))
+        cache.parse_content(content)
+        [entries[function]] = set(cache.cache_dir.glob("*.pickle")) - before
+    for age, function in enumerate(["a", "b", "c", "d"]):
+        os.utime(entries[function], ns=(age, age))
+
+    # Using an entry makes it the most recent, so b and c are the oldest
+    cache.parse_content(CASE_FILE.replace(b"function: add", b"function: a"))
+    cache.parse_content(CASE_FILE)
+    remaining = set(cache.cache_dir.glob("*.pickle"))
+    assert len(remaining) == 3
+    assert {entries["a"], entries["d"]} <= remaining
+    assert not {entries["b"], entries["c"]} & remaining
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from typing import Collection, Dict, Iterator, List, NamedTuple, Tuple
+
+from .cache import default_cache_dir
+from .parser import CaseFileParser
+
+# Bump when the layout of the index file changes
+INDEX_VERSION = 1
+
+# The start of a YAML document after the first one
+DOCUMENT_START = re.compile(rb"^---", re.MULTILINE)
+
+HEADER_PATTERN = re.compile(rb"^(function|base_uri):[ \t]*(.+?)[ \t\r]*$", re.MULTILINE)
+
+
+class IndexEntry(NamedTuple):
+    """A document of a case file, at byte offset in path"""
+
+    path: str
+    offset: int
+    length: int
+    function: str
+    base_uri: str
+
+
+def read_header(content: bytes) -> Tuple[set, set]:
+    """
+    Returns the function names and base URIs a case file declares
+
+    Only the top-level keys are scanned for, so this is much cheaper than parsing
+    the file.  Either set is empty if the file doesn't declare it in plain form.
+    """
+    headers = {b"function": set(), b"base_uri": set()}
+    for match in HEADER_PATTERN.finditer(content):
+        value = match.group(2).decode("utf-8")
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"":
+            value = value[1:-1]
+        headers[match.group(1)].add(value)
+    return headers[b"function"], headers[b"base_uri"]
+
+
+def split_documents(content: bytes) -> List[Tuple[int, int]]:
+    """Returns the (offset, length) of every YAML document in content"""
+    starts = [0] + [match.start() for match in DOCUMENT_START.finditer(content) if match.start()]
+    ends = starts[1:] + [len(content)]
+    return [(start, end - start) for start, end in zip(starts, ends)]
+
+
+def index_file(path: str, content: bytes) -> List[IndexEntry]:
+    entries = []
+    for offset, length in split_documents(content):
+        document = content[offset : offset + length]
+        functions, base_uris = read_header(document)
+        if len(functions) == 1 and len(base_uris) == 1:
+            entries.append(
+                IndexEntry(path, offset, length, functions.pop(), base_uris.pop())
+            )
+            continue
+        # Not a layout read_header understands, or an empty document
+        try:
+            case_files = CaseFileParser().parse(document)
+        except Exception:
+            case_files = None
+        if case_files is None:
+            # The documents can't be parsed on their own, index the whole file
+            return [
+                IndexEntry(path, 0, len(content), case_file.function, case_file.base_uri)
+                for case_file in CaseFileParser().parse(content)
+            ]
+        for case_file in case_files:
+            entries.append(
+                IndexEntry(path, offset, length, case_file.function, case_file.base_uri)
+            )
+    return entries
+
+
+def default_index_path(cases_dir: Path) -> Path:
+    key = hashlib.sha256(str(cases_dir).encode("utf-8")).hexdigest()
+    return default_cache_dir() / "index" / f"{key}.json"
+
+
+class CaseFileIndex(object):
+    """
+    Persistent index from (base_uri, function) to the case file documents that
+    hold their cases
+
+    The index is stored per cases directory.  refresh re-indexes only the files
+    whose modification time or size changed since the index was saved.
+    """
+
+    def __init__(self, cases_dir: str | Path, index_path: str | Path = None):
+        self.cases_dir = Path(cases_dir).resolve()
+        if index_path is None:
+            index_path = default_index_path(self.cases_dir)
+        self.index_path = Path(index_path)
+        # relative path -> (mtime_ns, size, entries)
+        self.__files: Dict[str, Tuple[int, int, List[IndexEntry]]] = self.__load()
+
+    def __load(self) -> Dict[str, Tuple[int, int, List[IndexEntry]]]:
+        try:
+            with open(self.index_path) as index_f:
+                stored = json.load(index_f)
+        except (OSError, ValueError):
+            return {}
+        if stored.get("version") != INDEX_VERSION:
+            return {}
+        return {
+            path: (mtime_ns, size, [IndexEntry(*entry) for entry in entries])
+            for path, (mtime_ns, size, entries) in stored["files"].items()
+        }
+
+    def __save(self):
+        stored = {"version": INDEX_VERSION, "files": self.__files}
+        tmp_path = self.index_path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "w") as index_f:
+                json.dump(stored, index_f)
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            # Like the case cache, the index is an optimization
+            tmp_path.unlink(missing_ok=True)
+
+    def refresh(self) -> int:
+        """Re-indexes new and changed files, drops deleted ones and returns how many changed"""
+        files = {}
+        changed = 0
+        for case_path in sorted(self.cases_dir.rglob("*.yaml")):
+            path = case_path.relative_to(self.cases_dir).as_posix()
+            stat = case_path.stat()
+            indexed = self.__files.get(path, None)
+            if indexed is not None and indexed[:2] == (stat.st_mtime_ns, stat.st_size):
+                files[path] = indexed
+                continue
+            with open(case_path, "rb") as case_f:
+                content = case_f.read()
+            files[path] = (stat.st_mtime_ns, stat.st_size, index_file(path, content))
+            changed += 1
+        changed += len(self.__files.keys() - files.keys())
+        self.__files = files
+        if changed:
+            self.__save()
+        return changed
+
+    def entries(self) -> Iterator[IndexEntry]:
+        for _, _, entries in self.__files.values():
+            yield from entries
+
+    def select(
+        self, functions: Collection[str] = None, base_uris: Collection[str] = None
+    ) -> List[Tuple[Path, List[Tuple[int, int]]]]:
+        """
+        Returns the files holding cases for any of functions and base_uris, with
+        the (offset, length) of the documents to read from each
+
+        None matches everything.  Files are returned in path order.
+        """
+        selected: Dict[str, List[Tuple[int, int]]] = {}
+        for entry in self.entries():
+            if functions is not None and entry.function not in functions:
+                continue
+            if base_uris is not None and entry.base_uri not in base_uris:
+                continue
+            documents = selected.setdefault(entry.path, [])
+            if (entry.offset, entry.length) not in documents:
+                documents.append((entry.offset, entry.length))
+        return [(self.cases_dir / path, selected[path]) for path in sorted(selected)]
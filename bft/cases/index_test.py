@@ -0,0 +1,63 @@
+import os
+
+from bft.cases.index import CaseFileIndex, IndexEntry, split_documents
+
+ARITHMETIC_URI = "https://github.com/substrait-io/substrait/blob/main/extensions/functions_arithmetic.yaml"
+
+
+def case_file(function: str, uri: str = ARITHMETIC_URI) -> str:
+    return f"""base_uri: {uri}
+function: {function}
+cases:
+  - group:
+      id: basic
+      description: Basic examples
+    args:
+      - value: 1
+        type: i8
+    result:
+      value: 1
+      type: i8
+"""
+
+
+def test_split_documents():
+    content = b"a: 1\n---\nb: 2\n---\nc: 3\n"
+    assert [content[o : o + n] for o, n in split_documents(content)] == [
+        b"a: 1\n",
+        b"---\nb: 2\n",
+        b"---\nc: 3\n",
+    ]
+
+
+def test_incremental_refresh(tmp_path):
+    cases_dir = tmp_path / "cases"
+    cases_dir.mkdir()
+    (cases_dir / "add.yaml").write_text(case_file("add"))
+    multi = case_file("min") + "---\n" + case_file("max")
+    (cases_dir / "minmax.yaml").write_text(multi)
+
+    index = CaseFileIndex(cases_dir, tmp_path / "index.json")
+    assert index.refresh() == 2
+    max_offset = multi.index("---")
+    assert sorted(index.entries(), key=lambda entry: entry.function) == [
+        IndexEntry("add.yaml", 0, len(case_file("add")), "add", ARITHMETIC_URI),
+        IndexEntry("minmax.yaml", max_offset, len(multi) - max_offset, "max", ARITHMETIC_URI),
+        IndexEntry("minmax.yaml", 0, max_offset, "min", ARITHMETIC_URI),
+    ]
+    assert index.select(functions={"max", "add"}) == [
+        (cases_dir / "add.yaml", [(0, len(case_file("add")))]),
+        (cases_dir / "minmax.yaml", [(max_offset, len(multi) - max_offset)]),
+    ]
+
+    # A saved index only re-reads what changed
+    index = CaseFileIndex(cases_dir, tmp_path / "index.json")
+    assert index.refresh() == 0
+    (cases_dir / "add.yaml").write_text(case_file("subtract"))
+    os.utime(cases_dir / "add.yaml", ns=(0, 0))
+    (cases_dir / "minmax.yaml").unlink()
+    assert index.refresh() == 2
+    assert [entry.function for entry in index.entries()] == ["subtract"]
+    assert CaseFileIndex(cases_dir, tmp_path / "index.json").select(
+        base_uris={ARITHMETIC_URI}
+    ) == [(cases_dir / "add.yaml", [(0, len(case_file("subtract")))])]
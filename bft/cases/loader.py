@@ -1,16 +1,102 @@
 from pathlib import Path
-from typing import List
+from typing import Collection, Iterator, List, NamedTuple, Set
 
+from .cache import CaseFileCache
+from .index import CaseFileIndex, read_header
 from .parser import CaseFileParser
-from .types import Case
+from .types import Case, CaseFile
 
 
-def load_cases(cases_dir: str) -> List[Case]:
-    cases = []
-    parser = CaseFileParser()
-    for case_path in Path(cases_dir).rglob("*.yaml"):
+class CaseFilter(NamedTuple):
+    """
+    Selects cases by function name, base URI and group id
+
+    A field left as None matches everything.
+    """
+
+    functions: Collection[str] = None
+    base_uris: Collection[str] = None
+    groups: Collection[str] = None
+
+    def matches_header(self, functions: Set[str], base_uris: Set[str]) -> bool:
+        if self.functions is not None and functions.isdisjoint(self.functions):
+            return False
+        if self.base_uris is not None and base_uris.isdisjoint(self.base_uris):
+            return False
+        return True
+
+    def matches(self, case: Case) -> bool:
+        if self.functions is not None and case.function not in self.functions:
+            return False
+        if self.base_uris is not None and case.base_uri not in self.base_uris:
+            return False
+        if self.groups is not None and case.group.id not in self.groups:
+            return False
+        return True
+
+
+def might_match(content: bytes, case_filter: CaseFilter) -> bool:
+    if case_filter.functions is None and case_filter.base_uris is None:
+        return True
+    functions, base_uris = read_header(content)
+    if not functions or not base_uris:
+        # Not a layout read_header understands, the file has to be parsed
+        return True
+    return case_filter.matches_header(functions, base_uris)
+
+
+def iter_case_files(
+    cases_dir: str | Path,
+    case_filter: CaseFilter = None,
+    use_cache: bool = True,
+    use_index: bool = True,
+) -> Iterator[CaseFile]:
+    """
+    Yields the parsed case files under cases_dir one file at a time
+
+    With a case_filter on functions or base URIs, only the files (and documents
+    within them) that CaseFileIndex lists for those are read.  Without the index,
+    files whose header shows they can't match are skipped without being parsed.
+    """
+    if use_cache:
+        parse = CaseFileCache().parse_content
+    else:
+        parse = CaseFileParser().parse
+    if use_index and case_filter is not None and (
+        case_filter.functions is not None or case_filter.base_uris is not None
+    ):
+        index = CaseFileIndex(cases_dir)
+        index.refresh()
+        for case_path, documents in index.select(
+            case_filter.functions, case_filter.base_uris
+        ):
+            with open(case_path, "rb") as case_f:
+                for offset, length in documents:
+                    case_f.seek(offset)
+                    yield from parse(case_f.read(length))
+        return
+    for case_path in sorted(Path(cases_dir).rglob("*.yaml")):
         with open(case_path, "rb") as case_f:
-            for case_file in parser.parse(case_f):
-                for case in case_file.cases:
-                    cases.append(case)
-    return cases
+            content = case_f.read()
+        if case_filter is not None and not might_match(content, case_filter):
+            continue
+        yield from parse(content)
+
+
+def iter_cases(
+    cases_dir: str | Path,
+    case_filter: CaseFilter = None,
+    use_cache: bool = True,
+    use_index: bool = True,
+) -> Iterator[Case]:
+    """Yields the cases under cases_dir that match case_filter, file by file"""
+    for case_file in iter_case_files(cases_dir, case_filter, use_cache, use_index):
+        for case in case_file.cases:
+            if case_filter is None or case_filter.matches(case):
+                yield case
+
+
+def load_cases(
+    cases_dir: str, use_cache: bool = True, case_filter: CaseFilter = None
+) -> List[Case]:
+    return list(iter_cases(cases_dir, case_filter, use_cache))
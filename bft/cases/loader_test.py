@@ -0,0 +1,70 @@
+import pytest
+
+from bft.cases.index import read_header
+from bft.cases.loader import CaseFilter, iter_cases
+
+ADD_FILE = b"""
+base_uri: https://github.com/substrait-io/substrait/blob/main/extensions/functions_arithmetic.yaml
+function: add
+cases:
+  - group:
+      id: basic
+      description: Basic examples without any special cases
+    args:
+      - value: 1
+        type: i8
+      - value: 2
+        type: i8
+    result:
+      value: 3
+      type: i8
+  - group:
+      id: overflow
+      description: Examples demonstrating overflow behavior
+    args:
+      - value: 120
+        type: i8
+      - value: 10
+        type: i8
+    result:
+      special: error
+"""
+
+# Would fail to parse, so it must be skipped by its header alone
+BROKEN_FILE = b"""
+base_uri: 'https://github.com/substrait-io/substrait/blob/main/extensions/functions_string.yaml'
+function: "lower"
+cases: [
+"""
+
+
+def test_read_header():
+    assert read_header(ADD_FILE) == (
+        {"add"},
+        {"https://github.com/substrait-io/substrait/blob/main/extensions/functions_arithmetic.yaml"},
+    )
+    assert read_header(BROKEN_FILE.replace(b"\n", b"\r\n")) == (
+        {"lower"},
+        {"https://github.com/substrait-io/substrait/blob/main/extensions/functions_string.yaml"},
+    )
+
+
+@pytest.mark.parametrize("use_index", [True, False])
+def test_filtered_files_are_not_parsed(tmp_path, monkeypatch, use_index):
+    monkeypatch.setenv("BFT_CACHE_DIR", str(tmp_path / "cache"))
+    cases_dir = tmp_path / "cases"
+    (cases_dir / "arithmetic").mkdir(parents=True)
+    (cases_dir / "arithmetic" / "add.yaml").write_bytes(ADD_FILE)
+    (cases_dir / "string").mkdir()
+    (cases_dir / "string" / "lower.yaml").write_bytes(BROKEN_FILE)
+
+    cases = iter_cases(cases_dir, CaseFilter(functions={"add"}), False, use_index)
+    assert [case.group.id for case in cases] == ["basic", "overflow"]
+
+    by_group = iter_cases(
+        cases_dir, CaseFilter(functions={"add"}, groups={"overflow"}), False, use_index
+    )
+    assert [case.result for case in by_group] == ["error"]
+
+    other_uri = CaseFilter(base_uris={"https://example.com/functions_arithmetic.yaml"})
+    assert list(iter_cases(cases_dir, other_uri, False, use_index)) == []
@@ -42,11 +42,27 @@ class CaseFileVisitor(BaseYamlVisitor[CaseFile]):
                     raise ValueError(f"Unrecognized float string literal {value}")
         return value
 
+    @staticmethod
+    def __normalize_yaml_list_item(value):
+        # Special values in a column of values arrive quoted, e.g. 'inf'
+        if isinstance(value, str):
+            lower_value = value.lower()
+            if lower_value.startswith("'inf'"):
+                return float("inf")
+            elif lower_value.startswith("'-inf'"):
+                return float("-inf")
+            elif lower_value.startswith("'nan'"):
+                return math.nan
+        return value
+
     def visit_literal(self, lit):
         value = self._get_or_die(lit, "value")
         data_type = self._get_or_die(lit, "type")
         is_not_a_func_arg = self._get_or_else(lit, "is_not_a_func_arg", False)
-        value = self.__normalize_yaml_literal(value, data_type)
+        if isinstance(value, list):
+            value = [self.__normalize_yaml_list_item(item) for item in value]
+        else:
+            value = self.__normalize_yaml_literal(value, data_type)
         return CaseLiteral(value, data_type, is_not_a_func_arg)
 
     def visit_literal_result(self, lit):
@@ -0,0 +1,34 @@
+import math
+
+from bft.cases.parser import CaseFileParser
+
+AGGREGATE_CASE_FILE = b"""
+base_uri: https://github.com/substrait-io/substrait/blob/main/extensions/functions_arithmetic.yaml
+function: sum
+cases:
+  - group:
+      id: basic
+      description: Basic examples without any special cases
+    args:
+      - value: [1.5, "'inf'", "'-inf'", "'nan'", null]
+        type: fp64
+        is_not_a_func_arg: true
+      - value: [1, 2, 3, 4, 5]
+        type: i32
+        is_not_a_func_arg: true
+    result:
+      value: inf
+      type: fp64
+"""
+
+
+def test_aggregate_column_special_values():
+    case_file = CaseFileParser().parse(AGGREGATE_CASE_FILE)[0]
+    args = case_file.cases[0].args
+    # Arguments keep their order
+    assert [arg.type for arg in args] == ["fp64", "i32"]
+    assert args[0].value[:3] == [1.5, float("inf"), float("-inf")]
+    assert math.isnan(args[0].value[3])
+    assert args[0].value[4] is None
+    assert args[1].value == [1, 2, 3, 4, 5]
+    assert case_file.cases[0].result.value == float("inf")
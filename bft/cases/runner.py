@@ -1,9 +1,12 @@
+import sys
 from abc import ABC, abstractmethod
-from typing import Literal, NamedTuple
+from typing import Dict, Hashable, List, Literal, NamedTuple
 
 from bft.dialects.types import Dialect, SqlMapping
 
-from .types import Case
+from .cache import source_version
+from .timing import CaseTimings, case_timings
+from .types import Case, case_signature
 
 
 class CaseResult(NamedTuple):
@@ -17,6 +20,21 @@ class CaseRunner(ABC):
     def run_case(self, case: Case) -> CaseResult:
         pass
 
+    def batch_cases(self, cases: List[Case]):
+        """Registers cases that are about to be run, runners that can't batch ignore this"""
+        pass
+
+    def cache_version(self) -> str:
+        """
+        Identifies the code and the mode this runner evaluates cases with
+
+        Stored results are only reused by a runner with the same cache version.
+        Runners with modes that can give a case a different result add the mode.
+        """
+        return f"{type(self).__name__} " + source_version(
+            sys.modules[type(self).__module__], sys.modules[__name__]
+        )
+
 
 class SqlCaseResult(NamedTuple):
     type: Literal["success", "error", "unsupported", "unexpected_pass", "mismatch"]
@@ -44,68 +62,189 @@ class SqlCaseResult(NamedTuple):
         return SqlCaseResult("mismatch", None, actual)
 
 
-class SqlCaseRunner(CaseRunner):
-    def __init__(self, dialect: Dialect):
-        self.__dialect = dialect
-
-    def run_case(self, case: Case) -> CaseResult:
-        mapping = self.__dialect.mapping_for_case(case)
-        if mapping is None:
+def select_expr(mapping: SqlMapping, arg_names: List[str], field: str = None) -> str:
+    """
+    Builds the SQL expression that applies mapping to the columns arg_names
+
+    field is the SQL text of the first argument, extract takes it as a literal
+    rather than as a column.
+    """
+    joined_arg_names = ",".join(arg_names)
+    if mapping.infix:
+        if len(arg_names) != 2:
+            raise Exception(f"Infix function with {len(arg_names)} args")
+        return f"{arg_names[0]} {mapping.local_name} {arg_names[1]}"
+    elif mapping.postfix:
+        if len(arg_names) != 1:
+            raise Exception(f"Postfix function with {len(arg_names)} args")
+        return f"{arg_names[0]} {mapping.local_name}"
+    elif mapping.extract:
+        if len(arg_names) != 2:
+            raise Exception(f"Extract function with {len(arg_names)} args")
+        return f"{mapping.local_name}({field} FROM {arg_names[1]})"
+    elif mapping.between:
+        if len(arg_names) != 3:
+            raise Exception(f"Between function with {len(arg_names)} args")
+        return f"{arg_names[0]} BETWEEN {arg_names[1]} AND {arg_names[2]}"
+    elif mapping.local_name == "count(*)":
+        return mapping.local_name
+    elif mapping.aggregate:
+        if len(arg_names) < 1:
+            raise Exception(f"Aggregate function with {len(arg_names)} args")
+        return f"{mapping.local_name}({arg_names[0]})"
+    return f"{mapping.local_name}({joined_arg_names})"
+
+
+def select_query(
+    mapping: SqlMapping, table: str, arg_names: List[str], field: str = None
+) -> str:
+    return f"SELECT {select_expr(mapping, arg_names, field)} FROM {table};"
+
+
+def unsupported_function_result(dialect: Dialect, case: Case) -> CaseResult:
+    return CaseResult(
+        False,
+        False,
+        f"The dialect {dialect.name} does not support the function '{case.function}'",
+    )
+
+
+def case_result(case: Case, mapping: SqlMapping, result: SqlCaseResult) -> CaseResult:
+    """Classifies the result of running case with mapping against what was expected"""
+    if result.type == "success":
+        return CaseResult(result, mapping.should_pass, mapping.reason)
+    elif result.type == "unsupported":
+        if mapping.should_pass:
             return CaseResult(
                 False,
-                False,
-                f"The dialect {self.__dialect.name} does not support the function '{case.function}'",
+                True,
+                f"This case should have been supported.  Instead it reported {result.err}",
             )
-        result = self.run_sql_case(case, mapping)
-        if result.type == "success":
-            return CaseResult(result, mapping.should_pass, mapping.reason)
-        elif result.type == "unsupported":
-            if mapping.should_pass:
-                return CaseResult(
-                    False,
-                    True,
-                    f"This case should have been supported.  Instead it reported {result.err}",
-                )
-            else:
-                return CaseResult(False, False, mapping.reason)
-        elif result.type == "error":
-            if case.result == "error":
-                # Case expected to error.  Dialect may or may not have expected it
-                should_pass = mapping.should_pass
-                if mapping.unsupported:
-                    # Unsupported test case, expected an error and got an error
-                    should_pass = True
-                return CaseResult(True, should_pass, mapping.reason)
-            else:
-                if mapping.should_pass:
-                    # Case should not have error.  Dialect should not have error
-                    return CaseResult(False, mapping.should_pass, result.err)
-                else:
-                    # Case should not have error but it's expected for dialect
-                    return CaseResult(False, mapping.should_pass, mapping.reason)
-        elif result.type == "unexpected_pass":
-            # Case expected error.  No error happened.
-            if mapping.should_pass:
-                # This was not expected given the dialect
-                return CaseResult(
-                    False,
-                    mapping.should_pass,
-                    f"This case should have given an error.  Instead it returned the value {result.actual}",
-                )
-            else:
-                # In this dialect, this case passes even though it shouldn't
-                return CaseResult(False, mapping.should_pass, mapping.reason)
-        elif result.type == "mismatch":
+        else:
+            return CaseResult(False, False, mapping.reason)
+    elif result.type == "error":
+        if case.result == "error":
+            # Case expected to error.  Dialect may or may not have expected it
+            should_pass = mapping.should_pass
+            if mapping.unsupported:
+                # Unsupported test case, expected an error and got an error
+                should_pass = True
+            return CaseResult(True, should_pass, mapping.reason)
+        else:
             if mapping.should_pass:
-                return CaseResult(
-                    False,
-                    mapping.should_pass,
-                    f"This case should have yielded the result {case.result.value} but instead it returned {result.actual}",
-                )
+                # Case should not have error.  Dialect should not have error
+                return CaseResult(False, mapping.should_pass, result.err)
             else:
+                # Case should not have error but it's expected for dialect
                 return CaseResult(False, mapping.should_pass, mapping.reason)
+    elif result.type == "unexpected_pass":
+        # Case expected error.  No error happened.
+        if mapping.should_pass:
+            # This was not expected given the dialect
+            return CaseResult(
+                False,
+                mapping.should_pass,
+                f"This case should have given an error.  Instead it returned the value {result.actual}",
+            )
+        else:
+            # In this dialect, this case passes even though it shouldn't
+            return CaseResult(False, mapping.should_pass, mapping.reason)
+    elif result.type == "mismatch":
+        if mapping.should_pass:
+            return CaseResult(
+                False,
+                mapping.should_pass,
+                f"This case should have yielded the result {case.result.value} but instead it returned {result.actual}",
+            )
         else:
-            raise Exception("Unexpected case result type")
+            return CaseResult(False, mapping.should_pass, mapping.reason)
+    else:
+        raise Exception("Unexpected case result type")
+
+
+class SqlCaseRunner(CaseRunner):
+    def __init__(self, dialect: Dialect):
+        self.__dialect = dialect
+        # batch key -> cases waiting to be evaluated together
+        self.__batches: Dict[Hashable, List[Case]] = {}
+        # id(case) -> batch key, for cases registered with batch_cases
+        self.__batch_keys: Dict[int, Hashable] = {}
+        # id(case) -> result computed as part of a batch but not yet claimed, or
+        # the exception that evaluating the batch raised
+        self.__batch_results: Dict[int, SqlCaseResult | Exception] = {}
+        # Runners mark the phases of a case (setup, load, query, compare,
+        # teardown) with self.timings.phase
+        self.timings: CaseTimings = case_timings
+
+    def batch_key(self, case: Case) -> Hashable:
+        """
+        Returns a key grouping cases that can be evaluated with a single query
+
+        Runners that implement run_sql_batch should override this.  The key must
+        include case_signature(case) so that every case in a batch resolves to the
+        same mapping.  Returning None means the case is always run on its own.
+        """
+        return None
+
+    def batch_cases(self, cases: List[Case]):
+        """
+        Registers cases for batched evaluation
+
+        The cases are still run (and reported) one at a time through run_case.  The
+        first time run_case sees a case from a batch the whole batch is evaluated
+        with run_sql_batch and the remaining results are held until they are asked for.
+        """
+        for case in cases:
+            key = self.batch_key(case)
+            if key is None:
+                continue
+            self.__batches.setdefault(key, []).append(case)
+            self.__batch_keys[id(case)] = key
+
+    def run_sql_batch(
+        self, cases: List[Case], mapping: SqlMapping
+    ) -> List[SqlCaseResult]:
+        """
+        Evaluates cases that share a batch key and mapping
+
+        Must return one result per case, in the same order.  The default evaluates
+        each case on its own.
+        """
+        return [self.run_sql_case(case, mapping) for case in cases]
+
+    def __run_batched_sql_case(self, case: Case, mapping: SqlMapping) -> SqlCaseResult:
+        key = self.__batch_keys.pop(id(case), None)
+        if key is None:
+            return self.run_sql_case(case, mapping)
+        batch = self.__batches.pop(key, None)
+        if batch is not None:
+            try:
+                results = self.run_sql_batch(batch, mapping)
+            except Exception as err:
+                # Every case of the batch reports the error, not just the first
+                results = [err] * len(batch)
+            for batch_case, result in zip(batch, results):
+                self.__batch_results[id(batch_case)] = result
+        result = self.__batch_results.pop(id(case))
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def run_case(self, case: Case) -> CaseResult:
+        self.timings.start_case(
+            self.__dialect.name, case.function, case.group.id, "mapping"
+        )
+        try:
+            return self.__run_case(case)
+        finally:
+            self.timings.end_case()
+
+    def __run_case(self, case: Case) -> CaseResult:
+        mapping = self.__dialect.mapping_for_case(case)
+        self.timings.phase("execute")
+        if mapping is None:
+            return unsupported_function_result(self.__dialect, case)
+        return case_result(case, mapping, self.__run_batched_sql_case(case, mapping))
 
     @abstractmethod
     def run_sql_case(self, case: Case, mapping: SqlMapping) -> SqlCaseResult:
@@ -0,0 +1,56 @@
+import pytest
+
+from bft.cases.runner import SqlCaseResult, SqlCaseRunner, select_expr, select_query
+from bft.cases.types import Case, CaseGroup, CaseLiteral
+from bft.dialects.types import SqlMapping
+
+MAPPING = SqlMapping("f", False, False, False, False, False, False, True, None)
+
+
+class FakeDialect(object):
+    name = "fake"
+
+    def mapping_for_case(self, case: Case) -> SqlMapping:
+        return MAPPING
+
+
+class FailingBatchRunner(SqlCaseRunner):
+    def batch_key(self, case: Case):
+        return "f"
+
+    def run_sql_batch(self, cases, mapping):
+        raise Exception("connection lost")
+
+    def run_sql_case(self, case: Case, mapping: SqlMapping) -> SqlCaseResult:
+        return SqlCaseResult.success()
+
+
+def make_case(value: int) -> Case:
+    return Case(
+        "f",
+        "uri",
+        CaseGroup("basic", ""),
+        [CaseLiteral(value, "i32")],
+        CaseLiteral(value, "i32"),
+        [],
+    )
+
+
+def test_batch_error_is_raised_for_every_case():
+    runner = FailingBatchRunner(FakeDialect())
+    cases = [make_case(value) for value in range(3)]
+    runner.batch_cases(cases)
+    for case in cases:
+        with pytest.raises(Exception, match="connection lost"):
+            runner.run_case(case)
+    # The failed batch isn't evaluated again
+    assert runner.run_case(make_case(4)).passed
+
+
+def test_select_query():
+    infix = MAPPING._replace(local_name="+", infix=True)
+    assert select_query(infix, "t", ["arg0", "arg1"]) == "SELECT arg0 + arg1 FROM t;"
+    extract = MAPPING._replace(local_name="EXTRACT", extract=True)
+    assert select_expr(extract, ["arg0", "arg1"], "'YEAR'") == "EXTRACT('YEAR' FROM arg1)"
+    between = MAPPING._replace(local_name="BETWEEN", between=True)
+    assert select_expr(between, ["a", "b", "c"]) == "a BETWEEN b AND c"
@@ -0,0 +1,64 @@
+import json
+from pathlib import Path
+from typing import Dict, Iterable, List, Set
+
+from .types import Case, case_key
+
+
+class Selection(object):
+    """
+    The cases to run for each dialect, e.g. the cases a change can affect
+
+    Cases are identified by case_key, so a selection made from one version of the
+    cases only selects cases that are still identical.  The functions of the
+    selected cases are kept too, so loading can skip the files of other functions.
+    """
+
+    def __init__(self):
+        # dialect name -> function -> case keys
+        self.__cases: Dict[str, Dict[str, Set[str]]] = {}
+
+    def add(self, dialect: str, cases: Iterable[Case]):
+        functions = self.__cases.setdefault(dialect, {})
+        for case in cases:
+            functions.setdefault(case.function, set()).add(case_key(case))
+
+    def dialects(self) -> List[str]:
+        return sorted(self.__cases)
+
+    def functions(self) -> Set[str]:
+        return {
+            function for functions in self.__cases.values() for function in functions
+        }
+
+    def num_cases(self, dialect: str) -> int:
+        return sum(len(keys) for keys in self.__cases.get(dialect, {}).values())
+
+    def selects(self, dialect: str, case: Case) -> bool:
+        keys = self.__cases.get(dialect, {}).get(case.function, None)
+        return keys is not None and case_key(case) in keys
+
+    def save(self, path: str | Path):
+        stored = {
+            dialect: {function: sorted(keys) for function, keys in sorted(functions.items())}
+            for dialect, functions in sorted(self.__cases.items())
+        }
+        with open(path, "w") as selection_f:
+            json.dump(stored, selection_f, indent=2)
+
+    @staticmethod
+    def load(path: str | Path) -> "Selection":
+        with open(path) as selection_f:
+            stored = json.load(selection_f)
+        selection = Selection()
+        for dialect, functions in stored.items():
+            selection.__cases[dialect] = {
+                function: set(keys) for function, keys in functions.items()
+            }
+        return selection
+
+
+def changed_cases(old_cases: Iterable[Case], new_cases: Iterable[Case]) -> List[Case]:
+    """Returns the cases of new_cases that are not in old_cases, i.e. added or edited"""
+    old_keys = {case_key(case) for case in old_cases}
+    return [case for case in new_cases if case_key(case) not in old_keys]
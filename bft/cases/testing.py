@@ -0,0 +1,44 @@
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+from bft.dialects.loader import load_dialects
+from bft.dialects.types import Dialect
+
+from .runner import CaseResult, CaseRunner
+from .types import Case, CaseGroup, CaseLiteral
+
+ARITHMETIC_URI = "https://github.com/substrait-io/substrait/blob/main/extensions/substrait/extensions/functions_arithmetic.yaml"
+STRING_URI = "https://github.com/substrait-io/substrait/blob/main/extensions/substrait/extensions/functions_string.yaml"
+
+DIALECTS_DIR = Path(__file__).parent.parent.parent / "dialects"
+
+
+def make_case(
+    function, args, result, group="basic", options=(), uri=ARITHMETIC_URI
+) -> Case:
+    """
+    Builds a case from (value, type) args and a (value, type) result, or a
+    result of "error", "nan"...
+    """
+    args = [CaseLiteral(value, type) for value, type in args]
+    if not isinstance(result, str):
+        result = CaseLiteral(*result)
+    return Case(function, uri, CaseGroup(group, ""), args, result, list(options))
+
+
+def load_dialect(name: str) -> Dialect:
+    return load_dialects(str(DIALECTS_DIR)).get_dialect_by_name(name)
+
+
+def run_batched_and_single(
+    make_runner: Callable[[], CaseRunner], cases: List[Case]
+) -> Tuple[List[CaseResult], List[CaseResult]]:
+    """
+    Runs cases after registering them with batch_cases on one runner and each on
+    its own on another, a runner must give the same results both ways
+    """
+    batched_runner = make_runner()
+    batched_runner.batch_cases(cases)
+    batched = [batched_runner.run_case(case) for case in cases]
+    single_runner = make_runner()
+    return batched, [single_runner.run_case(case) for case in cases]
@@ -0,0 +1,189 @@
+import contextvars
+import csv
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Tuple
+
+# Set to a non-empty value to record timings, also in worker processes
+TIMINGS_ENV = "BFT_TIMINGS"
+
+
+class PhaseTiming(NamedTuple):
+    dialect: str
+    function: str
+    phase: str
+    calls: int
+    seconds: float
+
+
+class FunctionTiming(NamedTuple):
+    dialect: str
+    function: str
+    cases: int
+    seconds: float
+
+
+class CaseTiming(NamedTuple):
+    dialect: str
+    function: str
+    group: str
+    index: int
+    seconds: float
+
+
+class ActiveCase(object):
+    """The case a CaseTimings is timing and the phase it is in"""
+
+    def __init__(self, dialect: str, function: str, group: str, phase: str):
+        self.key = (dialect, function, group)
+        self.phase = phase
+        self.case_start = self.phase_start = time.perf_counter()
+
+
+class CaseTimings(object):
+    """
+    Records the wall time spent on each case and in each phase of running it
+
+    A runner marks the start of a phase with phase(name), which ends the phase
+    before it, so the phases of a case always add up to its total.  When cases are
+    batched, the case that triggers the batch is charged for the whole batch.
+
+    The case being timed belongs to the running context: phases marked from other
+    threads are ignored, and each asyncio task times its own case, so cases run
+    concurrently by an async runner are timed separately and their times overlap.
+
+    Recording is off unless enabled, and then every call returns immediately.
+    """
+
+    def __init__(self, enabled: bool = None):
+        if enabled is None:
+            enabled = bool(os.environ.get(TIMINGS_ENV))
+        self.enabled = enabled
+        # (dialect, function, phase) -> [calls, seconds]
+        self.__phases: Dict[Tuple[str, str, str], List] = {}
+        self.__cases: List[CaseTiming] = []
+        # (dialect, function, group) -> cases seen so far
+        self.__group_indices: Dict[Tuple[str, str, str], int] = {}
+        self.__active: contextvars.ContextVar[ActiveCase] = contextvars.ContextVar(
+            f"active_case_{id(self)}", default=None
+        )
+
+    def start_case(self, dialect: str, function: str, group: str, phase: str):
+        """Starts timing a case, beginning with phase"""
+        if not self.enabled:
+            return
+        self.__active.set(ActiveCase(dialect, function, group, phase))
+
+    def phase(self, name: str):
+        if not self.enabled:
+            return
+        active = self.__active.get()
+        if active is None:
+            return
+        now = time.perf_counter()
+        self.__end_phase(active, now)
+        active.phase = name
+        active.phase_start = now
+
+    def end_case(self):
+        if not self.enabled:
+            return
+        active = self.__active.get()
+        if active is None:
+            return
+        now = time.perf_counter()
+        self.__end_phase(active, now)
+        self.__add_case(*active.key, now - active.case_start)
+        self.__active.set(None)
+
+    def __add_case(self, dialect: str, function: str, group: str, seconds: float):
+        key = (dialect, function, group)
+        index = self.__group_indices.get(key, 0)
+        self.__group_indices[key] = index + 1
+        self.__cases.append(CaseTiming(dialect, function, group, index, seconds))
+
+    def __end_phase(self, active: ActiveCase, now: float):
+        dialect, function, _ = active.key
+        totals = self.__phases.setdefault((dialect, function, active.phase), [0, 0.0])
+        totals[0] += 1
+        totals[1] += now - active.phase_start
+
+    def drain(self) -> Tuple[List[PhaseTiming], List[CaseTiming]]:
+        """Returns everything recorded so far and clears it, see merge"""
+        records = (self.phase_timings(), self.__cases)
+        self.__phases = {}
+        self.__cases = []
+        return records
+
+    def merge(self, records: Tuple[List[PhaseTiming], List[CaseTiming]]):
+        """
+        Adds timings drained from another recorder, e.g. in a worker process
+
+        Cases are numbered within their group again, so timings merged in the
+        order the cases ran are numbered as if they ran in this recorder.
+        """
+        phase_timings, case_timings = records
+        for timing in phase_timings:
+            key = (timing.dialect, timing.function, timing.phase)
+            totals = self.__phases.setdefault(key, [0, 0.0])
+            totals[0] += timing.calls
+            totals[1] += timing.seconds
+        for timing in case_timings:
+            self.__add_case(timing.dialect, timing.function, timing.group, timing.seconds)
+
+    def phase_timings(self) -> List[PhaseTiming]:
+        return [
+            PhaseTiming(*key, calls, seconds)
+            for key, (calls, seconds) in self.__phases.items()
+        ]
+
+    def case_timings(self) -> List[CaseTiming]:
+        return list(self.__cases)
+
+    def function_timings(self) -> List[FunctionTiming]:
+        """Total time per dialect and function, slowest first"""
+        totals: Dict[Tuple[str, str], List] = {}
+        for timing in self.__cases:
+            function_totals = totals.setdefault((timing.dialect, timing.function), [0, 0.0])
+            function_totals[0] += 1
+            function_totals[1] += timing.seconds
+        timings = [
+            FunctionTiming(*key, cases, seconds)
+            for key, (cases, seconds) in totals.items()
+        ]
+        return sorted(timings, key=lambda timing: timing.seconds, reverse=True)
+
+    def dialect_timings(self) -> Dict[str, float]:
+        totals: Dict[str, float] = {}
+        for timing in self.__cases:
+            totals[timing.dialect] = totals.get(timing.dialect, 0.0) + timing.seconds
+        return totals
+
+    def write_report(self, path: str | Path):
+        """
+        Writes the timings to path, as CSV if it ends with .csv and JSON otherwise
+
+        The CSV report holds one row per dialect, function and phase.  The JSON
+        report also holds the totals per dialect and function and every case.
+        """
+        path = Path(path)
+        if path.suffix == ".csv":
+            with open(path, "w", newline="") as report_f:
+                writer = csv.writer(report_f)
+                writer.writerow(PhaseTiming._fields)
+                writer.writerows(self.phase_timings())
+            return
+        report = {
+            "dialects": self.dialect_timings(),
+            "functions": [timing._asdict() for timing in self.function_timings()],
+            "phases": [timing._asdict() for timing in self.phase_timings()],
+            "cases": [timing._asdict() for timing in self.__cases],
+        }
+        with open(path, "w") as report_f:
+            json.dump(report, report_f, indent=2)
+
+
+# The recorder runners report to, one per process
+case_timings = CaseTimings()
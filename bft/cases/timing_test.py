@@ -0,0 +1,72 @@
+import csv
+import json
+
+from bft.cases.timing import CaseTimings, FunctionTiming
+
+
+def run_case(timings, function, group, phases):
+    timings.start_case("sqlite", function, group, phases[0])
+    for phase in phases[1:]:
+        timings.phase(phase)
+    timings.end_case()
+
+
+def test_phases_add_up_to_case_total():
+    timings = CaseTimings(enabled=True)
+    run_case(timings, "add", "basic", ["mapping", "setup", "query", "setup"])
+    run_case(timings, "add", "basic", ["mapping", "query"])
+
+    phases = {timing.phase: timing for timing in timings.phase_timings()}
+    assert {phase: timing.calls for phase, timing in phases.items()} == {
+        "mapping": 2,
+        "setup": 2,
+        "query": 2,
+    }
+    [function] = timings.function_timings()
+    assert function.cases == 2
+    assert abs(function.seconds - sum(t.seconds for t in phases.values())) < 1e-9
+    assert [timing.index for timing in timings.case_timings()] == [0, 1]
+
+
+def test_disabled_records_nothing():
+    timings = CaseTimings(enabled=False)
+    run_case(timings, "add", "basic", ["mapping"])
+    assert timings.phase_timings() == []
+    assert timings.case_timings() == []
+
+
+def test_merge_renumbers_cases():
+    worker = CaseTimings(enabled=True)
+    run_case(worker, "add", "basic", ["query"])
+    timings = CaseTimings(enabled=True)
+    run_case(timings, "add", "basic", ["query"])
+    timings.merge(worker.drain())
+
+    assert worker.case_timings() == []
+    assert [timing.index for timing in timings.case_timings()] == [0, 1]
+    assert [(t.phase, t.calls) for t in timings.phase_timings()] == [("query", 2)]
+
+
+def test_write_report(tmp_path):
+    timings = CaseTimings(enabled=True)
+    run_case(timings, "add", "basic", ["query"])
+    run_case(timings, "sum", "basic", ["query", "compare"])
+
+    timings.write_report(tmp_path / "timings.json")
+    with open(tmp_path / "timings.json") as report_f:
+        report = json.load(report_f)
+    assert set(report["dialects"]) == {"sqlite"}
+    assert len(report["cases"]) == 2
+    assert {FunctionTiming(**timing).function for timing in report["functions"]} == {
+        "add",
+        "sum",
+    }
+
+    timings.write_report(tmp_path / "timings.csv")
+    with open(tmp_path / "timings.csv") as report_f:
+        rows = list(csv.DictReader(report_f))
+    assert [(row["function"], row["phase"]) for row in rows] == [
+        ("add", "query"),
+        ("sum", "query"),
+        ("sum", "compare"),
+    ]
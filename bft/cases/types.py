@@ -1,3 +1,4 @@
+import hashlib
 from typing import Dict, List, Literal, NamedTuple, Tuple
 
 
@@ -33,6 +34,29 @@ def case_to_kernel_str(
     return f"{function}({joined_args}) -> {result_str}"
 
 
+def case_signature(case: Case) -> Tuple:
+    """
+    Key identifying everything about a case that the dialect mapping depends on
+
+    Two cases with the same signature always resolve to the same SqlMapping and can
+    therefore be evaluated together by a runner that supports batches.
+    """
+    arg_types = tuple((arg.type, arg.is_not_a_func_arg) for arg in case.args)
+    result_type = case.result if isinstance(case.result, str) else case.result.type
+    return (
+        case.base_uri,
+        case.function,
+        arg_types,
+        result_type,
+        tuple(case.options),
+    )
+
+
+def case_key(case: Case) -> str:
+    """A hash of everything in a case, which changes whenever the case is edited"""
+    return hashlib.sha256(repr(case).encode("utf-8")).hexdigest()
+
+
 class CaseFile(NamedTuple):
     function: str
     base_uri: str
@@ -0,0 +1,275 @@
+import argparse
+import importlib
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Tuple
+
+from bft.cases.loader import CaseFilter, iter_cases
+from bft.cases.selection import Selection, changed_cases
+from bft.cases.timing import TIMINGS_ENV, case_timings
+from bft.cases.types import Case
+from bft.dialects.diff import affected_cases, diff_dialect_files
+from bft.dialects.loader import load_dialect_files, load_dialects
+from bft.dialects.types import DialectFile, DialectsLibrary
+from bft.testers.base_tester import FAILED, PASSED, SKIPPED, XFAILED, BaseTester
+from bft.testers.result_cache import ResultCache
+from tools.convert_testcases.convert_testcases_to_yaml_format import (
+    convert_directory as convert_directory_from_substrait,
+)
+
+BFT_DIR = Path(__file__).parent.parent
+
+# Engine name -> tester class, imported only when the engine is run
+TESTERS = {
+    "cudf": "bft.testers.cudf.tester.CudfTester",
+    "datafusion": "bft.testers.datafusion.tester.DatafustionTester",
+    "duckdb": "bft.testers.duckdb.tester.DuckDBTester",
+    "postgres": "bft.testers.postgres.tester.PostgresTester",
+    "snowflake": "bft.testers.snowflake.tester.SnowflakeTester",
+    "sqlite": "bft.testers.sqlite.tester.SqliteTester",
+    "velox": "bft.testers.velox.tester.VeloxTester",
+}
+
+OUTCOMES = [PASSED, FAILED, XFAILED, SKIPPED]
+
+
+class Failure(NamedTuple):
+    function: str
+    group: str
+    index: int
+    reason: str
+
+
+class RunSummary(NamedTuple):
+    engine: str
+    counts: Dict[str, int]
+    failures: List[Failure]
+    seconds: float
+
+    def __str__(self) -> str:
+        counts = ", ".join(
+            f"{self.counts[outcome]} {outcome}" for outcome in OUTCOMES if self.counts[outcome]
+        )
+        return f"{self.engine}: {counts or 'no cases'} in {self.seconds:.2f}s"
+
+
+def load_corpus(case_filter: CaseFilter = None) -> List[Case]:
+    """
+    Converts the substrait test cases, if they changed, and loads the cases of the
+    tree that case_filter selects
+    """
+    cases_dir = BFT_DIR / "cases"
+    substrait_cases_dir = BFT_DIR / "substrait" / "tests" / "cases"
+    convert_directory_from_substrait(substrait_cases_dir, cases_dir, incremental=True)
+    return list(iter_cases(cases_dir.resolve(), case_filter))
+
+
+def load_tester(engine: str) -> BaseTester:
+    module_name, class_name = TESTERS[engine].rsplit(".", 1)
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+def run_engine(
+    tester: BaseTester,
+    engine: str,
+    cases: List[Case],
+    dialects: DialectsLibrary,
+    jobs: int,
+    result_cache: ResultCache = None,
+    selection: Selection = None,
+) -> RunSummary:
+    start = time.perf_counter()
+    tester.prepare(dialects, result_cache)
+    if selection is not None:
+        cases = [case for case in cases if selection.selects(tester.dialect.name, case)]
+    counts = {outcome: 0 for outcome in OUTCOMES}
+    failures = []
+    # (function, group) -> cases seen so far, to tell the cases of a group apart
+    group_indices: Dict[Tuple[str, str], int] = {}
+    for outcome in tester.run_outcomes(cases, jobs):
+        key = (outcome.case.function, outcome.case.group.id)
+        index = group_indices.get(key, 0)
+        group_indices[key] = index + 1
+        counts[outcome.outcome] += 1
+        if outcome.outcome == FAILED:
+            failures.append(Failure(*key, index, outcome.reason))
+    return RunSummary(engine, counts, failures, time.perf_counter() - start)
+
+
+def select_affected(
+    old_files: List[DialectFile],
+    new_files: List[DialectFile],
+    cases: List[Case],
+    edited: List[Case],
+) -> Selection:
+    """
+    Selects, for every dialect, the cases whose outcome a change can affect
+
+    Those are the cases whose mapping differs between the old and new version of
+    the dialect and the edited cases.  All cases are selected for new dialects.
+    """
+    old_by_name = {dfile.name: dfile for dfile in old_files}
+    selection = Selection()
+    for new_file in new_files:
+        old_file = old_by_name.get(new_file.name, None)
+        if old_file is None:
+            selection.add(new_file.name, cases)
+            continue
+        selection.add(new_file.name, affected_cases(old_file, new_file, cases))
+        selection.add(new_file.name, edited)
+    return selection
+
+
+def split_values(value: str):
+    if value is None:
+        return None
+    return {item.strip() for item in value.split(",")}
+
+
+def run_command(args) -> int:
+    if args.timings is not None:
+        # Set in the environment so that worker processes record timings too
+        os.environ[TIMINGS_ENV] = "1"
+        case_timings.enabled = True
+    functions = split_values(args.filter)
+    selection = None
+    if args.select is not None:
+        selection = Selection.load(args.select)
+        if functions is None:
+            functions = selection.functions()
+        else:
+            functions = functions & selection.functions()
+    case_filter = CaseFilter(functions, split_values(args.base_uris), split_values(args.groups))
+    cases = load_corpus(None if case_filter == CaseFilter() else case_filter)
+    dialects = load_dialects(str(Path(args.dialects_dir).resolve()))
+    result_cache = None
+    if args.cache_results or args.force:
+        result_cache = ResultCache(force=args.force)
+
+    failed = False
+    for engine in args.engine:
+        try:
+            tester = load_tester(engine)
+        except ImportError as err:
+            print(f"{engine}: not installed ({err})")
+            failed = True
+            continue
+        summary = run_engine(
+            tester, engine, cases, dialects, args.jobs, result_cache, selection
+        )
+        for failure in summary.failures:
+            print(
+                f"FAILED {engine} {failure.function} {failure.group} "
+                f"#{failure.index}: {failure.reason}"
+            )
+        print(summary)
+        failed = failed or bool(summary.failures)
+
+    if result_cache is not None:
+        print(f"{result_cache.hits} results reused, {result_cache.misses} cases run")
+    if args.timings is not None:
+        case_timings.write_report(args.timings)
+        print(f"Timings written to {args.timings}")
+    return 1 if failed else 0
+
+
+def impact_command(args) -> int:
+    cases = load_corpus()
+    edited = []
+    if args.old_cases is not None:
+        edited = changed_cases(iter_cases(Path(args.old_cases).resolve()), cases)
+        print(f"{len(edited)} cases added or edited")
+    old_files = load_dialect_files(args.old_dialects)
+    new_files = load_dialect_files(args.dialects_dir)
+    old_by_name = {dfile.name: dfile for dfile in old_files}
+    for new_file in new_files:
+        if new_file.name not in old_by_name:
+            print(f"{new_file.name}: new dialect")
+            continue
+        diff = diff_dialect_files(old_by_name[new_file.name], new_file)
+        for change in diff.functions:
+            fields = f" ({', '.join(change.fields)})" if change.fields else ""
+            print(f"{diff.name}: {change.change} {change.name}{fields}")
+        if diff.supported_types_changed:
+            print(f"{diff.name}: changed supported_types")
+        if diff.prefixes_changed:
+            print(f"{diff.name}: changed dependencies")
+    selection = select_affected(old_files, new_files, cases, edited)
+    for dialect in selection.dialects():
+        print(f"{dialect}: {selection.num_cases(dialect)} cases selected")
+    selection.save(args.output)
+    print(f"Selection written to {args.output}")
+    return 0
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="bft", description="The Big Function Taxonomy")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser(
+        "run", help="Run the cases against engines and summarize the outcomes"
+    )
+    run_parser.add_argument(
+        "--engine",
+        nargs="+",
+        required=True,
+        choices=list(TESTERS.keys()),
+        help="Engines to run the cases against",
+    )
+    run_parser.add_argument(
+        "--jobs", type=int, default=1, help="Number of worker processes per engine"
+    )
+    run_parser.add_argument(
+        "--filter", metavar="FUNCTIONS", help="Comma separated functions to run the cases of"
+    )
+    run_parser.add_argument("--base-uris", help="Comma separated base URIs to run the cases of")
+    run_parser.add_argument("--groups", help="Comma separated groups to run the cases of")
+    run_parser.add_argument(
+        "--dialects-dir", default=str(BFT_DIR / "dialects"), help="Directory of dialect files"
+    )
+    run_parser.add_argument(
+        "--select",
+        metavar="PATH",
+        help="Run only the cases selected for each engine's dialect, see bft impact",
+    )
+    run_parser.add_argument(
+        "--cache-results",
+        action="store_true",
+        help="Reuse stored results of cases whose content, mapping and engine version are unchanged",
+    )
+    run_parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Run every case again and replace the stored results (implies --cache-results)",
+    )
+    run_parser.add_argument(
+        "--timings",
+        metavar="PATH",
+        help="Record the time spent per function and phase and write it to PATH (.json or .csv)",
+    )
+
+    impact_parser = subparsers.add_parser(
+        "impact", help="Select the cases whose outcome changes to dialects or cases can affect"
+    )
+    impact_parser.add_argument(
+        "--old-dialects", required=True, help="Directory of the dialect files before the change"
+    )
+    impact_parser.add_argument(
+        "--dialects-dir",
+        default=str(BFT_DIR / "dialects"),
+        help="Directory of the dialect files after the change",
+    )
+    impact_parser.add_argument(
+        "--old-cases", help="Directory of the case files before the change, if they changed"
+    )
+    impact_parser.add_argument(
+        "--output", default="selection.json", help="Where to write the selection"
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        return run_command(args)
+    if args.command == "impact":
+        return impact_command(args)
+    return 0
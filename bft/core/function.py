@@ -58,8 +58,11 @@ class FunctionBuilder(object):
     def note_option(self, name: str, values: List[str]):
         if name in self.options:
             existing_values = self.options[name]
-            # Merge existing values and new values using set union
-            self.options[name] = list(set(existing_values).union(values))
+            # Merge existing values and new values, keeping the order they were
+            # first seen in so the generated site is stable from run to run
+            self.options[name] = existing_values + [
+                value for value in values if value not in existing_values
+            ]
         else:
             # Add the new values directly if the option does not exist
             self.options[name] = values
@@ -1,12 +1,9 @@
-import math
 from abc import ABC, abstractmethod
 from decimal import Decimal
 from typing import BinaryIO, Generic, Iterable, List, TypeVar
 
 import yaml
 
-from bft.cases.types import CaseLiteral
-
 try:
     from yaml import CSafeDumper as SafeDumper
     from yaml import CSafeLoader as SafeLoader
@@ -16,6 +13,34 @@ except ImportError:
 T = TypeVar("T")
 
 
+def get_decimal_value(loader: SafeLoader, node: yaml.ScalarNode):
+    value = loader.construct_scalar(node)
+    if isinstance(value, str) and value.lower() == 'null':
+        return None
+    return Decimal(value)
+
+
+def decimal_constructor(loader: SafeLoader, node: yaml.ScalarNode):
+    return get_decimal_value(loader, node)
+
+
+def list_of_decimal_constructor(loader: SafeLoader, node: yaml.nodes.SequenceNode):
+    return [get_decimal_value(loader, item) for item in node.value]
+
+
+class BftLoader(SafeLoader):
+    """
+    The loader shared by every BFT yaml parser
+
+    Based on the libyaml backed loader when it is available.  The custom tags are
+    registered once on this subclass rather than on PyYAML's global SafeLoader.
+    """
+
+
+BftLoader.add_constructor("!decimal", decimal_constructor)
+BftLoader.add_constructor("!decimallist", list_of_decimal_constructor)
+
+
 class BaseYamlVisitor(ABC, Generic[T]):
     def __init__(self):
         self.__location_stack: List[str] = []
@@ -34,19 +59,6 @@ class BaseYamlVisitor(ABC, Generic[T]):
                 self.__location_stack.append(f"{attr}[{idx}]")
                 results.append(visitor(item))
                 self.__location_stack.pop()
-            for result in results:
-                if isinstance(result, CaseLiteral) and isinstance(result.value, list):
-                    if len(result.value) > 0:
-                        for i, s in enumerate(result.value):
-                            lower_s = str(s).lower()
-                            if lower_s.startswith("'inf'"):
-                                result.value[i] = float("inf")
-                            elif lower_s.startswith("'-inf'"):
-                                result.value[i] = float("-inf")
-                            elif lower_s.startswith("'nan'"):
-                                result.value[i] = math.nan
-                        results.append(CaseLiteral(result.value, result.type, result.is_not_a_func_arg))
-                        results.remove(result)
             return results
         elif required:
             self._fail(f"Expected required attribute {attr}")
@@ -92,23 +104,7 @@ class BaseYamlParser(ABC, Generic[T]):
         pass
 
     def get_loader(self):
-        loader = yaml.SafeLoader
-        """Add tag "!decimal" to the loader """
-        loader.add_constructor("!decimal", self.decimal_constructor)
-        loader.add_constructor("!decimallist", self.list_of_decimal_constructor)
-        return loader
-
-    def decimal_constructor(self, loader: yaml.SafeLoader, node: yaml.nodes.MappingNode):
-        return self.get_decimal_value(loader, node)
-
-    def get_decimal_value(self, loader: yaml.SafeLoader, node: yaml.ScalarNode):
-        value = loader.construct_scalar(node)
-        if isinstance(value, str) and value.lower() == 'null':
-            return None
-        return Decimal(value)
-
-    def list_of_decimal_constructor(self, loader: yaml.SafeLoader, node: yaml.nodes.MappingNode):
-        return [self.get_decimal_value(loader, item) for item in node.value]
+        return BftLoader
 
     def parse(self, f: BinaryIO) -> List[T]:
         loader = self.get_loader()
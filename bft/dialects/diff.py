@@ -0,0 +1,96 @@
+from typing import Dict, List, NamedTuple
+
+from bft.cases.types import Case, case_signature
+
+from .types import Dialect, DialectFile, DialectFunction, SqlMapping
+
+
+class FunctionChange(NamedTuple):
+    name: str
+    # "added", "removed" or "changed"
+    change: str
+    # The DialectFunction fields that differ, for changed functions
+    fields: List[str]
+
+
+class DialectDiff(NamedTuple):
+    name: str
+    functions: List[FunctionChange]
+    supported_types_changed: bool
+    prefixes_changed: bool
+
+    def is_empty(self) -> bool:
+        return not (self.functions or self.supported_types_changed or self.prefixes_changed)
+
+
+def functions_by_name(dialect_file: DialectFile) -> Dict[str, DialectFunction]:
+    return {
+        dfunc.name: dfunc
+        for dfunc in dialect_file.scalar_functions + dialect_file.aggregate_functions
+    }
+
+
+def diff_dialect_files(old: DialectFile, new: DialectFile) -> DialectDiff:
+    old_functions = functions_by_name(old)
+    new_functions = functions_by_name(new)
+    changes = []
+    for name in sorted(old_functions.keys() | new_functions.keys()):
+        old_func = old_functions.get(name, None)
+        new_func = new_functions.get(name, None)
+        if old_func is None:
+            changes.append(FunctionChange(name, "added", []))
+        elif new_func is None:
+            changes.append(FunctionChange(name, "removed", []))
+        elif old_func != new_func:
+            fields = [
+                field
+                for field in DialectFunction._fields
+                if getattr(old_func, field) != getattr(new_func, field)
+            ]
+            changes.append(FunctionChange(name, "changed", fields))
+    return DialectDiff(
+        new.name,
+        changes,
+        set(old.supported_types) != set(new.supported_types),
+        old.uri_to_func_prefix != new.uri_to_func_prefix,
+    )
+
+
+def mapping_or_none(dialect: Dialect, case: Case) -> SqlMapping:
+    if not dialect.supports_function(case):
+        return None
+    return dialect.mapping_for_case(case)
+
+
+def affected_cases(old: DialectFile, new: DialectFile, cases: List[Case]) -> List[Case]:
+    """
+    Returns the cases whose mapping differs between the two versions of a dialect
+
+    Only the cases of changed functions are looked at, unless the supported types
+    or function prefixes changed, which can change the mapping of any case.
+    """
+    diff = diff_dialect_files(old, new)
+    if diff.is_empty():
+        return []
+    old_dialect = Dialect(old)
+    new_dialect = Dialect(new)
+    if not (diff.supported_types_changed or diff.prefixes_changed):
+        changed = {change.name for change in diff.functions}
+        cases = [
+            case
+            for case in cases
+            if old_dialect._get_function_name(case) in changed
+            or new_dialect._get_function_name(case) in changed
+        ]
+    # Cases with the same signature have the same mapping, compare it once
+    affected: Dict[tuple, bool] = {}
+    selected = []
+    for case in cases:
+        signature = case_signature(case)
+        if signature not in affected:
+            affected[signature] = mapping_or_none(old_dialect, case) != mapping_or_none(
+                new_dialect, case
+            )
+        if affected[signature]:
+            selected.append(case)
+    return selected
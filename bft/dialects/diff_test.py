@@ -0,0 +1,75 @@
+from bft.cases.selection import Selection
+from bft.cases.types import Case, CaseGroup, CaseLiteral
+from bft.dialects.diff import affected_cases, diff_dialect_files
+from bft.dialects.parser import DialectFileParser
+
+URI = "https://github.com/substrait-io/substrait/blob/main/extensions/functions_arithmetic.yaml"
+
+DIALECT = """
+name: test
+type: sql
+dependencies:
+  arithmetic: {uri}
+supported_types:
+  i32:
+    sql_type_name: INTEGER
+  i64:
+    sql_type_name: BIGINT
+scalar_functions:
+- name: arithmetic.add
+  local_name: +
+  infix: true
+  supported_kernels:
+  - i32_i32
+  {extra_kernel}
+- name: arithmetic.abs
+  supported_kernels:
+  - i32
+"""
+
+
+def parse_dialect(extra_kernel: str = ""):
+    content = DIALECT.format(uri=URI, extra_kernel=extra_kernel).encode("utf-8")
+    return DialectFileParser().parse(content)[0]
+
+
+def make_case(function: str, arg_type: str, value: int) -> Case:
+    return Case(
+        function,
+        URI,
+        CaseGroup("basic", ""),
+        [CaseLiteral(value, arg_type)] * (2 if function == "add" else 1),
+        CaseLiteral(value, arg_type),
+        [],
+    )
+
+
+def test_affected_cases():
+    old = parse_dialect()
+    new = parse_dialect("- i64_i64")
+    diff = diff_dialect_files(old, new)
+    assert [(change.name, change.change, change.fields) for change in diff.functions] == [
+        ("arithmetic.add", "changed", ["supported_kernels"])
+    ]
+    cases = [
+        make_case("add", "i32", 1),
+        make_case("add", "i64", 2),
+        make_case("add", "i64", 3),
+        make_case("abs", "i64", 4),
+    ]
+    assert affected_cases(old, new, cases) == cases[1:3]
+    assert affected_cases(new, new, cases) == []
+
+
+def test_selection_round_trip(tmp_path):
+    cases = [make_case("add", "i32", 1), make_case("abs", "i32", 2)]
+    selection = Selection()
+    selection.add("test", cases[:1])
+    selection.save(tmp_path / "selection.json")
+
+    loaded = Selection.load(tmp_path / "selection.json")
+    assert loaded.functions() == {"add"}
+    assert loaded.selects("test", cases[0])
+    assert not loaded.selects("test", cases[1])
+    assert not loaded.selects("other", cases[0])
+    assert not loaded.selects("test", cases[0]._replace(result=CaseLiteral(5, "i32")))
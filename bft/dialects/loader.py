@@ -5,11 +5,15 @@ from .parser import DialectFileParser
 from .types import DialectFile, DialectsLibrary
 
 
-def load_dialects(dialects_dir: str) -> DialectsLibrary:
+def load_dialect_files(dialects_dir: str) -> List[DialectFile]:
     parser = DialectFileParser()
     dialect_files: List[DialectFile] = []
     for dialect_path in Path(dialects_dir).rglob("*.yaml"):
         with open(dialect_path, "rb") as dialect_f:
             for dialect_file in parser.parse(dialect_f):
                 dialect_files.append(dialect_file)
-    return DialectsLibrary(dialect_files)
+    return dialect_files
+
+
+def load_dialects(dialects_dir: str) -> DialectsLibrary:
+    return DialectsLibrary(load_dialect_files(dialects_dir))
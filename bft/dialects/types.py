@@ -1,9 +1,15 @@
 import os
-from typing import Dict, List, NamedTuple
+from typing import Dict, FrozenSet, List, NamedTuple, Set, Tuple
 
 import pytest
 
-from bft.cases.types import Case, CaseLiteral, Literal, case_to_kernel_str
+from bft.cases.types import (
+    Case,
+    CaseLiteral,
+    Literal,
+    case_signature,
+    case_to_kernel_str,
+)
 from bft.core.function import Kernel
 
 
@@ -98,6 +104,76 @@ class SqlMapping(NamedTuple):
     reason: str
 
 
+def base_type(arg_type: str) -> str:
+    # dialect supports base type and function support is checked against base type.
+    # if type is a parametrized type (e.g. decimal<38, 1>), get the base type (e.g. decimal)
+    # else type is base type
+    return arg_type.split("<")[0].strip() if "<" in arg_type else arg_type
+
+
+class KernelMatcher(object):
+    """
+    The supported kernels of a DialectFunction compiled for fast lookups
+
+    Kernels made only of concrete types are kept in a set of exact signatures.
+    Kernels that use any types, and all kernels of variadic functions, are
+    checked one by one.
+    """
+
+    def __init__(self, dfunc: DialectFunction, supported_types: FrozenSet[str]):
+        self.__aggregate = dfunc.aggregate
+        self.__variadic = dfunc.variadic_min != -1
+        self.__supported_types = supported_types
+        self.__exact_kernels: Set[Tuple[str, ...]] = set()
+        self.__generic_kernels: List[Tuple[str, ...]] = []
+        for kernel in dfunc.supported_kernels:
+            arg_types = tuple(kernel.arg_types)
+            if self.__variadic or any(ktype.startswith("any") for ktype in arg_types):
+                self.__generic_kernels.append(arg_types)
+            else:
+                self.__exact_kernels.add(arg_types)
+
+    def __matches_generic(self, kernel_arg_types: Tuple[str, ...], arg_types: Tuple[str, ...]):
+        if self.__variadic and len(kernel_arg_types) == 1:
+            kernel_arg_types = kernel_arg_types * len(arg_types)
+        any_map = {}
+        for ktype, type_to_check in zip(kernel_arg_types, arg_types):
+            # if supported argument type is any(i.e. allows all type supported by dialect),
+            # check if the case type is one of the supported type by dialect
+            if ktype.startswith("any"):
+                if ktype not in any_map:
+                    if type_to_check not in self.__supported_types:
+                        return False
+                    any_map[ktype] = type_to_check
+                elif any_map[ktype] != type_to_check:
+                    return False
+            elif type_to_check != ktype:
+                return False
+        return True
+
+    def matches(self, args: List[CaseLiteral]) -> bool:
+        arg_types = tuple(base_type(arg.type) for arg in args)
+        if self.__variadic:
+            return any(
+                self.__matches_generic(kernel, arg_types)
+                for kernel in self.__generic_kernels
+            )
+        if self.__aggregate:
+            arg_len = 1
+            if len(args) == 0 or args[0].is_not_a_func_arg:
+                arg_len = 0
+        else:
+            arg_len = len(args)
+        arg_types = arg_types[:arg_len]
+        if arg_types in self.__exact_kernels:
+            return True
+        return any(
+            self.__matches_generic(kernel, arg_types)
+            for kernel in self.__generic_kernels
+            if len(kernel) == arg_len
+        )
+
+
 class Dialect(object):
     def __init__(self, dialect_file: DialectFile):
         self.name = dialect_file.name
@@ -111,6 +187,18 @@ class Dialect(object):
         self.__func_prefixes: Dict[str, str] = {
             uri: prefix for uri, prefix in dialect_file.uri_to_func_prefix.items()
         }
+        supported_types = frozenset(self.supported_types)
+        self.__kernel_matchers: Dict[str, KernelMatcher] = {}
+        self.__kernel_signatures: Dict[str, Set[Tuple[str, ...]]] = {}
+        for name in self.__aggregate_functions_by_name.keys() | self.__scalar_functions_by_name.keys():
+            dfunc = self.__scalar_functions_by_name.get(name) or self.__aggregate_functions_by_name[name]
+            self.__kernel_matchers[name] = KernelMatcher(dfunc, supported_types)
+        for name, dfunc in self.__scalar_functions_by_name.items():
+            self.__kernel_signatures[name] = {
+                tuple(kernel.arg_types) for kernel in dfunc.supported_kernels
+            }
+        # case_signature(case) -> mapping, see mapping_for_case
+        self.__mappings: Dict[Tuple, SqlMapping] = {}
 
     def __supports_case_kernel(
             self,
@@ -118,47 +206,8 @@ class Dialect(object):
             args: List[CaseLiteral],
             result: CaseLiteral | Literal["error", "undefined"],
     ):
-        # figure out if case is a supported kernel. walk over each supported kernel and check if any kernel
-        # matches the case arguments type
-        for supported_kernel in dfunc.supported_kernels:
-            if dfunc.aggregate:
-                arg_len = 1
-                if len(args) == 0 or args[0].is_not_a_func_arg:
-                    arg_len = 0
-            else:
-                arg_len = len(args)
-            if len(supported_kernel.arg_types) != arg_len and dfunc.variadic_min == -1:
-                continue
-            matched = True
-            kernel_arg_types = supported_kernel.arg_types
-            if dfunc.variadic_min != -1 and len(supported_kernel.arg_types) == 1:
-                kernel_arg_types = supported_kernel.arg_types * len(args)
-
-            any_map = {}
-            for ktype, arg in zip(kernel_arg_types, args):
-                arg_type = arg.type
-                # dialect supports base type and function support is checked against base type.
-                # get base type:
-                # if type is a parametrized type (e.g. decimal<38, 1>), get the base type (e.g. decimal)
-                # else type is base type
-                type_to_check = arg_type.split("<")[0].strip() if "<" in arg_type else arg_type
-                if type_to_check != ktype and not ktype.startswith("any"):
-                    matched = False
-                    break
-                # if supported argument type is any(i.e. allows all type supported by dialect),
-                # check if the case type is one of the supported type by dialect
-                if ktype.startswith("any"):
-                    if ktype not in any_map:
-                        if type_to_check not in self.supported_types:
-                            matched = False
-                            break
-                        any_map[ktype] = type_to_check
-                    elif any_map[ktype] != type_to_check:
-                        matched = False
-                        break
-            if matched:
-                return None
-
+        if self.__kernel_matchers[dfunc.name].matches(args):
+            return None
         return f"The dialect {self.name} does not support the kernel {case_to_kernel_str(dfunc.name, args, result)}"
 
     def __supports_options(self, dfunc: DialectFunction, case: Case):
@@ -178,20 +227,10 @@ class Dialect(object):
         return getattr(dfunc, "required_options", None)
 
     def supports_kernel(self, function_name: str, kernel: Kernel) -> bool:
-        dfunc = self.__scalar_functions_by_name.get(function_name, None)
-        if dfunc is None:
+        signatures = self.__kernel_signatures.get(function_name, None)
+        if signatures is None:
             return False
-        for supported_kernel in dfunc.supported_kernels:
-            if len(supported_kernel.arg_types) != len(kernel.arg_types):
-                continue
-            matched = True
-            for ktype, arg_type in zip(supported_kernel.arg_types, kernel.arg_types):
-                if arg_type != ktype:
-                    matched = False
-                    break
-            if matched:
-                return True
-        return False
+        return tuple(kernel.arg_types) in signatures
 
     def _get_function_name(self, case: Case) -> str:
         prefix = self.__func_prefixes.get(case.base_uri, "")
@@ -199,7 +238,25 @@ class Dialect(object):
             return prefix + "." + case.function
         return case.function
 
+    def supports_function(self, case: Case) -> bool:
+        func_name = self._get_function_name(case)
+        return (
+            func_name in self.__scalar_functions_by_name
+            or func_name in self.__aggregate_functions_by_name
+        )
+
     def mapping_for_case(self, case: Case) -> SqlMapping:
+        # Everything the mapping depends on is part of the case signature, so
+        # cases that share one share the same (immutable) mapping
+        key = case_signature(case)
+        mapping = self.__mappings.get(key, None)
+        if mapping is None:
+            mapping = self.__mapping_for_case(case)
+            if mapping is not None:
+                self.__mappings[key] = mapping
+        return mapping
+
+    def __mapping_for_case(self, case: Case) -> SqlMapping:
         func_name = self._get_function_name(case)
         dfunc_scalar = self.__scalar_functions_by_name.get(func_name, None)
         dfunc_aggregate = self.__aggregate_functions_by_name.get(func_name, None)
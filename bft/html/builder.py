@@ -1,16 +1,22 @@
+import filecmp
+import hashlib
+import json
 import pathlib
 import re
-from typing import Dict, List, MutableSet, NamedTuple
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from typing import Collection, Dict, Iterable, List, MutableSet, NamedTuple, Set, Tuple
 
 import yaml
 from jinja2 import Environment, PackageLoader, select_autoescape
 
-from bft.cases.loader import load_cases
+from bft.cases.index import CaseFileIndex, IndexEntry
+from bft.cases.loader import CaseFilter, iter_cases
 from bft.cases.types import Case
 from bft.core.function import FunctionDefinition, Kernel, Option
 from bft.core.index_parser import IndexFunctionsFile, load_index
-from bft.dialects.loader import load_dialects
-from bft.dialects.types import Dialect, DialectsLibrary
+from bft.dialects.loader import load_dialect_files
+from bft.dialects.types import Dialect, DialectFile, DialectFunction, DialectsLibrary
 from bft.html.types import (
     FunctionDetailInfo,
     FunctionDialectInfo,
@@ -49,6 +55,182 @@ def render_function(info: FunctionInfo):
 def render_function_index(info: FunctionIndexInfo):
     return function_index_template.render(info._asdict())
 
+
+# Records the fingerprint of every page written by an incremental build
+MANIFEST_FILE = ".site_manifest.json"
+
+# A page to write, the name of the output file and the info it is rendered from
+Page = Tuple[str, FunctionInfo | FunctionIndexInfo]
+
+
+def render_page(info: FunctionInfo | FunctionIndexInfo) -> str:
+    if isinstance(info, FunctionIndexInfo):
+        return render_function_index(info)
+    return render_function(info)
+
+
+def write_page(dest_dir: pathlib.Path, page: Page):
+    file_name, info = page
+    with open(dest_dir / file_name, mode="w") as out:
+        out.write(render_page(info))
+
+
+def templates_version() -> bytes:
+    hasher = hashlib.sha256()
+    for template in [func_template, function_index_template]:
+        source, _, _ = env.loader.get_source(env, template.name)
+        hasher.update(source.encode("utf-8"))
+    return hasher.digest()
+
+
+def hash_files(paths: Iterable[pathlib.Path]) -> bytes:
+    hasher = hashlib.sha256()
+    for path in sorted(paths):
+        hasher.update(str(path).encode("utf-8"))
+        hasher.update(path.read_bytes())
+    return hasher.digest()
+
+
+def case_digests(cases_dirs: List[pathlib.Path], functions: Collection[str]) -> Dict[str, bytes]:
+    """
+    Hashes, per function, the case file documents that hold its cases
+
+    The documents are found with CaseFileIndex so no case file is parsed.
+    """
+    hashers = {}
+    for cases_dir in cases_dirs:
+        index = CaseFileIndex(cases_dir)
+        index.refresh()
+        documents_by_path: Dict[str, List[IndexEntry]] = {}
+        for entry in index.entries():
+            if entry.function in functions:
+                documents_by_path.setdefault(entry.path, []).append(entry)
+        for path in sorted(documents_by_path):
+            content = (index.cases_dir / path).read_bytes()
+            for entry in documents_by_path[path]:
+                hasher = hashers.setdefault(entry.function, hashlib.sha256())
+                hasher.update(f"{cases_dir}/{path}:{entry.offset}".encode("utf-8"))
+                hasher.update(content[entry.offset : entry.offset + entry.length])
+    return {function: hasher.digest() for function, hasher in hashers.items()}
+
+
+def supplement_digest(supplement: SupplementsFile) -> bytes:
+    # Option, property and value descriptions can pull in the definitions file
+    # of the supplement's directory when they are rendered
+    definitions = pathlib.Path(supplement.dir_path) / "definitions.yaml"
+    paths = [definitions] if supplement.dir_path and definitions.is_file() else []
+    return repr(supplement).encode("utf-8") + hash_files(paths)
+
+
+class DialectEntries(object):
+    """
+    The parts of the dialect files a function page is rendered from
+
+    A page shows, for each dialect, the entries of its function (whether it is
+    supported, its required options and kernels) and what the supported types
+    let through, so an edit to another function's entry leaves the page alone.
+    """
+
+    def __init__(self, dialect_files: List[DialectFile]):
+        self.dialect_files = dialect_files
+        # dialect name -> simplified function name -> the dialect's functions
+        self.__functions: Dict[str, Dict[str, List[DialectFunction]]] = {}
+        for dialect_file in dialect_files:
+            functions = self.__functions.setdefault(dialect_file.name, {})
+            for dfunc in dialect_file.scalar_functions + dialect_file.aggregate_functions:
+                # Cases look functions up with the prefix of their URI
+                simple_name = dfunc.name.rsplit(".", 1)[-1]
+                functions.setdefault(simple_name, []).append(dfunc)
+
+    def digest(self, func_name_full: str) -> bytes:
+        entries = [
+            (
+                dialect_file.name,
+                dialect_file.type,
+                dialect_file.uri_to_func_prefix,
+                dialect_file.supported_types,
+                self.__functions[dialect_file.name].get(func_name_full, []),
+            )
+            for dialect_file in self.dialect_files
+        ]
+        return hashlib.sha256(repr(entries).encode("utf-8")).digest()
+
+
+def function_fingerprint(
+    func: FunctionDefinition,
+    cases_digest: bytes,
+    supplement: SupplementsFile,
+    dialect_digest: bytes,
+    version: bytes,
+) -> str:
+    """Hashes everything a function page is rendered from, without rendering it"""
+    definition = (func.name, func.uri, func.description, func.options, func.kernels)
+    hasher = hashlib.sha256(version)
+    hasher.update(repr(definition).encode("utf-8"))
+    hasher.update(cases_digest)
+    hasher.update(supplement_digest(supplement))
+    hasher.update(dialect_digest)
+    return hasher.hexdigest()
+
+
+def index_fingerprint(functions: List[FunctionDefinition], version: bytes) -> str:
+    items = [(func.name, func.uri, func.description) for func in functions]
+    return hashlib.sha256(version + repr(items).encode("utf-8")).hexdigest()
+
+
+def load_manifest(dest_dir: pathlib.Path) -> Dict[str, str]:
+    try:
+        with open(dest_dir / MANIFEST_FILE) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_manifest(dest_dir: pathlib.Path, manifest: Dict[str, str]):
+    with open(dest_dir / MANIFEST_FILE, mode="w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def changed_pages(dest_dir: pathlib.Path, manifest: Dict[str, str]) -> Set[str]:
+    """
+    Returns the pages of manifest that differ from the last build in dest_dir
+
+    Pages no longer produced are removed.
+    """
+    previous = load_manifest(dest_dir)
+    for stale in previous.keys() - manifest.keys():
+        (dest_dir / stale).unlink(missing_ok=True)
+    return {
+        name
+        for name, fingerprint in manifest.items()
+        if previous.get(name) != fingerprint or not (dest_dir / name).exists()
+    }
+
+
+def write_pages(dest_dir: pathlib.Path, pages: List[Page], jobs: int):
+    if jobs > 1 and len(pages) > 1:
+        with ProcessPoolExecutor(jobs) as executor:
+            list(executor.map(write_page, [dest_dir] * len(pages), pages))
+    else:
+        for page in pages:
+            write_page(dest_dir, page)
+
+
+def copy_with_progress(src, dst, copy_function=shutil.copy2):
+    """Copies the files under src to dst, skipping those dst already has unchanged"""
+    for source_path in pathlib.Path(src).rglob("*"):
+        relative_path = source_path.relative_to(src)
+        destination_path = pathlib.Path(dst) / relative_path
+
+        if source_path.is_file():
+            if destination_path.exists() and filecmp.cmp(
+                source_path, destination_path, shallow=False
+            ):
+                continue
+            destination_path.parent.mkdir(parents=True, exist_ok=True)
+            copy_function(source_path, destination_path)
+            print(f"Copying: {source_path} -> {destination_path}")
+
 def replace_pattern_sequences(content, dir_path):
     pattern = re.compile(r'/\[%([\w\s]+)\$([\w\s]+)%\]')
     matches = re.finditer(pattern, content)
@@ -119,27 +301,38 @@ def create_examples(cases: List[Case]) -> List[FunctionExampleCaseInfo]:
     return examples
 
 
-def create_example_groups(cases: List[Case]) -> List[FunctionExampleGroupInfo]:
-    groups: Dict[str, Case] = {}
+def index_cases(cases: Iterable[Case]) -> Dict[str, Dict[str, List[Case]]]:
+    """
+    Indexes cases by function name and then by group id in a single pass
+
+    Cases keep their original order within each group.
+    """
+    index: Dict[str, Dict[str, List[Case]]] = {}
     for case in cases:
-        # This may clobber previous insertions.  We just need one prototypical case per group
-        # Prefer a case that actually has a typed result if possible
-        if case.group.id not in groups or hasattr(case.result, "type"):
-            groups[case.group.id] = case
+        index.setdefault(case.function, {}).setdefault(case.group.id, []).append(case)
+    return index
+
 
+def create_example_groups(
+    cases_by_group: Dict[str, List[Case]]
+) -> List[FunctionExampleGroupInfo]:
     example_groups: List[FunctionExampleGroupInfo] = []
     ordered_cases: List[Case] = []
-    for group_id in sorted(groups.keys()):
-        protocase = groups[group_id]
+    for group_id in sorted(cases_by_group.keys()):
+        group_cases = cases_by_group[group_id]
+        # We just need one prototypical case per group
+        # Prefer (the last) case that actually has a typed result if possible
+        protocase = group_cases[0]
+        for case in group_cases:
+            if hasattr(case.result, "type"):
+                protocase = case
         arg_types = [arg.type for arg in protocase.args]
         opt_names = [opt[0] for opt in protocase.options]
         if hasattr(protocase.result, "type"):
             result_type = protocase.result.type
         else:
             result_type = protocase.result
-        group_cases = [c for c in cases if c.group.id == group_id]
-        for case in group_cases:
-            ordered_cases.append(case)
+        ordered_cases.extend(group_cases)
         examples = create_examples(group_cases)
         description = protocase.group.description
         example_groups.append(
@@ -182,7 +375,7 @@ def create_dialect(
 
 def create_function_info(
     func: FunctionDefinition,
-    cases: List[Case],
+    cases_by_group: Dict[str, List[Case]],
     supplements: SupplementsFile,
     dialects: DialectsLibrary,
 ) -> FunctionInfo:
@@ -192,7 +385,7 @@ def create_function_info(
     brief = func.description
     options = [create_function_option(opt, supplements) for opt in func.options]
     kernels = func.kernels
-    example_groups, ordered_cases = create_example_groups(cases)
+    example_groups, ordered_cases = create_example_groups(cases_by_group)
 
     dialects = [
         create_dialect(name, dialect, ordered_cases, func.kernels)
@@ -236,7 +429,16 @@ def find_simplified_name(name: str) -> str:
     return func_name_full
 
 
-def build_site(index_path: str, dest_dir):
+def build_site(index_path: str, dest_dir, incremental: bool = False, jobs: int = 1):
+    """
+    Renders a page per function, and the function index, into dest_dir
+
+    In incremental mode each page is fingerprinted by its inputs (the function's
+    extension definition, case documents, supplement and dialect entries) and
+    only the pages whose fingerprint changed since the last build are rendered.
+    Cases are only read for those pages.
+    """
+    dest_dir = pathlib.Path(dest_dir)
     root = pathlib.Path(index_path).parent
     index_contents = load_index(index_path)
     library_builder = LibraryBuilder()
@@ -247,11 +449,7 @@ def build_site(index_path: str, dest_dir):
                 resolved_location, ExtensionFileParser().parse(f), library_builder
             )
     functions = library_builder.finish()
-
-    cases: List[Case] = []
-    for cases_dir in index_contents.case_directories:
-        resolved_case_dir = (root / cases_dir).resolve()
-        cases = cases + load_cases(resolved_case_dir)
+    cases_dirs = [(root / cases_dir).resolve() for cases_dir in index_contents.case_directories]
 
     supplements: Dict[str, SupplementsFile] = {}
     for supplements_dir in index_contents.supplement_directories:
@@ -259,29 +457,77 @@ def build_site(index_path: str, dest_dir):
         print(f"Loading supplements from {supp_dir_resolved}")
         supplements.update(load_supplements(supp_dir_resolved))
 
+    def function_supplement(func_name_full: str) -> SupplementsFile:
+        supplement = supplements.get(func_name_full, None)
+        if supplement is None:
+            supplement = empty_supplements_file(func_name_full)
+        return supplement
+
     dialects_lib: DialectsLibrary = None
+    dialect_files: List[DialectFile] = []
     for dialects_dir in index_contents.dialect_directories:
         resolved_dialects_dir = (root / dialects_dir).resolve()
         if dialects_lib is not None:
             raise Exception("Multiple dialect directories not yet implemented")
-        dialects_lib = load_dialects(resolved_dialects_dir)
+        dialect_files = load_dialect_files(resolved_dialects_dir)
+        dialects_lib = DialectsLibrary(dialect_files)
+
+    to_render = functions
+    write_index = True
+    manifest: Dict[str, str] = {}
+    if incremental:
+        version = templates_version()
+        dialect_entries = DialectEntries(dialect_files)
+        cases_digests = case_digests(
+            cases_dirs, {find_simplified_name(func.name) for func in functions}
+        )
+        for func in functions:
+            func_name_full = find_simplified_name(func.name)
+            manifest[f"{func.name}.html"] = function_fingerprint(
+                func,
+                cases_digests.get(func_name_full, b""),
+                function_supplement(func_name_full),
+                dialect_entries.digest(func_name_full),
+                version,
+            )
+        manifest["index.html"] = index_fingerprint(functions, version)
+        changed = changed_pages(dest_dir, manifest)
+        to_render = [func for func in functions if f"{func.name}.html" in changed]
+        write_index = "index.html" in changed
+
+    # Only the case files of functions to render are read
+    cases_index: Dict[str, Dict[str, List[Case]]] = {}
+    if to_render:
+        case_filter = CaseFilter(
+            functions={find_simplified_name(func.name) for func in to_render}
+        )
+        cases_index = index_cases(
+            case
+            for cases_dir in cases_dirs
+            for case in iter_cases(cases_dir, case_filter)
+        )
+    num_cases = sum(
+        len(group_cases)
+        for groups in cases_index.values()
+        for group_cases in groups.values()
+    )
 
     print(
-        f"There are {len(functions)} functions and {len(cases)} cases and {len(supplements)} supplements and {(len(dialects_lib.dialects))} dialects"
+        f"There are {len(functions)} functions and {num_cases} cases and {len(supplements)} supplements and {(len(dialects_lib.dialects))} dialects"
     )
-    for func in functions:
+    pages: List[Page] = []
+    for func in to_render:
         func_name_full = find_simplified_name(func.name)
-        matching_cases = [case for case in cases if case.function == func_name_full]
-        supplement = supplements.get(func_name_full, None)
-        if supplement is None:
-            supplement = empty_supplements_file(func_name_full)
+        cases_by_group = cases_index.get(func_name_full, {})
+        supplement = function_supplement(func_name_full)
         print(f"Creating site for {func.name}")
-        info = create_function_info(func, matching_cases, supplement, dialects_lib)
-        out_path = pathlib.Path(dest_dir) / f"{func.name}.html"
-        with open(out_path, mode="w") as out:
-            out.write(render_function(info))
-
-    function_index = create_function_index(functions)
-    out_path = pathlib.Path(dest_dir) / f"index.html"
-    with open(out_path, mode="w") as out:
-        out.write(render_function_index(function_index))
+        info = create_function_info(func, cases_by_group, supplement, dialects_lib)
+        pages.append((f"{func.name}.html", info))
+
+    if write_index:
+        pages.append(("index.html", create_function_index(functions)))
+    write_pages(dest_dir, pages, jobs)
+
+    if incremental:
+        save_manifest(dest_dir, manifest)
+    print(f"Rendered {len(pages)} pages, {len(functions) + 1 - len(pages)} unchanged")
@@ -0,0 +1,98 @@
+import os
+import re
+
+from bft.html import builder
+from bft.html.builder import MANIFEST_FILE, build_site, copy_with_progress
+from tools.generate_corpus.generate_corpus import CorpusSpec, generate_corpus
+
+
+def build_and_list_rewritten(corpus, site_dir):
+    """Builds the site incrementally and returns the pages that were written"""
+    for page in site_dir.glob("*.html"):
+        os.utime(page, ns=(0, 0))
+    build_site(corpus.index_path, site_dir, incremental=True)
+    return sorted(
+        page.name for page in site_dir.glob("*.html") if page.stat().st_mtime_ns != 0
+    )
+
+
+def test_incremental_build_rewrites_changed_pages(tmp_path, monkeypatch):
+    monkeypatch.setenv("BFT_CACHE_DIR", str(tmp_path / "cache"))
+    corpus = generate_corpus(
+        tmp_path / "corpus",
+        CorpusSpec(functions=3, groups_per_function=1, cases_per_group=2, evaluable=True),
+    )
+    site_dir = tmp_path / "site"
+    site_dir.mkdir()
+
+    first = build_and_list_rewritten(corpus, site_dir)
+    assert len(first) == 4
+    assert "index.html" in first
+    assert (site_dir / MANIFEST_FILE).exists()
+    # Unchanged pages are skipped before their cases are read or info computed
+    def fail(*args):
+        raise AssertionError("info computed for an unchanged page")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(builder, "iter_cases", fail)
+        patch.setattr(builder, "create_function_info", fail)
+        assert build_and_list_rewritten(corpus, site_dir) == []
+
+    case_path = corpus.case_paths[0]
+    case_path.write_text(
+        case_path.read_text().replace("Generated group 0", "Changed group 0")
+    )
+    function = case_path.stem
+    [case_page] = [page for page in first if page.endswith(f"_{function}.html")]
+    assert build_and_list_rewritten(corpus, site_dir) == [case_page]
+    assert "Changed group 0" in (site_dir / case_page).read_text()
+
+    function = corpus.case_paths[1].stem
+    supplement_path = corpus.supplements_dir / f"{function}.md"
+    supplement_path.write_text(
+        supplement_path.read_text().replace("Generated function.", "Changed function.")
+    )
+    [supplement_page] = [page for page in first if page.endswith(f"_{function}.html")]
+    assert build_and_list_rewritten(corpus, site_dir) == [supplement_page]
+
+    # A dialect edit rewrites the page of the function whose entry changed
+    function = corpus.case_paths[2].stem
+    dialect_path = corpus.dialects_dir / f"{corpus.dialects[0]}.yaml"
+    dialect_path.write_text(
+        re.sub(
+            rf"(- name: \w+\.{function}\n)",
+            r"\1  unsupported: true\n",
+            dialect_path.read_text(),
+        )
+    )
+    [dialect_page] = [page for page in first if page.endswith(f"_{function}.html")]
+    assert build_and_list_rewritten(corpus, site_dir) == [dialect_page]
+
+    (site_dir / case_page).unlink()
+    assert build_and_list_rewritten(corpus, site_dir) == [case_page]
+
+
+def test_copy_skips_identical_files(tmp_path):
+    src = tmp_path / "src"
+    (src / "css").mkdir(parents=True)
+    (src / "index.css").write_text("body {}")
+    (src / "css" / "site.css").write_text("p {}")
+    dst = tmp_path / "dst"
+
+    copied = []
+
+    def copy(source_path, destination_path):
+        copied.append(source_path.relative_to(src).as_posix())
+        destination_path.write_bytes(source_path.read_bytes())
+
+    copy_with_progress(src, dst, copy)
+    assert sorted(copied) == ["css/site.css", "index.css"]
+
+    copied.clear()
+    copy_with_progress(src, dst, copy)
+    assert copied == []
+
+    (src / "css" / "site.css").write_text("p { margin: 0 }")
+    copy_with_progress(src, dst, copy)
+    assert copied == ["css/site.css"]
+    assert (dst / "css" / "site.css").read_text() == "p { margin: 0 }"
@@ -147,5 +147,5 @@ def add_extensions_file_to_library(
                 else:
                     arg_types.append("|".join(arg.options))
             builder.note_kernel(
-                arg_types, impl.return_type, impl.options.keys(), impl.variadic
+                arg_types, impl.return_type, list(impl.options.keys()), impl.variadic
             )
@@ -1,11 +1,15 @@
+import multiprocessing
+import os
 from abc import ABC, abstractmethod
-from pathlib import Path
-from typing import List, NamedTuple
+from typing import Dict, Iterator, List, NamedTuple, Tuple
 
-from bft.cases.runner import CaseRunner
+from bft.cases.runner import CaseResult, CaseRunner
+from bft.cases.timing import case_timings
 from bft.cases.types import Case
 from bft.dialects.types import Dialect, DialectsLibrary
 
+from .result_cache import ResultCache, result_key
+
 
 class TestResult(NamedTuple):
     function: str
@@ -16,6 +20,68 @@ class TestResult(NamedTuple):
     reason: str
 
 
+# The outcomes of a case, as pytest reports them
+PASSED = "passed"
+FAILED = "failed"
+XFAILED = "xfailed"
+SKIPPED = "skipped"
+
+
+class TestOutcome(NamedTuple):
+    case: Case
+    outcome: str
+    reason: str
+
+
+def classify(result: TestResult) -> Tuple[str, str]:
+    """Returns the outcome of a test result and the reason for it"""
+    if result.passed:
+        if not result.should_have_passed:
+            return FAILED, f"Unexpected pass: {result.reason}"
+        return PASSED, result.reason
+    if result.should_have_passed:
+        return FAILED, f"Unexpected fail: {result.reason}"
+    return XFAILED, result.reason
+
+
+# The tester owned by a worker process of BaseTester.run_tests
+_worker_tester: "BaseTester" = None
+
+
+def _init_worker(tester_type: type, dialects: DialectsLibrary):
+    global _worker_tester
+    # Workers report unsupported functions as results, skipping is left to
+    # the process that owns the pytest session
+    os.environ.pop("PYTEST_CURRENT_TEST", None)
+    _worker_tester = tester_type()
+    _worker_tester.prepare(dialects)
+
+
+def _iter_results(
+    tester: "BaseTester", cases: List[Case]
+) -> Iterator[CaseResult | Exception]:
+    tester.runner.batch_cases(cases)
+    for case in cases:
+        try:
+            yield tester.runner.run_case(case)
+        except Exception as err:
+            # Raised again when the result for this case is consumed
+            yield err
+
+
+def _run_shard(cases: List[Case]) -> Tuple[List[CaseResult | Exception], Tuple]:
+    results = list(_iter_results(_worker_tester, cases))
+    # Timings are recorded in the worker, hand them to the parent with the results
+    return results, case_timings.drain()
+
+
+def _shard(cases: List[Case], num_shards: int) -> List[List[Case]]:
+    # Contiguous shards keep cases of the same function together so that
+    # runners which batch by kernel signature still see whole groups
+    shard_size = max(1, -(-len(cases) // num_shards))
+    return [cases[i : i + shard_size] for i in range(0, len(cases), shard_size)]
+
+
 class BaseTester(ABC):
     @abstractmethod
     def get_runner(self, dialect: Dialect) -> CaseRunner:
@@ -25,13 +91,54 @@ class BaseTester(ABC):
     def get_dialect(self, library: DialectsLibrary) -> Dialect:
         pass
 
-    def prepare(self, dialects: DialectsLibrary):
+    def engine_version(self) -> str | None:
+        """
+        Returns the version of the engine the runner talks to
+
+        Results are only cached for testers that know it, see ResultCache.
+        """
+        return None
+
+    def prepare(self, dialects: DialectsLibrary, result_cache: ResultCache = None):
+        self.dialects = dialects
         self.dialect = self.get_dialect(dialects)
         self.runner = self.get_runner(self.dialect)
         self.group_indices = {}
+        # id(case) -> result computed ahead of time by precompute, or stored
+        # result found by batch_cases
+        self.precomputed: Dict[int, CaseResult | Exception] = {}
+        self.result_cache = result_cache
+        self.__version = None
+        if result_cache is not None:
+            engine_version = self.engine_version()
+            if engine_version is not None:
+                # The runner code and mode are part of the version, a fix to a
+                # runner or another mode can change its results
+                runner_version = self.runner.cache_version()
+                self.__version = f"{type(self).__name__} {engine_version} {runner_version}"
 
-    def run_test(self, case: Case) -> TestResult:
-        result = self.runner.run_case(case)
+    def __result_key(self, case: Case) -> str | None:
+        if self.__version is None or not self.dialect.supports_function(case):
+            return None
+        mapping = self.dialect.mapping_for_case(case)
+        if mapping is None:
+            return None
+        return result_key(case, mapping, self.__version)
+
+    def __cached_result(self, case: Case) -> CaseResult | None:
+        key = self.__result_key(case)
+        if key is None:
+            return None
+        return self.result_cache.get(key)
+
+    def __store_result(self, case: Case, result: CaseResult | Exception):
+        if isinstance(result, Exception):
+            return
+        key = self.__result_key(case)
+        if key is not None:
+            self.result_cache.put(key, result)
+
+    def __to_test_result(self, case: Case, result: CaseResult) -> TestResult:
         group_index = self.group_indices.get(case.group.id, 0)
         self.group_indices[case.group.id] = group_index + 1
         return TestResult(
@@ -42,3 +149,135 @@ class BaseTester(ABC):
             result.expected_pass,
             result.reason,
         )
+
+    def skip_reason(self, case: Case) -> str | None:
+        """Returns why case should not be run by this tester, or None to run it"""
+        if not self.dialect.supports_function(case):
+            return f"Skipping unsupported function. {case.base_uri}/{case.function}"
+        return None
+
+    def batch_cases(self, cases: List[Case]):
+        """
+        Registers the cases that run_test is about to be called for with the runner
+
+        Cases that are skipped are left out, and so are cases with a stored
+        result, which is kept for run_test.  A batch then only runs cases that
+        need to run.
+        """
+        to_batch = []
+        for case in cases:
+            if self.skip_reason(case) is not None or id(case) in self.precomputed:
+                continue
+            result = self.__cached_result(case)
+            if result is None:
+                to_batch.append(case)
+            else:
+                self.precomputed[id(case)] = result
+        self.runner.batch_cases(to_batch)
+
+    def run_test(self, case: Case) -> TestResult:
+        result = self.precomputed.pop(id(case), None)
+        if result is None:
+            result = self.__cached_result(case)
+        if result is None:
+            result = self.runner.run_case(case)
+            self.__store_result(case, result)
+        elif isinstance(result, Exception):
+            raise result
+        return self.__to_test_result(case, result)
+
+    def __run_cases(
+        self, cases: List[Case], jobs: int
+    ) -> Iterator[Tuple[Case, CaseResult | Exception]]:
+        # id(case) -> result stored by an earlier run
+        cached: Dict[int, CaseResult] = {}
+        for case in cases:
+            result = self.__cached_result(case)
+            if result is not None:
+                cached[id(case)] = result
+        results = self.__execute_cases(
+            [case for case in cases if id(case) not in cached], jobs
+        )
+        try:
+            for case in cases:
+                result = cached.get(id(case), None)
+                if result is None:
+                    _, result = next(results)
+                    self.__store_result(case, result)
+                yield case, result
+        finally:
+            # Shuts the worker pool down
+            results.close()
+
+    def __execute_cases(
+        self, cases: List[Case], jobs: int
+    ) -> Iterator[Tuple[Case, CaseResult | Exception]]:
+        if jobs <= 1:
+            yield from zip(cases, _iter_results(self, cases))
+            return
+        # Spawn rather than fork, the engines keep native threads and state
+        # that don't survive a fork
+        ctx = multiprocessing.get_context("spawn")
+        shards = _shard(cases, jobs * 4)
+        with ctx.Pool(
+            jobs, initializer=_init_worker, initargs=(type(self), self.dialects)
+        ) as pool:
+            # imap returns shards in submission order, which keeps the group
+            # index numbering identical to a serial run
+            for shard, (results, timings) in zip(shards, pool.imap(_run_shard, shards)):
+                case_timings.merge(timings)
+                for case, result in zip(shard, results):
+                    yield case, result
+
+    def run_tests(self, cases: List[Case], jobs: int = 1) -> Iterator[TestResult]:
+        """
+        Runs cases, sharded across jobs worker processes, and yields their results
+        in the order of cases
+
+        Each worker prepares its own tester, and so its own runner and connection,
+        from the dialects passed to prepare.
+        """
+        for case, result in self.__run_cases(cases, jobs):
+            if isinstance(result, Exception):
+                raise result
+            yield self.__to_test_result(case, result)
+
+    def precompute(self, cases: List[Case], jobs: int):
+        """
+        Runs cases ahead of time across jobs worker processes
+
+        Later calls to run_test for these cases return the stored results.  Cases
+        that are skipped are left to run_test.
+        """
+        if jobs <= 1:
+            return
+        cases = [
+            case
+            for case in cases
+            if self.skip_reason(case) is None and id(case) not in self.precomputed
+        ]
+        for case, result in self.__run_cases(cases, jobs):
+            self.precomputed[id(case)] = result
+
+    def run_outcomes(self, cases: List[Case], jobs: int = 1) -> Iterator[TestOutcome]:
+        """
+        Runs cases like run_tests and yields their outcomes in the order of cases
+
+        Skipped cases are not run.  A case whose runner raised is a failure rather
+        than an error that stops the run.
+        """
+        skip_reasons = [self.skip_reason(case) for case in cases]
+        to_run = [case for case, reason in zip(cases, skip_reasons) if reason is None]
+        results = self.__run_cases(to_run, jobs)
+        try:
+            for case, skip_reason in zip(cases, skip_reasons):
+                if skip_reason is not None:
+                    yield TestOutcome(case, SKIPPED, skip_reason)
+                    continue
+                _, result = next(results)
+                if isinstance(result, Exception):
+                    yield TestOutcome(case, FAILED, f"{type(result).__name__}: {result}")
+                    continue
+                yield TestOutcome(case, *classify(self.__to_test_result(case, result)))
+        finally:
+            results.close()
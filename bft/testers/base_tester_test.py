@@ -0,0 +1,150 @@
+import sys
+
+import bft.cases.async_runner
+import bft.cases.runner
+from bft.cases.async_runner import AsyncSqlCaseRunner, ConcurrentCaseRunner
+from bft.cases.cache import source_version
+from bft.cases.runner import CaseResult, CaseRunner, SqlCaseResult
+from bft.cases.types import Case, CaseGroup, CaseLiteral
+from bft.dialects.types import DialectsLibrary, SqlMapping
+from bft.testers.base_tester import FAILED, PASSED, SKIPPED, XFAILED, BaseTester, classify
+from bft.testers.result_cache import ResultCache
+
+
+class EchoRunner(CaseRunner):
+    def run_case(self, case: Case) -> CaseResult:
+        return CaseResult(True, True, str(case.args[0].value))
+
+
+class EchoTester(BaseTester):
+    def get_runner(self, dialect):
+        return EchoRunner()
+
+    def get_dialect(self, library):
+        return None
+
+
+def test_run_tests_in_parallel_matches_serial():
+    cases = [
+        Case("f", "uri", CaseGroup(f"group{idx % 3}", ""), [CaseLiteral(idx, "i32")], "undefined", [])
+        for idx in range(20)
+    ]
+    serial = EchoTester()
+    serial.prepare(DialectsLibrary([]))
+    expected = [serial.run_test(case) for case in cases]
+
+    parallel = EchoTester()
+    parallel.prepare(DialectsLibrary([]))
+    assert list(parallel.run_tests(cases, jobs=3)) == expected
+
+
+class OutcomeRunner(CaseRunner):
+    def run_case(self, case: Case) -> CaseResult:
+        value = case.args[0].value
+        if value == "raise":
+            raise Exception("engine went away")
+        return CaseResult(value == "pass", case.result == "pass", value)
+
+
+class OutcomeTester(BaseTester):
+    def get_runner(self, dialect):
+        return OutcomeRunner()
+
+    def get_dialect(self, library):
+        return None
+
+    def skip_reason(self, case):
+        return "skipped" if case.args[0].value == "skip" else None
+
+
+def test_run_outcomes():
+    cases = [
+        Case("f", "uri", CaseGroup("group", ""), [CaseLiteral(value, "string")], expected, [])
+        for value, expected in [
+            ("pass", "pass"),
+            ("pass", "fail"),
+            ("fail", "pass"),
+            ("fail", "fail"),
+            ("skip", "pass"),
+            ("raise", "pass"),
+        ]
+    ]
+    tester = OutcomeTester()
+    tester.prepare(DialectsLibrary([]))
+    assert [(outcome.outcome, outcome.reason) for outcome in tester.run_outcomes(cases)] == [
+        (PASSED, "pass"),
+        (FAILED, "Unexpected pass: pass"),
+        (FAILED, "Unexpected fail: fail"),
+        (XFAILED, "fail"),
+        (SKIPPED, "skipped"),
+        (FAILED, "Exception: engine went away"),
+    ]
+
+
+class FakeDialect(object):
+    name = "fake"
+
+    def supports_function(self, case: Case) -> bool:
+        return case.function == "f"
+
+    def mapping_for_case(self, case: Case) -> SqlMapping:
+        return SqlMapping("f", False, False, False, False, False, False, True, None)
+
+
+class CountingAsyncRunner(AsyncSqlCaseRunner):
+    def __init__(self, dialect):
+        super().__init__(dialect)
+        self.executed = []
+
+    async def run_sql_case(self, case: Case, mapping: SqlMapping) -> SqlCaseResult:
+        self.executed.append(case.args[0].value)
+        return SqlCaseResult.success()
+
+
+class ConcurrentTester(BaseTester):
+    def get_runner(self, dialect):
+        return ConcurrentCaseRunner(CountingAsyncRunner(dialect), 4)
+
+    def get_dialect(self, library):
+        return FakeDialect()
+
+    def engine_version(self):
+        return "1.0"
+
+
+def test_batch_cases_leaves_out_stored_results(tmp_path):
+    def make_case(function, value):
+        return Case(
+            function, "uri", CaseGroup("basic", ""), [CaseLiteral(value, "i32")], "undefined", []
+        )
+
+    cases = [make_case("f", value) for value in range(20)] + [make_case("g", 0)]
+
+    def run(cases):
+        tester = ConcurrentTester()
+        tester.prepare(DialectsLibrary([]), ResultCache(tmp_path))
+        tester.batch_cases(cases)
+        results = [
+            classify(tester.run_test(case))
+            for case in cases
+            if tester.skip_reason(case) is None
+        ]
+        return results, tester.runner.runner.executed
+
+    results, executed = run(cases)
+    assert executed == list(range(20))
+
+    # Editing one case runs just that case again
+    cases[3] = make_case("f", 100)
+    edited_results, executed = run(cases)
+    assert executed == [100]
+    assert edited_results == results
+
+
+def test_cache_version_of_concurrent_runner_is_the_wrapped_runners():
+    runner = ConcurrentCaseRunner(CountingAsyncRunner(FakeDialect()), 4)
+    # An edit to the module of the async runner drops its stored results
+    assert runner.cache_version() == "CountingAsyncRunner " + source_version(
+        sys.modules[__name__], bft.cases.async_runner, bft.cases.runner
+    )
+    runner.close()
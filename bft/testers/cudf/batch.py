@@ -0,0 +1,119 @@
+import math
+import operator
+from typing import Any, List
+
+import numpy
+
+from bft.cases.runner import SqlCaseResult
+from bft.cases.types import Case
+from bft.dialects.types import SqlMapping
+
+# The functions here take the dataframe library as an argument.  CudfRunner
+# passes cudf, which lets them be exercised with pandas on machines without a GPU.
+
+DATETIME_TYPES = ["timestamp", "date"]
+
+# Functions run_sql_case passes the second arg of as a plain value, e.g. the
+# number of decimals of round
+PLAIN_ARG_FUNCTIONS = ["round"]
+
+
+def can_batch(case: Case, mapping: SqlMapping) -> bool:
+    """
+    Whether run_sql_case evaluates the args of case element-wise
+
+    Only then can the args of many cases be stacked into one frame.  The paths
+    that pass the second or third arg as a plain value (string patterns, extract
+    and PLAIN_ARG_FUNCTIONS) depend on that value and are left to run_sql_case.
+    """
+    if mapping.aggregate or mapping.local_name in PLAIN_ARG_FUNCTIONS:
+        return False
+    arg_types = [arg.type for arg in case.args]
+    if any(arg_type in DATETIME_TYPES for arg_type in arg_types):
+        return len(arg_types) == 2 and mapping.infix
+    if "string" in arg_types:
+        return len(arg_types) == 1
+    return len(arg_types) in [1, 2]
+
+
+def to_host(result) -> List[Any]:
+    to_pandas = getattr(result, "to_pandas", None)
+    if to_pandas is not None:
+        result = to_pandas(nullable=True)
+    return list(result)
+
+
+def evaluate_batch(xdf, cases: List[Case], mapping: SqlMapping, dtypes: List) -> List[Any]:
+    """
+    Evaluates the function of mapping once over a frame holding one row per case
+
+    Mirrors the dispatch of CudfRunner.run_sql_case for the cases can_batch
+    accepts and returns the result of every case.
+    """
+    fn_name = mapping.local_name
+    num_rows = len(cases)
+    columns = [
+        [case.args[arg_idx].value for case in cases]
+        for arg_idx in range(len(dtypes))
+    ]
+    arg_types = [arg.type for arg in cases[0].args]
+    if any(arg_type in DATETIME_TYPES for arg_type in arg_types):
+        gdf = xdf.DataFrame({"a": columns[0], "b": columns[1]}, dtype=dtypes[-1])
+        result = gdf.eval(f"(a){fn_name}(b)")
+    elif "string" in arg_types:
+        fn = getattr(xdf.Series(columns[0], dtype=dtypes[0]).str, fn_name)
+        result = fn()
+    elif len(columns) == 1:
+        try:
+            gdf = xdf.DataFrame({"a": columns[0]}, dtype=dtypes[0])
+            result = gdf.eval(f"{fn_name}(a)")
+        except ValueError:
+            fn = getattr(xdf.Series(columns[0], dtype=dtypes[0]), fn_name)
+            result = fn()
+    elif mapping.infix:
+        # If there are only Null/Nan/None values in the column, they are set to
+        # False instead of <NA>.  One row of extra data per batch ensures the
+        # <NA> value exists in the dataframe.
+        gdf = xdf.DataFrame(
+            {"a": columns[0] + [True], "b": columns[1] + [True]},
+            dtype=dtypes[-1],
+        )
+        result = gdf.eval(f"(a){fn_name}(b)")[:num_rows]
+    else:
+        arg_vectors = [
+            xdf.Series(column, dtype=dtype) for column, dtype in zip(columns, dtypes)
+        ]
+        try:
+            fn = getattr(arg_vectors[0], fn_name)
+            result = fn(arg_vectors[1])
+        except AttributeError:
+            fn = getattr(operator, fn_name)
+            result = fn(arg_vectors[0], arg_vectors[1])
+
+    if len(result) != num_rows:
+        raise Exception(f"Batch of {num_rows} cases output {len(result)} rows")
+    return to_host(result)
+
+
+def compare_result(case: Case, result) -> SqlCaseResult:
+    if case.result == "undefined":
+        return SqlCaseResult.success()
+    elif case.result == "error":
+        return SqlCaseResult.unexpected_pass(str(result))
+    elif case.result == "nan":
+        if math.isnan(result):
+            return SqlCaseResult.success()
+    else:
+        if case.result.value is None:
+            if str(result) == "<NA>" or math.isnan(result) or result is None:
+                return SqlCaseResult.success()
+            else:
+                return SqlCaseResult.mismatch(str(result))
+        elif case.result.value == result:
+            return SqlCaseResult.success()
+        elif case.result.value == str(result):
+            return SqlCaseResult.success()
+        elif numpy.float32(case.result.value) == result:
+            return SqlCaseResult.success()
+        else:
+            return SqlCaseResult.mismatch(str(result))
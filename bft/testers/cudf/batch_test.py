@@ -0,0 +1,57 @@
+import pytest
+
+from bft.cases.runner import SqlCaseResult
+from bft.cases.testing import ARITHMETIC_URI, STRING_URI, load_dialect, make_case
+from bft.testers.cudf.batch import can_batch, compare_result, evaluate_batch
+
+# pandas has the same DataFrame.eval/Series API as cudf and runs without a GPU
+pd = pytest.importorskip("pandas")
+
+@pytest.fixture(scope="module")
+def dialect():
+    return load_dialect("cudf")
+
+
+def run_batch(dialect, cases, dtypes):
+    mapping = dialect.mapping_for_case(cases[0])
+    assert can_batch(cases[0], mapping)
+    results = evaluate_batch(pd, cases, mapping, dtypes)
+    return [compare_result(case, result) for case, result in zip(cases, results)]
+
+
+def test_binary_batch(dialect):
+    options = [("overflow", "SILENT"), ("rounding", "TIE_TO_EVEN")]
+    cases = [
+        make_case("add", [(1, "i32"), (2, "i32")], (3, "i32"), options=options),
+        make_case("add", [(5, "i32"), (None, "i32")], (None, "i32"), options=options),
+        make_case("add", [(5, "i32"), (5, "i32")], (11, "i32"), options=options),
+    ]
+    assert run_batch(dialect, cases, ["Int32", "Int32"]) == [
+        SqlCaseResult.success(),
+        SqlCaseResult.success(),
+        SqlCaseResult.mismatch("10"),
+    ]
+
+
+def test_string_batch(dialect):
+    cases = [
+        make_case("lower", [("ABC", "string")], ("abc", "string"), uri=STRING_URI),
+        make_case(
+            "lower", [("Hello World", "string")], ("hello world", "string"), uri=STRING_URI
+        ),
+    ]
+    assert run_batch(dialect, cases, ["string"]) == [SqlCaseResult.success()] * 2
+
+
+def test_unbatchable_cases(dialect):
+    sum_case = make_case("sum", [([1, 2], "i64")], (3, "i64"), options=[("overflow", "SILENT")])
+    assert not can_batch(sum_case, dialect.mapping_for_case(sum_case))
+
+    round_case = make_case(
+        "round",
+        [(1.25, "fp64"), (1, "i32")],
+        (1.2, "fp64"),
+        options=[("rounding", "TIE_TO_EVEN")],
+        uri=ARITHMETIC_URI.replace("arithmetic", "rounding"),
+    )
+    assert not can_batch(round_case, dialect.mapping_for_case(round_case))
@@ -1,14 +1,16 @@
-import math
 import operator
+from typing import List
 
 import cudf
 import numpy
 
 from bft.cases.runner import SqlCaseResult, SqlCaseRunner
-from bft.cases.types import Case
+from bft.cases.types import Case, case_signature
 from bft.dialects.types import SqlMapping
 from bft.utils.utils import type_to_dialect_type
 
+from .batch import can_batch, compare_result, evaluate_batch
+
 type_map = {
     "i8": cudf.dtype("int8"),
     "i16": cudf.dtype("int16"),
@@ -89,6 +91,7 @@ class CudfRunner(SqlCaseRunner):
         data_types = []
         fn_name = mapping.local_name
         is_regexp = True if "regexp" in case.function else False
+        self.timings.phase("load")
         for arg in case.args:
             dtype = type_to_cudf_dtype(arg.type)
             if dtype is None:
@@ -99,6 +102,7 @@ class CudfRunner(SqlCaseRunner):
             arg_values.append(arg.value)
             data_types.append(dtype)
 
+        self.timings.phase("query")
         try:
             if is_datetime_function(data_types):
                 result = get_dt_fn_result(mapping, dtype, arg_vectors, arg_values)
@@ -143,6 +147,7 @@ class CudfRunner(SqlCaseRunner):
         except RuntimeError as err:
             return SqlCaseResult.error(str(err))
 
+        self.timings.phase("compare")
         if mapping.aggregate:
             if is_numpy_type(result):
                 result = result.item()
@@ -156,24 +161,23 @@ class CudfRunner(SqlCaseRunner):
             else:
                 result = result[0]
 
-        if case.result == "undefined":
-            return SqlCaseResult.success()
-        elif case.result == "error":
-            return SqlCaseResult.unexpected_pass(str(result))
-        elif case.result == "nan":
-            if math.isnan(result):
-                return SqlCaseResult.success()
-        else:
-            if case.result.value is None:
-                if str(result) == "<NA>" or math.isnan(result) or result is None:
-                    return SqlCaseResult.success()
-                else:
-                    return SqlCaseResult.mismatch(str(result))
-            elif case.result.value == result:
-                return SqlCaseResult.success()
-            elif case.result.value == str(result):
-                return SqlCaseResult.success()
-            elif numpy.float32(case.result.value) == result:
-                return SqlCaseResult.success()
-            else:
-                return SqlCaseResult.mismatch(str(result))
+        return compare_result(case, result)
+
+    def batch_key(self, case: Case):
+        return case_signature(case)
+
+    def run_sql_batch(
+        self, cases: List[Case], mapping: SqlMapping
+    ) -> List[SqlCaseResult]:
+        dtypes = [type_to_cudf_dtype(arg.type) for arg in cases[0].args]
+        if len(cases) < 2 or None in dtypes or not can_batch(cases[0], mapping):
+            return super().run_sql_batch(cases, mapping)
+        self.timings.phase("query")
+        try:
+            results = evaluate_batch(cudf, cases, mapping, dtypes)
+        except RuntimeError:
+            # One bad row fails the whole batch.  Fall back to running the cases
+            # one at a time so the error is attributed to the right case.
+            return super().run_sql_batch(cases, mapping)
+        self.timings.phase("compare")
+        return [compare_result(case, result) for case, result in zip(cases, results)]
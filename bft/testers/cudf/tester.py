@@ -1,3 +1,5 @@
+import cudf
+
 from bft.dialects.types import Dialect, DialectsLibrary
 from bft.testers.base_tester import BaseTester
 
@@ -10,3 +12,6 @@ class CudfTester(BaseTester):
 
     def get_dialect(self, library: DialectsLibrary):
         return library.get_dialect_by_name("cudf")
+
+    def engine_version(self) -> str:
+        return cudf.__version__
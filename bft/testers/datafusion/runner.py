@@ -1,12 +1,14 @@
 import math
 from datetime import datetime
+from typing import Dict, List
 
 import datafusion
 import numpy
 import pyarrow as pa
+import pyarrow.compute as pc
 
-from bft.cases.runner import SqlCaseResult, SqlCaseRunner
-from bft.cases.types import Case, CaseLiteral
+from bft.cases.runner import SqlCaseResult, SqlCaseRunner, select_expr, select_query
+from bft.cases.types import Case, CaseLiteral, case_signature
 from bft.dialects.types import SqlMapping
 from bft.utils.utils import type_to_dialect_type
 
@@ -72,105 +74,221 @@ def str_to_datetime(str_val, type):
         return datetime.strptime(str_val, "%Y-%m-%d %H:%M:%S")
 
 
+def arg_types(case: Case) -> List[pa.DataType]:
+    """Returns the Arrow type of every arg or None if one of them isn't supported"""
+    types = [type_to_datafusion_type(arg.type) for arg in case.args]
+    if None in types:
+        return None
+    return types
+
+
+def scalar_arg_values(case: Case) -> List:
+    return [arg_with_type(arg) for arg in case.args]
+
+
+def scalar_arg_vector_values(case: Case, types: List[pa.DataType]) -> List:
+    """Returns the value of every arg as it goes into its Arrow vector"""
+    values = []
+    for arg, val, arg_type in zip(case.args, scalar_arg_values(case), types):
+        if isinstance(arg_type, pa.lib.TimestampType):
+            val = str_to_datetime(val, arg.type)
+        values.append(val)
+    return values
+
+
+def aggregate_arg_values(case: Case) -> List[List]:
+    return [[handle_special_cases(val) for val in arg.value] for arg in case.args]
+
+
+def compare_result(case: Case, result) -> SqlCaseResult:
+    if case.result == "undefined":
+        return SqlCaseResult.success()
+    elif case.result == "error":
+        return SqlCaseResult.unexpected_pass(str(result))
+    elif case.result == "nan":
+        if math.isnan(result):
+            return SqlCaseResult.success()
+    # Issues with python float comparison:
+    # https://tutorpython.com/python-mathisclose/#The_problem_with_using_for_float_comparison
+    # https://stackoverflow.com/questions/5595425/what-is-the-best-way-to-compare-floats-for-almost-equality-in-python
+    # Datafusion bug with float when converting from a dataframe to a pylist:
+    # https://github.com/apache/arrow-datafusion/issues/9950
+    elif case.result.type.startswith('fp') and case.result.value:
+        if math.isclose(result, case.result.value, rel_tol=1e-6):
+            return SqlCaseResult.success()
+    else:
+        if result == case.result.value:
+            return SqlCaseResult.success()
+        else:
+            return SqlCaseResult.mismatch(str(result))
+
+
+def exact_matches(cases: List[Case], results: pa.Array) -> List[bool]:
+    """
+    Compares results against the expected values of cases in one vectorized step
+
+    Only expected values that compare_result checks for equality are considered,
+    every other entry is False and left to compare_result.
+    """
+    expected = [
+        case.result.value
+        if isinstance(case.result, CaseLiteral)
+        and not case.result.type.startswith("fp")
+        else None
+        for case in cases
+    ]
+    try:
+        expected = pa.array(expected, results.type)
+        return pc.fill_null(pc.equal(results, expected), False).to_pylist()
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        # The expected values don't convert to the result type
+        return [False] * len(cases)
+
+
 class DatafusionRunner(SqlCaseRunner):
     def __init__(self, dialect):
         super().__init__(dialect)
         self.ctx = datafusion.SessionContext()
 
     def run_sql_case(self, case: Case, mapping: SqlMapping) -> SqlCaseResult:
-
+        self.timings.phase("setup")
         try:
-            arg_vectors = []
-            arg_names = []
+            types = arg_types(case)
+            if types is None:
+                unsupported = next(
+                    arg.type
+                    for arg in case.args
+                    if type_to_datafusion_type(arg.type) is None
+                )
+                return SqlCaseResult.unsupported(f"Unsupported type {unsupported}")
+            arg_names = [f"arg{idx}" for idx in range(len(case.args))]
             arg_vals_list = []
-            orig_types = []
-            arg_types_list = []
 
+            self.timings.phase("load")
             if mapping.aggregate:
-                arg_vectors = []
-                for arg_idx, arg in enumerate(case.args):
-                    arg_vals = []
-                    arg_type = type_to_datafusion_type(arg.type)
-                    if arg_type is None:
-                        return SqlCaseResult.unsupported(f"Unsupported type {arg.type}")
-                    for val in arg.value:
-                        arg_vals.append(handle_special_cases(val))
-                    arg_names.append(f"arg{arg_idx}")
-                    arg_vectors.append(pa.array(arg_vals, arg_type))
+                arg_vectors = [
+                    pa.array(arg_vals, arg_type)
+                    for arg_vals, arg_type in zip(aggregate_arg_values(case), types)
+                ]
             else:
-                for arg_idx, arg in enumerate(case.args):
-                    arg_val = arg_with_type(arg)
-                    arg_type = type_to_datafusion_type(arg.type)
-                    if arg_type is None:
-                        return SqlCaseResult.unsupported(f"Unsupported type {arg.type}")
-                    orig_types.append(arg.type)
-                    arg_vals_list.append(arg_val)
-                    arg_types_list.append(arg_type)
-                    arg_names.append(f"arg{arg_idx}")
-
-                for val, arg_type, orig_type in zip(
-                    arg_vals_list, arg_types_list, orig_types
-                ):
-                    if isinstance(arg_type, pa.lib.TimestampType):
-                        val = str_to_datetime(val, orig_type)
-                    arg_vectors.append(pa.array([val], arg_type))
-
-            joined_arg_names = ",".join(arg_names)
+                arg_vals_list = scalar_arg_values(case)
+                arg_vectors = [
+                    pa.array([val], arg_type)
+                    for val, arg_type in zip(
+                        scalar_arg_vector_values(case, types), types
+                    )
+                ]
+
             batch = pa.RecordBatch.from_arrays(
                 arg_vectors,
                 names=arg_names,
             )
             self.ctx.register_record_batches("my_table", [[batch]])
-            if mapping.infix:
-                if len(case.args) != 2:
-                    raise Exception(f"Infix function with {len(case.args)} args")
-                expr_str = f"SELECT {arg_names[0]} {mapping.local_name} {arg_names[1]} FROM my_table;"
-            elif mapping.postfix:
-                if len(arg_names) != 1:
-                    raise Exception(f"Postfix function with {len(arg_names)} args")
-                expr_str = f"SELECT {arg_names[0]} {mapping.local_name} FROM my_table;"
-            elif mapping.extract:
-                if len(arg_names) != 2:
-                    raise Exception(f"Extract function with {len(arg_names)} args")
-                expr_str = f"SELECT {mapping.local_name}({arg_vals_list[0]} FROM {arg_names[1]}) FROM my_table;"
-            elif mapping.local_name == 'count(*)':
-                expr_str = f"SELECT {mapping.local_name} FROM my_table;"
-            elif mapping.aggregate:
-                if len(arg_names) < 1:
-                    raise Exception(f"Aggregate function with {len(arg_names)} args")
-                expr_str = f"SELECT {mapping.local_name}({arg_names[0]}) FROM my_table;"
-            else:
-                expr_str = (
-                    f"SELECT {mapping.local_name}({joined_arg_names}) FROM my_table;"
-                )
+            field = arg_vals_list[0] if arg_vals_list else None
+            expr_str = select_query(mapping, "my_table", arg_names, field)
 
+            self.timings.phase("query")
             result = self.ctx.sql(expr_str).collect()[0].columns[0].to_pylist()
 
             if len(result) != 1:
                 raise Exception("Scalar function with one row output more than one row")
-            result = result[0]
-
-            if case.result == "undefined":
-                return SqlCaseResult.success()
-            elif case.result == "error":
-                return SqlCaseResult.unexpected_pass(str(result))
-            elif case.result == "nan":
-                if math.isnan(result):
-                    return SqlCaseResult.success()
-            # Issues with python float comparison:
-            # https://tutorpython.com/python-mathisclose/#The_problem_with_using_for_float_comparison
-            # https://stackoverflow.com/questions/5595425/what-is-the-best-way-to-compare-floats-for-almost-equality-in-python
-            # Datafusion bug with float when converting from a dataframe to a pylist:
-            # https://github.com/apache/arrow-datafusion/issues/9950
-            elif case.result.type.startswith('fp') and case.result.value:
-                if math.isclose(result, case.result.value, rel_tol=1e-6):
-                    return SqlCaseResult.success()
-            else:
-                if result == case.result.value:
-                    return SqlCaseResult.success()
-                else:
-                    return SqlCaseResult.mismatch(str(result))
+            self.timings.phase("compare")
+            return compare_result(case, result[0])
         except Exception as err:
             return SqlCaseResult.error(str(err))
         finally:
+            self.timings.phase("teardown")
+            self.ctx.deregister_table("my_table")
+
+    def batch_key(self, case: Case):
+        return case_signature(case)
+
+    def run_sql_batch(
+        self, cases: List[Case], mapping: SqlMapping
+    ) -> List[SqlCaseResult]:
+        # The extract grammar embeds the first argument in the query text so
+        # those cases can't share a query
+        if len(cases) < 2 or mapping.extract or not len(cases[0].args):
+            return super().run_sql_batch(cases, mapping)
+        types = arg_types(cases[0])
+        if types is None:
+            return super().run_sql_batch(cases, mapping)
+        try:
+            case_ids, results = self.__select_batch(cases, mapping, types)
+            self.timings.phase("compare")
+            rows: Dict[int, int] = {
+                case_id: row for row, case_id in enumerate(case_ids.to_pylist())
+            }
+            found = [case_id for case_id in range(len(cases)) if case_id in rows]
+            found_results = results.take(
+                pa.array([rows[case_id] for case_id in found], pa.int64())
+            )
+            found_cases = [cases[case_id] for case_id in found]
+            matches = exact_matches(found_cases, found_results)
+            found_values = found_results.to_pylist()
+        except Exception:
+            # A single bad row fails the whole query.  Fall back to running the
+            # cases one at a time so the error is attributed to the right case.
+            return super().run_sql_batch(cases, mapping)
+
+        batch_results: Dict[int, SqlCaseResult] = {}
+        for case_id, case, matches, result in zip(
+            found, found_cases, matches, found_values
+        ):
+            if matches:
+                batch_results[case_id] = SqlCaseResult.success()
+            else:
+                try:
+                    batch_results[case_id] = compare_result(case, result)
+                except Exception as err:
+                    batch_results[case_id] = SqlCaseResult.error(str(err))
+        # An aggregate over no rows produces no group
+        return [
+            batch_results[case_id]
+            if case_id in batch_results
+            else self.run_sql_case(case, mapping)
+            for case_id, case in enumerate(cases)
+        ]
+
+    def __select_batch(
+        self, cases: List[Case], mapping: SqlMapping, types: List[pa.DataType]
+    ):
+        """
+        Evaluates every case in one query against a batch holding one row per
+        case (or, for aggregates, one group of rows per case) keyed by case_id
+
+        Returns the case_id column and the result column
+        """
+        self.timings.phase("load")
+        arg_names = [f"arg{idx}" for idx in range(len(types))]
+        case_ids = []
+        columns = [[] for _ in types]
+        for case_id, case in enumerate(cases):
+            if mapping.aggregate:
+                arg_vals = aggregate_arg_values(case)
+                num_rows = len(arg_vals[0])
+                if any(len(vals) != num_rows for vals in arg_vals):
+                    raise Exception("Aggregate args of different lengths")
+                case_ids.extend([case_id] * num_rows)
+                for column, vals in zip(columns, arg_vals):
+                    column.extend(vals)
+            else:
+                case_ids.append(case_id)
+                for column, val in zip(columns, scalar_arg_vector_values(case, types)):
+                    column.append(val)
+
+        batch = pa.RecordBatch.from_arrays(
+            [pa.array(case_ids, pa.int64())]
+            + [pa.array(column, arg_type) for column, arg_type in zip(columns, types)],
+            names=["case_id"] + arg_names,
+        )
+        group_by = " GROUP BY case_id" if mapping.aggregate else ""
+        self.ctx.register_record_batches("my_table", [[batch]])
+        try:
+            self.timings.phase("query")
+            expr_str = f"SELECT case_id, {select_expr(mapping, arg_names)} FROM my_table{group_by};"
+            table = self.ctx.sql(expr_str).to_arrow_table()
+        finally:
+            self.timings.phase("teardown")
             self.ctx.deregister_table("my_table")
+        return table.column(0).combine_chunks(), table.column(1).combine_chunks()
@@ -0,0 +1,23 @@
+from bft.cases.testing import load_dialect, make_case, run_batched_and_single
+from bft.testers.datafusion.runner import DatafusionRunner
+
+
+def test_batched_cases_match_individual_cases():
+    dialect = load_dialect("datafusion")
+    silent = [("overflow", "SILENT")]
+    cases = [
+        make_case("add", [(1, "i32"), (2, "i32")], (3, "i32"), options=silent),
+        make_case("add", [(5, "i32"), (None, "i32")], (None, "i32"), options=silent),
+        make_case("add", [(5, "i32"), (5, "i32")], (11, "i32"), options=silent),
+        make_case("add", [(1.5, "fp64"), (2.25, "fp64")], (3.75, "fp64"), options=silent),
+        make_case("add", [(0.1, "fp64"), (0.2, "fp64")], (0.3, "fp64"), options=silent),
+        make_case("sum", [([1, 2, None], "i64")], (3, "i64"), options=silent),
+        make_case("sum", [([], "i64")], (None, "i64"), options=silent),
+        make_case("sum", [([4, 5], "i64")], (9, "i64"), options=silent),
+        # No case of this batch produces a group
+        make_case("sum", [([], "i32")], (None, "i64"), options=silent),
+        make_case("sum", [([], "i32")], (None, "i64"), options=silent),
+    ]
+
+    batched, expected = run_batched_and_single(lambda: DatafusionRunner(dialect), cases)
+    assert batched == expected
@@ -1,3 +1,5 @@
+import datafusion
+
 from bft.dialects.types import Dialect, DialectsLibrary
 from bft.testers.base_tester import BaseTester
 
@@ -10,3 +12,6 @@ class DatafustionTester(BaseTester):
 
     def get_dialect(self, library: DialectsLibrary):
         return library.get_dialect_by_name("datafusion")
+
+    def engine_version(self) -> str:
+        return datafusion.__version__
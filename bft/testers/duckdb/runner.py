@@ -1,11 +1,11 @@
 import datetime
 import math
-from typing import Dict, NamedTuple
+from typing import Dict, List, NamedTuple
 
 import duckdb
 
-from bft.cases.runner import SqlCaseResult, SqlCaseRunner
-from bft.cases.types import Case
+from bft.cases.runner import SqlCaseResult, SqlCaseRunner, select_expr, select_query
+from bft.cases.types import Case, case_signature
 from bft.dialects.types import SqlMapping
 from bft.utils.utils import type_to_dialect_type, datetype_value_equal
 
@@ -53,13 +53,64 @@ def is_string_type(arg):
 def is_datetype(arg):
     return type(arg) in [datetime.datetime, datetime.date, datetime.timedelta]
 
+
+def scalar_arg_values(case: Case) -> List[str]:
+    arg_vals_list = list()
+    for arg in case.args:
+        if is_string_type(arg):
+            arg_vals_list.append("'" + literal_to_str(arg.value) + "'")
+        else:
+            arg_vals_list.append(literal_to_str(arg.value))
+    return arg_vals_list
+
+
+def aggregate_arg_values(case: Case) -> List[List[str]]:
+    """Returns, for each argument, the SQL literal of every value in its column"""
+    arg_vals_list = list()
+    for arg in case.args:
+        arg_vals = list()
+        for value in arg.value:
+            if is_string_type(arg) and value:
+                arg_vals.append(f"'{literal_to_str(value)}'")
+            else:
+                arg_vals.append(literal_to_str(value))
+        arg_vals_list.append(arg_vals)
+    return arg_vals_list
+
+
+def compare_result(case: Case, result) -> SqlCaseResult:
+    if case.result == "undefined":
+        return SqlCaseResult.success()
+    elif case.result == "error":
+        return SqlCaseResult.unexpected_pass(str(result))
+    elif str(result) == "nan":
+        if case.result == "nan":
+            return SqlCaseResult.success()
+        else:
+            return SqlCaseResult.mismatch(str(result))
+    # Issues with python float comparison:
+    # https://tutorpython.com/python-mathisclose/#The_problem_with_using_for_float_comparison
+    # https://stackoverflow.com/questions/5595425/what-is-the-best-way-to-compare-floats-for-almost-equality-in-python
+    elif case.result.type.startswith("fp") and case.result.value and result:
+        if math.isclose(result, case.result.value, rel_tol=1e-7):
+            return SqlCaseResult.success()
+    else:
+        if result == case.result.value:
+            return SqlCaseResult.success()
+        elif is_datetype(result) and datetype_value_equal(
+            result, case.result.value
+        ):
+            return SqlCaseResult.success()
+        else:
+            return SqlCaseResult.mismatch(str(result))
+
 class DuckDBRunner(SqlCaseRunner):
     def __init__(self, dialect):
         super().__init__(dialect)
         self.conn = duckdb.connect()
 
     def run_sql_case(self, case: Case, mapping: SqlMapping) -> SqlCaseResult:
-
+        self.timings.phase("setup")
         try:
             arg_defs = [
                 f"arg{idx} {type_to_duckdb_type(arg.type)}"
@@ -71,83 +122,102 @@ class DuckDBRunner(SqlCaseRunner):
 
             arg_names = [f"arg{idx}" for idx in range(len(case.args))]
             joined_arg_names = ",".join(arg_names)
-            arg_vals_list = list()
-            for arg in case.args:
-                if is_string_type(arg):
-                    arg_vals_list.append("'" + literal_to_str(arg.value) + "'")
-                else:
-                    arg_vals_list.append(literal_to_str(arg.value))
+            arg_vals_list = scalar_arg_values(case)
             arg_vals = ", ".join(arg_vals_list)
+            self.timings.phase("load")
             if mapping.aggregate:
-                arg_vals_list = list()
-                for arg in case.args:
-                    arg_vals = ""
-                    for value in arg.value:
-                        if is_string_type(arg):
-                            if value:
-                                arg_vals += f"('{literal_to_str(value)}'),"
-                            else:
-                                arg_vals += f"({literal_to_str(value)}),"
-                        else:
-                            arg_vals += f"({literal_to_str(value)}),"
-                    arg_vals_list.append([arg_vals[:-1]])
-                for arg_name, arg_vals in zip(arg_names, arg_vals_list):
-                    if len(arg_vals[0]):
+                for arg_name, col_vals in zip(arg_names, aggregate_arg_values(case)):
+                    if len(col_vals):
+                        rows = ",".join(f"({val})" for val in col_vals)
                         self.conn.execute(
-                            f"INSERT INTO my_table ({arg_name}) VALUES {arg_vals[0]};"
+                            f"INSERT INTO my_table ({arg_name}) VALUES {rows};"
                         )
             else:
                 self.conn.execute(
                     f"INSERT INTO my_table ({joined_arg_names}) VALUES ({arg_vals});"
                 )
 
-            if mapping.infix:
-                if len(arg_names) != 2:
-                    raise Exception(f"Infix function with {len(arg_names)} args")
-                expr = f"SELECT {arg_names[0]} {mapping.local_name} {arg_names[1]} FROM my_table;"
-            elif mapping.postfix:
-                if len(arg_names) != 1:
-                    raise Exception(f"Postfix function with {len(arg_names)} args")
-                expr = f"SELECT {arg_names[0]} {mapping.local_name} FROM my_table;"
-            elif mapping.extract:
-                if len(arg_names) != 2:
-                    raise Exception(f"Extract function with {len(arg_names)} args")
-                expr = f"SELECT {mapping.local_name}({arg_vals_list[0]} FROM {arg_names[1]}) FROM my_table;"
-            elif mapping.local_name == "count(*)":
-                expr = f"SELECT {mapping.local_name} FROM my_table;"
-            elif mapping.aggregate:
-                if len(arg_names) < 1:
-                    raise Exception(f"Aggregate function with {len(arg_names)} args")
-                expr = f"SELECT {mapping.local_name}({arg_names[0]}) FROM my_table;"
-            else:
-                expr = f"SELECT {mapping.local_name}({joined_arg_names}) FROM my_table;"
+            self.timings.phase("query")
+            field = arg_vals_list[0] if arg_vals_list else None
+            expr = select_query(mapping, "my_table", arg_names, field)
             result = self.conn.execute(expr).fetchone()[0]
-
-            if case.result == "undefined":
-                return SqlCaseResult.success()
-            elif case.result == "error":
-                return SqlCaseResult.unexpected_pass(str(result))
-            elif str(result) == "nan":
-                if case.result == "nan":
-                    return SqlCaseResult.success()
-                else:
-                    return SqlCaseResult.mismatch(str(result))
-            # Issues with python float comparison:
-            # https://tutorpython.com/python-mathisclose/#The_problem_with_using_for_float_comparison
-            # https://stackoverflow.com/questions/5595425/what-is-the-best-way-to-compare-floats-for-almost-equality-in-python
-            elif case.result.type.startswith("fp") and case.result.value and result:
-                if math.isclose(result, case.result.value, rel_tol=1e-7):
-                    return SqlCaseResult.success()
-            else:
-                if result == case.result.value:
-                    return SqlCaseResult.success()
-                elif is_datetype(result) and datetype_value_equal(
-                    result, case.result.value
-                ):
-                    return SqlCaseResult.success()
-                else:
-                    return SqlCaseResult.mismatch(str(result))
+            self.timings.phase("compare")
+            return compare_result(case, result)
         except duckdb.Error as err:
             return SqlCaseResult.error(str(err))
         finally:
+            self.timings.phase("teardown")
             self.conn.execute("DROP TABLE my_table")
+
+    def batch_key(self, case: Case):
+        return case_signature(case)
+
+    def run_sql_batch(
+        self, cases: List[Case], mapping: SqlMapping
+    ) -> List[SqlCaseResult]:
+        # The extract grammar embeds the first argument in the query text so
+        # those cases can't share a query
+        if len(cases) < 2 or mapping.extract:
+            return super().run_sql_batch(cases, mapping)
+        try:
+            rows = self.__select_batch(cases, mapping)
+        except duckdb.Error:
+            # A single bad row fails the whole query.  Fall back to running the
+            # cases one at a time so the error is attributed to the right case.
+            return super().run_sql_batch(cases, mapping)
+        self.timings.phase("compare")
+        results = []
+        for case_id, case in enumerate(cases):
+            if case_id in rows:
+                results.append(compare_result(case, rows[case_id]))
+            else:
+                # An aggregate over no rows produces no group
+                results.append(self.run_sql_case(case, mapping))
+        return results
+
+    def __select_batch(self, cases: List[Case], mapping: SqlMapping) -> Dict[int, object]:
+        """
+        Evaluates every case in one query against a table holding one row per
+        case (or, for aggregates, one group of rows per case) keyed by case_id
+        """
+        num_args = len(cases[0].args)
+        arg_names = [f"arg{idx}" for idx in range(num_args)]
+        self.timings.phase("setup")
+        try:
+            arg_defs = ["case_id INTEGER"] + [
+                f"arg{idx} {type_to_duckdb_type(arg.type)}"
+                for idx, arg in enumerate(cases[0].args)
+            ]
+            schema = ",".join(arg_defs)
+            self.conn.execute(f"CREATE TABLE my_table({schema});")
+            self.conn.execute(f"SET TimeZone='UTC';")
+
+            self.timings.phase("load")
+            if mapping.aggregate:
+                for arg_idx, arg_name in enumerate(arg_names):
+                    rows = []
+                    for case_id, case in enumerate(cases):
+                        col_vals = aggregate_arg_values(case)[arg_idx]
+                        rows.extend(f"({case_id}, {val})" for val in col_vals)
+                    if len(rows):
+                        self.conn.execute(
+                            f"INSERT INTO my_table (case_id, {arg_name}) VALUES {','.join(rows)};"
+                        )
+                group_by = " GROUP BY case_id"
+            else:
+                rows = [
+                    f"({case_id}, {', '.join(scalar_arg_values(case))})"
+                    for case_id, case in enumerate(cases)
+                ]
+                joined_arg_names = ",".join(arg_names)
+                self.conn.execute(
+                    f"INSERT INTO my_table (case_id, {joined_arg_names}) VALUES {','.join(rows)};"
+                )
+                group_by = ""
+
+            self.timings.phase("query")
+            expr = f"SELECT case_id, {select_expr(mapping, arg_names)} FROM my_table{group_by};"
+            return {case_id: value for case_id, value in self.conn.execute(expr).fetchall()}
+        finally:
+            self.timings.phase("teardown")
+            self.conn.execute("DROP TABLE IF EXISTS my_table")
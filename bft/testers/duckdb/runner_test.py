@@ -1,7 +1,25 @@
-from bft.testers.duckdb.runner import type_to_duckdb_type
+from bft.cases.testing import load_dialect, make_case, run_batched_and_single
+from bft.testers.duckdb.runner import DuckDBRunner, type_to_duckdb_type
 
 
 def test_type_to_duckdb_type():
     assert type_to_duckdb_type("interval") == "INTERVAL"
     assert type_to_duckdb_type("decimal<37, 3>") == "DECIMAL(37, 3)"
     assert type_to_duckdb_type("non_existent") is None
+
+
+def test_batched_cases_match_individual_cases():
+    dialect = load_dialect("duckdb")
+    cases = [
+        make_case("add", [(1, "i32"), (2, "i32")], (3, "i32")),
+        make_case("add", [(5, "i32"), (None, "i32")], (None, "i32")),
+        make_case("add", [(5, "i32"), (5, "i32")], (11, "i32")),
+        make_case("add", [(120, "i8"), (10, "i8")], "error", "overflow", [("overflow", "ERROR")]),
+        make_case("add", [(1, "i8"), (10, "i8")], "error", "overflow", [("overflow", "ERROR")]),
+        make_case("sum", [([1, 2, None], "i32")], (3, "i64")),
+        make_case("sum", [([], "i32")], (None, "i64")),
+        make_case("sum", [([4, 5], "i32")], (9, "i64")),
+    ]
+
+    batched, expected = run_batched_and_single(lambda: DuckDBRunner(dialect), cases)
+    assert batched == expected
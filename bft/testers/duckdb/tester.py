@@ -1,3 +1,5 @@
+import duckdb
+
 from bft.dialects.types import Dialect, DialectsLibrary
 from bft.testers.base_tester import BaseTester
 
@@ -10,3 +12,6 @@ class DuckDBTester(BaseTester):
 
     def get_dialect(self, library: DialectsLibrary):
         return library.get_dialect_by_name("duckdb")
+
+    def engine_version(self) -> str:
+        return duckdb.__version__
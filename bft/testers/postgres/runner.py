@@ -1,11 +1,17 @@
 import datetime
 import math
 import os
+import re
+import select
+from typing import Dict, Hashable, List, Tuple
 
 import psycopg
+from psycopg import pq
+from psycopg.adapt import PyFormat, Transformer
 
-from bft.cases.runner import SqlCaseResult, SqlCaseRunner
-from bft.cases.types import Case
+from bft.cases.async_runner import AsyncSqlCaseRunner, ConnectionPool
+from bft.cases.runner import SqlCaseResult, SqlCaseRunner, select_query
+from bft.cases.types import Case, case_signature
 from bft.dialects.types import SqlMapping
 from bft.utils.utils import datetype_value_equal
 
@@ -61,12 +67,358 @@ def get_connection_str():
     return f"{host=} {dbname=} {user=} {password=}"
 
 
+def use_prepared_statements():
+    return os.environ.get("POSTGRES_PREPARED", "false").lower() in ["1", "true", "yes"]
+
+
+def use_pipeline():
+    return os.environ.get("POSTGRES_PIPELINE", "false").lower() in ["1", "true", "yes"]
+
+
+# Largest number of cases sent in one pipeline before their results are read.
+# Bounds what the server buffers for a client that is still sending
+PIPELINE_BATCH_SIZE = 100
+
+PLACEHOLDER = re.compile(r"%b")
+
+
+def numbered_placeholders(sql: str) -> str:
+    """Replaces the %b placeholders of psycopg with the $1, $2... of the protocol"""
+    counter = iter(range(1, sql.count("%b") + 1))
+    return PLACEHOLDER.sub(lambda _: f"${next(counter)}", sql)
+
+
+def cases_in_flight() -> int:
+    """
+    Number of cases run concurrently on async connections, set POSTGRES_IN_FLIGHT
+    above 1 to use AsyncPostgresRunner
+    """
+    return int(os.environ.get("POSTGRES_IN_FLIGHT", "1"))
+
+
+def quote_str(value: str) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def compare_result(case: Case, result) -> SqlCaseResult:
+    if case.result == "undefined":
+        return SqlCaseResult.success()
+    elif case.result == "error":
+        return SqlCaseResult.unexpected_pass(str(result))
+    elif case.result == "nan":
+        print(f"Expected NAN but received {result}")
+        return SqlCaseResult.error(str(result))
+    # Issues with python float comparison:
+    # https://tutorpython.com/python-mathisclose/#The_problem_with_using_for_float_comparison
+    # https://stackoverflow.com/questions/5595425/what-is-the-best-way-to-compare-floats-for-almost-equality-in-python
+    elif case.result.type.startswith("fp") and case.result.value:
+        if math.isclose(result, case.result.value, rel_tol=1e-7):
+            return SqlCaseResult.success()
+    else:
+        if result == case.result.value:
+            return SqlCaseResult.success()
+        elif is_datetype(result) and datetype_value_equal(
+            result, case.result.value
+        ):
+            return SqlCaseResult.success()
+        else:
+            return SqlCaseResult.mismatch(str(result))
+
+
+def param_value(arg_type: str, value):
+    # Lists are dumped as a single array type so ints read from yaml in a list
+    # of floats are made floats
+    if arg_type.startswith("fp") and value is not None:
+        return float(value)
+    return value
+
+
+def arg_types_for(case: Case) -> Tuple[List[str], SqlCaseResult]:
+    """Returns the Postgres types of the args of case, or why they aren't supported"""
+    arg_types = []
+    for arg in case.args:
+        arg_type = type_to_postgres_type(arg.type)
+        if arg_type is None:
+            return None, SqlCaseResult.unsupported(f"Unsupported type {arg.type}")
+        arg_types.append(arg_type)
+    return arg_types, None
+
+
+def load_statements(
+    case: Case, mapping: SqlMapping, table: str, arg_types: List[str]
+) -> List[Tuple[str, List]]:
+    """The statements, and their parameters, that insert the args of case into table"""
+    arg_names = [f"arg{idx}" for idx in range(len(case.args))]
+    if mapping.aggregate:
+        return [
+            (
+                f"INSERT INTO {table} ({arg_name}) SELECT unnest(%b::{arg_type}[]);",
+                [[param_value(arg.type, value) for value in arg.value]],
+            )
+            for arg_name, arg_type, arg in zip(arg_names, arg_types, case.args)
+            if len(arg.value)
+        ]
+    elif len(arg_names):
+        placeholders = ",".join(f"%b::{arg_type}" for arg_type in arg_types)
+        return [
+            (
+                f"INSERT INTO {table} ({','.join(arg_names)}) VALUES ({placeholders});",
+                [param_value(arg.type, arg.value) for arg in case.args],
+            )
+        ]
+    return [(f"INSERT INTO {table} DEFAULT VALUES;", None)]
+
+
+def prepared_select_expr(case: Case, mapping: SqlMapping, table: str) -> str:
+    arg_names = [f"arg{idx}" for idx in range(len(case.args))]
+    field = None
+    if mapping.extract:
+        field = quote_str(case.args[0].value)
+    return select_query(mapping, table, arg_names, field)
+
+
+def table_schema(arg_types: Tuple[str, ...]) -> str:
+    return ",".join(f"arg{idx} {arg_type}" for idx, arg_type in enumerate(arg_types))
+
+
+class Pipeline(object):
+    """
+    Sends statements over a connection in libpq pipeline mode and reads back their
+    results in the same order
+
+    Nothing waits for a reply until read_result, so a whole batch of cases costs a
+    single round trip.  After an error the server skips every statement up to the
+    next sync, those statements get a PIPELINE_ABORTED result.
+    """
+
+    def __init__(self, conn: psycopg.Connection):
+        self.conn = conn
+        self.pgconn = conn.pgconn
+        self.transformer = Transformer(conn)
+
+    def __enter__(self) -> "Pipeline":
+        self.pgconn.enter_pipeline_mode()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.pgconn.exit_pipeline_mode()
+
+    def send(self, sql: str, params: List = None):
+        if not params:
+            self.pgconn.send_query_params(sql.encode("utf-8"), None)
+            return
+        values = self.transformer.dump_sequence(params, [PyFormat.BINARY] * len(params))
+        self.pgconn.send_query_params(
+            numbered_placeholders(sql).encode("utf-8"),
+            values,
+            self.transformer.types,
+            self.transformer.formats,
+        )
+
+    def sync(self):
+        self.pgconn.pipeline_sync()
+
+    def flush(self):
+        while self.pgconn.flush():
+            readable, _, _ = select.select([self.pgconn.socket], [self.pgconn.socket], [])
+            if readable:
+                # Keeps the server from blocking on a full output buffer
+                self.pgconn.consume_input()
+
+    def __next_result(self) -> pq.abc.PGresult:
+        while True:
+            self.pgconn.consume_input()
+            if not self.pgconn.is_busy():
+                return self.pgconn.get_result()
+            select.select([self.pgconn.socket], [], [])
+
+    def read_result(self) -> pq.abc.PGresult:
+        """Reads the result of the next statement sent"""
+        result = self.__next_result()
+        # Every statement's results end with a null result
+        self.__next_result()
+        return result
+
+    def read_sync(self):
+        result = self.__next_result()
+        if result.status != pq.ExecStatus.PIPELINE_SYNC:
+            raise Exception(f"Expected a pipeline sync, got {pq.ExecStatus(result.status).name}")
+
+    def load_value(self, result: pq.abc.PGresult):
+        """Returns the first column of the first row of a query result"""
+        self.transformer.set_pgresult(result)
+        return self.transformer.load_row(0, tuple)[0]
+
+
+def error_message(result: pq.abc.PGresult) -> str:
+    """The text str(psycopg.Error) gives for result, with its LINE, DETAIL and HINT"""
+    return result.get_error_message()
+
+
 class PostgresRunner(SqlCaseRunner):
-    def __init__(self, dialect):
+    def __init__(self, dialect, prepared: bool = None, pipeline: bool = None):
         super().__init__(dialect)
         self.conn = psycopg.connect(get_connection_str())
+        if prepared is None:
+            prepared = use_prepared_statements()
+        self.prepared = prepared
+        if pipeline is None:
+            pipeline = use_pipeline() and psycopg.Pipeline.is_supported()
+        self.pipeline = pipeline
+        if prepared or pipeline:
+            # psycopg deallocates every prepared statement on rollback, so cases
+            # are isolated by clearing their rows instead of by a transaction
+            self.conn.autocommit = True
+        # Postgres types of the args -> temporary table with those columns
+        self.__tables: Dict[Tuple[str, ...], str] = {}
+
+    def cache_version(self) -> str:
+        # Literal SQL and bound parameters don't give every case the same result
+        return f"{super().cache_version()} prepared={self.prepared} pipeline={self.pipeline}"
+
+    def batch_key(self, case: Case) -> Hashable:
+        if not self.pipeline:
+            return None
+        return case_signature(case)
+
+    def run_sql_batch(
+        self, cases: List[Case], mapping: SqlMapping
+    ) -> List[SqlCaseResult]:
+        results = []
+        for start in range(0, len(cases), PIPELINE_BATCH_SIZE):
+            results.extend(
+                self.__run_pipelined_cases(cases[start : start + PIPELINE_BATCH_SIZE], mapping)
+            )
+        return results
 
     def run_sql_case(self, case: Case, mapping: SqlMapping) -> SqlCaseResult:
+        if self.prepared:
+            return self.__run_prepared_case(case, mapping)
+        return self.__run_literal_case(case, mapping)
+
+    def __run_pipelined_cases(
+        self, cases: List[Case], mapping: SqlMapping
+    ) -> List[SqlCaseResult]:
+        """
+        Runs cases in one pipeline, in a transaction with a savepoint per case
+
+        Each case starts by rolling back to the savepoint, which clears the rows
+        of the case before it and recovers the transaction if that case failed.
+        A sync after each case limits a failure to the statements of that case.
+        """
+        self.timings.phase("setup")
+        # The cases of a batch share their signature and so their arg types
+        arg_types, unsupported = arg_types_for(cases[0])
+        if unsupported is not None:
+            return [unsupported] * len(cases)
+        try:
+            table = self.__table_for(tuple(arg_types))
+        except psycopg.Error as err:
+            return [SqlCaseResult.error(str(err))] * len(cases)
+
+        self.timings.phase("query")
+        try:
+            return self.__send_pipelined_cases(cases, mapping, table, arg_types)
+        except Exception:
+            # The connection is left mid pipeline, start over with a new one
+            self.conn.close()
+            self.conn = psycopg.connect(get_connection_str(), autocommit=True)
+            self.__tables = {}
+            raise
+
+    def __send_pipelined_cases(
+        self, cases: List[Case], mapping: SqlMapping, table: str, arg_types: List[str]
+    ) -> List[SqlCaseResult]:
+        # Per case, the number of statements that load its args
+        num_loads = []
+        with Pipeline(self.conn) as pipeline:
+            pipeline.send("BEGIN;")
+            pipeline.send("SAVEPOINT bft_case;")
+            pipeline.sync()
+            for case in cases:
+                pipeline.send("ROLLBACK TO SAVEPOINT bft_case;")
+                statements = load_statements(case, mapping, table, arg_types)
+                for sql, params in statements:
+                    pipeline.send(sql, params)
+                pipeline.send(prepared_select_expr(case, mapping, table))
+                pipeline.sync()
+                num_loads.append(len(statements))
+            pipeline.send("ROLLBACK;")
+            pipeline.sync()
+            pipeline.flush()
+
+            setup_error = None
+            for _ in range(2):
+                result = pipeline.read_result()
+                if setup_error is None and result.status == pq.ExecStatus.FATAL_ERROR:
+                    setup_error = error_message(result)
+            pipeline.read_sync()
+
+            results = []
+            for case, num_load in zip(cases, num_loads):
+                # The first error of a case is the one it reports, the
+                # statements after it were skipped
+                error = setup_error
+                # The rollback to the savepoint, the loads and the query
+                for _ in range(num_load + 2):
+                    result = pipeline.read_result()
+                    if error is None and result.status == pq.ExecStatus.FATAL_ERROR:
+                        error = error_message(result)
+                query_result = result
+                pipeline.read_sync()
+                if error is not None:
+                    results.append(SqlCaseResult.error(error))
+                else:
+                    results.append(compare_result(case, pipeline.load_value(query_result)))
+            pipeline.read_result()
+            pipeline.read_sync()
+        return results
+
+    def __table_for(self, arg_types: Tuple[str, ...]) -> str:
+        table = self.__tables.get(arg_types, None)
+        if table is None:
+            table = f"bft_args{len(self.__tables)}"
+            self.conn.execute(f"CREATE TEMPORARY TABLE {table}({table_schema(arg_types)});")
+            self.__tables[arg_types] = table
+        return table
+
+    def __run_prepared_case(self, case: Case, mapping: SqlMapping) -> SqlCaseResult:
+        """
+        Runs a case through server-side prepared statements
+
+        Values are bound as binary parameters and the statements only depend on
+        the mapping and the arg types, so Postgres parses and plans each of them
+        once per session.
+        """
+        self.timings.phase("setup")
+        arg_types, unsupported = arg_types_for(case)
+        if unsupported is not None:
+            return unsupported
+
+        try:
+            table = self.__table_for(tuple(arg_types))
+        except psycopg.Error as err:
+            return SqlCaseResult.error(str(err))
+
+        try:
+            self.timings.phase("load")
+            for sql, params in load_statements(case, mapping, table, arg_types):
+                self.conn.execute(sql, params, prepare=True)
+
+            self.timings.phase("query")
+            expr = prepared_select_expr(case, mapping, table)
+            result = self.conn.execute(expr, prepare=True).fetchone()[0]
+            self.timings.phase("compare")
+            return compare_result(case, result)
+        except psycopg.Error as err:
+            return SqlCaseResult.error(str(err))
+        finally:
+            self.timings.phase("teardown")
+            self.conn.execute(f"DELETE FROM {table};", prepare=True)
+
+    def __run_literal_case(self, case: Case, mapping: SqlMapping) -> SqlCaseResult:
+        self.timings.phase("setup")
         self.conn.execute("BEGIN;")
 
         try:
@@ -79,6 +431,7 @@ class PostgresRunner(SqlCaseRunner):
             schema = ",".join(arg_defs)
             self.conn.execute(f"CREATE TABLE my_table({schema});")
 
+            self.timings.phase("load")
             arg_names = [f"arg{idx}" for idx in range(len(case.args))]
             joined_arg_names = ",".join(arg_names)
             arg_vals_list = list()
@@ -111,55 +464,82 @@ class PostgresRunner(SqlCaseRunner):
                     f"INSERT INTO my_table ({joined_arg_names}) VALUES ({arg_vals});"
                 )
 
-            if mapping.infix:
-                if len(arg_names) != 2:
-                    raise Exception(f"Infix function with {len(arg_names)} args")
-                expr = f"SELECT {arg_names[0]} {mapping.local_name} {arg_names[1]} FROM my_table;"
-            elif mapping.postfix:
-                if len(arg_names) != 1:
-                    raise Exception(f"Postfix function with {len(arg_names)} args")
-                expr = f"SELECT {arg_names[0]} {mapping.local_name} FROM my_table;"
-            elif mapping.extract:
-                if len(arg_names) != 2:
-                    raise Exception(f"Extract function with {len(arg_names)} args")
-                expr = f"SELECT {mapping.local_name}({arg_vals_list[0]} FROM {arg_names[1]}) FROM my_table;"
-            elif mapping.between:
-                if len(arg_names) != 3:
-                    raise Exception(f"Between function with {len(arg_names)} args")
-                expr = f"SELECT {arg_names[0]} BETWEEN {arg_names[1]} AND {arg_names[2]} FROM my_table;"
-            elif mapping.local_name == 'count(*)':
-                expr = f"SELECT {mapping.local_name} FROM my_table;"
-            elif mapping.aggregate:
-                if len(arg_names) < 1:
-                    raise Exception(f"Aggregate function with {len(arg_names)} args")
-                expr = f"SELECT {mapping.local_name}({arg_names[0]}) FROM my_table;"
-            else:
-                expr = f"SELECT {mapping.local_name}({joined_arg_names}) FROM my_table;"
+            self.timings.phase("query")
+            field = arg_vals_list[0] if arg_vals_list else None
+            expr = select_query(mapping, "my_table", arg_names, field)
             result = self.conn.execute(expr).fetchone()[0]
-
-            if case.result == "undefined":
-                return SqlCaseResult.success()
-            elif case.result == "error":
-                return SqlCaseResult.unexpected_pass(str(result))
-            elif case.result == "nan":
-                print(f"Expected NAN but received {result}")
-                return SqlCaseResult.error(str(result))
-            # Issues with python float comparison:
-            # https://tutorpython.com/python-mathisclose/#The_problem_with_using_for_float_comparison
-            # https://stackoverflow.com/questions/5595425/what-is-the-best-way-to-compare-floats-for-almost-equality-in-python
-            elif case.result.type.startswith("fp") and case.result.value:
-                if math.isclose(result, case.result.value, rel_tol=1e-7):
-                    return SqlCaseResult.success()
-            else:
-                if result == case.result.value:
-                    return SqlCaseResult.success()
-                elif is_datetype(result) and datetype_value_equal(
-                    result, case.result.value
-                ):
-                    return SqlCaseResult.success()
-                else:
-                    return SqlCaseResult.mismatch(str(result))
+            self.timings.phase("compare")
+            return compare_result(case, result)
         except psycopg.Error as err:
             return SqlCaseResult.error(str(err))
         finally:
+            self.timings.phase("teardown")
             self.conn.rollback()
+
+
+class AsyncSession(object):
+    """An async connection and the temporary tables it holds case args in"""
+
+    def __init__(self, conn: psycopg.AsyncConnection):
+        self.conn = conn
+        # Postgres types of the args -> temporary table with those columns
+        self.tables: Dict[Tuple[str, ...], str] = {}
+
+    async def table_for(self, arg_types: Tuple[str, ...]) -> str:
+        table = self.tables.get(arg_types, None)
+        if table is None:
+            table = f"bft_args{len(self.tables)}"
+            await self.conn.execute(
+                f"CREATE TEMPORARY TABLE {table}({table_schema(arg_types)});"
+            )
+            self.tables[arg_types] = table
+        return table
+
+
+async def connect_session() -> AsyncSession:
+    conn = await psycopg.AsyncConnection.connect(get_connection_str(), autocommit=True)
+    return AsyncSession(conn)
+
+
+async def close_session(session: AsyncSession):
+    await session.conn.close()
+
+
+class AsyncPostgresRunner(AsyncSqlCaseRunner):
+    """
+    Runs cases like PostgresRunner does with prepared statements, on a pool of
+    async connections so that several cases wait on the server at once
+    """
+
+    def __init__(self, dialect, connections: int, connect=connect_session):
+        super().__init__(dialect)
+        self.sessions = ConnectionPool(connect, connections, close_session)
+
+    async def run_sql_case(self, case: Case, mapping: SqlMapping) -> SqlCaseResult:
+        self.timings.phase("setup")
+        arg_types, unsupported = arg_types_for(case)
+        if unsupported is not None:
+            return unsupported
+        async with self.sessions.connection() as session:
+            try:
+                table = await session.table_for(tuple(arg_types))
+            except psycopg.Error as err:
+                return SqlCaseResult.error(str(err))
+            try:
+                self.timings.phase("load")
+                for sql, params in load_statements(case, mapping, table, arg_types):
+                    await session.conn.execute(sql, params, prepare=True)
+                self.timings.phase("query")
+                expr = prepared_select_expr(case, mapping, table)
+                cursor = await session.conn.execute(expr, prepare=True)
+                result = (await cursor.fetchone())[0]
+                self.timings.phase("compare")
+                return compare_result(case, result)
+            except psycopg.Error as err:
+                return SqlCaseResult.error(str(err))
+            finally:
+                self.timings.phase("teardown")
+                await session.conn.execute(f"DELETE FROM {table};", prepare=True)
+
+    async def close(self):
+        await self.sessions.close()
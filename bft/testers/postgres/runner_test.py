@@ -0,0 +1,157 @@
+import asyncio
+from typing import List, Tuple
+
+import psycopg
+import pytest
+
+from bft.cases.types import Case, CaseGroup, CaseLiteral
+from bft.dialects.types import SqlMapping
+from bft.testers.postgres.runner import (
+    AsyncPostgresRunner,
+    PostgresRunner,
+    connect_session,
+    quote_str,
+)
+
+
+def make_mapping(local_name, infix=False, extract=False):
+    return SqlMapping(local_name, infix, False, False, False, False, extract, True, None)
+
+
+def test_quote_str():
+    assert quote_str("YEAR") == "'YEAR'"
+    assert quote_str("it's") == "'it''s'"
+
+
+def connect_runner(**kwargs) -> PostgresRunner:
+    try:
+        return PostgresRunner(None, **kwargs)
+    except psycopg.OperationalError as err:
+        pytest.skip(f"No Postgres server: {err}")
+
+
+@pytest.fixture
+def runner():
+    runner = connect_runner(prepared=True, pipeline=True)
+    yield runner
+    runner.conn.close()
+
+
+def make_case(x, y, result, type="i32", function="add"):
+    return Case(
+        function,
+        "uri",
+        CaseGroup("basic", ""),
+        [CaseLiteral(x, type), CaseLiteral(y, type)],
+        CaseLiteral(result, type),
+        [],
+    )
+
+
+def parity_cases() -> List[Tuple[Case, SqlMapping]]:
+    """Cases that every way of running them must give the same results for"""
+    add = make_mapping("+", infix=True)
+    concat = make_mapping("||", infix=True)
+    sum_mapping = SqlMapping("sum", False, False, False, True, False, False, True, None)
+    return [
+        (make_case(1, 2, 3), add),
+        (make_case(2147483647, 1, 0), add),
+        (make_case(None, 4, None), add),
+        (make_case(1.5, "inf", float("inf"), "fp64"), add),
+        (make_case(0.1, 0.2, 0.3, "fp64"), add),
+        (make_case("ab", "cd", "abcd", "string", "concat"), concat),
+        (make_case(None, "cd", None, "string", "concat"), concat),
+        (
+            Case(
+                "sum",
+                "uri",
+                CaseGroup("basic", ""),
+                [CaseLiteral([1, None, 2], "i64")],
+                CaseLiteral(3, "i64"),
+                [],
+            ),
+            sum_mapping,
+        ),
+    ]
+
+
+def test_prepared_statements_match_literal_sql():
+    literal_runner = connect_runner(prepared=False, pipeline=False)
+    prepared_runner = connect_runner(prepared=True, pipeline=False)
+    try:
+        for case, mapping in parity_cases():
+            assert prepared_runner.run_sql_case(case, mapping) == literal_runner.run_sql_case(
+                case, mapping
+            )
+    finally:
+        literal_runner.conn.close()
+        prepared_runner.conn.close()
+
+
+def test_async_runner_matches_prepared_statements():
+    prepared_runner = connect_runner(prepared=True, pipeline=False)
+    sessions = []
+
+    async def connect():
+        session = await connect_session()
+        sessions.append(session)
+        return session
+
+    async_runner = AsyncPostgresRunner(None, 2, connect)
+    # Literal SQL quotes the statement in its error text, bound parameters don't
+    bad_date = make_case("2020-13-01", "2020-01-01", 0, "date", "subtract")
+    # More cases than connections, so connections and their tables are reused
+    cases = (parity_cases() + [(bad_date, make_mapping("-", infix=True))]) * 2
+
+    async def run_cases():
+        try:
+            return await asyncio.gather(
+                *(async_runner.run_sql_case(case, mapping) for case, mapping in cases)
+            )
+        finally:
+            await async_runner.close()
+
+    try:
+        expected = [prepared_runner.run_sql_case(case, mapping) for case, mapping in cases]
+    finally:
+        prepared_runner.conn.close()
+    results = asyncio.run(run_cases())
+    assert "error" in [result.type for result in results]
+    assert results == expected
+    assert len(sessions) == 2
+
+
+def test_pipelined_cases_are_isolated(runner):
+    cases = [
+        make_case(1, 2, 3),
+        make_case(2147483647, 1, 0),
+        make_case(3, 4, 8),
+        make_case(None, 4, None),
+    ]
+    mapping = make_mapping("+", infix=True)
+    expected = [runner.run_sql_case(case, mapping) for case in cases]
+    assert [result.type for result in expected] == ["success", "error", "mismatch", "success"]
+    assert runner.run_sql_batch(cases, mapping) == expected
+
+    # Errors keep the HINT text the non-pipelined path reports
+    dates = [
+        make_case("2020-13-01", "2020-01-01", 0, "date", "subtract"),
+        make_case("2020-01-02", "2020-01-01", 1, "date", "subtract"),
+    ]
+    mapping = make_mapping("-", infix=True)
+    expected = [runner.run_sql_case(case, mapping) for case in dates]
+    assert "HINT" in expected[0].err
+    assert runner.run_sql_batch(dates, mapping) == expected
+
+
+def test_cache_version_includes_mode():
+    runners = [
+        connect_runner(prepared=prepared, pipeline=pipeline)
+        for prepared in [False, True]
+        for pipeline in [False, True]
+    ]
+    # Literal SQL and bound parameters can give a case different results, so no
+    # mode may reuse the results stored by another
+    assert len({runner.cache_version() for runner in runners}) == len(runners)
+    for runner in runners:
+        runner.conn.close()
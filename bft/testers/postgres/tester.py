@@ -1,12 +1,29 @@
+import psycopg
+
+from bft.cases.async_runner import ConcurrentCaseRunner
+from bft.cases.types import Case
 from bft.dialects.types import Dialect, DialectsLibrary
 from bft.testers.base_tester import BaseTester
 
-from .runner import PostgresRunner
+from .runner import AsyncPostgresRunner, PostgresRunner, cases_in_flight, get_connection_str
 
 
 class PostgresTester(BaseTester):
     def get_runner(self, dialect: Dialect):
+        in_flight = cases_in_flight()
+        if in_flight > 1:
+            return ConcurrentCaseRunner(AsyncPostgresRunner(dialect, in_flight), in_flight)
         return PostgresRunner(dialect)
 
     def get_dialect(self, library: DialectsLibrary):
         return library.get_dialect_by_name("postgres")
+
+    def engine_version(self) -> str:
+        # The results come from the server, not the client library
+        with psycopg.connect(get_connection_str()) as conn:
+            return f"{psycopg.__version__} {conn.info.server_version}"
+
+    def skip_reason(self, case: Case) -> str | None:
+        if type(case.result) != str and "inf" in str(case.result[0]):
+            return "Skipping. Postgres errors out when dealing with infinite addition"
+        return super().skip_reason(case)
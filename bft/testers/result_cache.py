@@ -0,0 +1,71 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from bft.cases.cache import default_cache_dir, source_version
+from bft.cases.runner import CaseResult
+from bft.cases.types import Case
+from bft.dialects.types import SqlMapping
+
+
+def result_key(case: Case, mapping: SqlMapping, engine_version: str) -> str:
+    """
+    Returns the key of the result of case
+
+    repr covers every value of the case (its args, options and expected result)
+    and of the mapping the dialect resolved for it, so editing either gives a new
+    key.  engine_version should identify the engine, its version and the runner.
+    """
+    content = repr((case, mapping, engine_version)).encode("utf-8")
+    return hashlib.sha256(content).hexdigest()
+
+
+class ResultCache(object):
+    """
+    On-disk store of case results
+
+    A case whose content, dialect mapping and engine version are unchanged can't
+    have a different result, so it doesn't need to run again.  Entries are small
+    JSON files, written atomically so that concurrent runs can share a store.
+    """
+
+    def __init__(self, cache_dir: str | Path = None, force: bool = False):
+        if cache_dir is None:
+            cache_dir = default_cache_dir()
+        self.cache_dir = Path(cache_dir) / "results"
+        # Runs every case again, storing the new results
+        self.force = force
+        self.hits = 0
+        self.misses = 0
+
+    def __entry_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> CaseResult:
+        if self.force:
+            self.misses += 1
+            return None
+        try:
+            with open(self.__entry_path(key)) as entry_f:
+                result = CaseResult(*json.load(entry_f))
+        except (OSError, ValueError, TypeError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result
+
+    def put(self, key: str, result: CaseResult):
+        entry_path = self.__entry_path(key)
+        tmp_path = entry_path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "w") as entry_f:
+                json.dump(
+                    [bool(result.passed), bool(result.expected_pass), result.reason],
+                    entry_f,
+                )
+            os.replace(tmp_path, entry_path)
+        except OSError:
+            # Like the case cache, the store is an optimization
+            tmp_path.unlink(missing_ok=True)
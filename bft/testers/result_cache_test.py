@@ -0,0 +1,26 @@
+from bft.cases.runner import CaseResult
+from bft.cases.types import Case, CaseGroup, CaseLiteral
+from bft.dialects.types import SqlMapping
+from bft.testers.result_cache import ResultCache, result_key
+
+CASE = Case(
+    "add", "uri", CaseGroup("basic", ""), [CaseLiteral(1, "i32")], CaseLiteral(1, "i32"), []
+)
+MAPPING = SqlMapping("+", True, False, False, False, False, False, True, None)
+
+
+def test_result_cache(tmp_path):
+    key = result_key(CASE, MAPPING, "1.0")
+    cache = ResultCache(tmp_path)
+    assert cache.get(key) is None
+    cache.put(key, CaseResult(True, True, None))
+    assert ResultCache(tmp_path).get(key) == CaseResult(True, True, None)
+    assert ResultCache(tmp_path, force=True).get(key) is None
+
+
+def test_result_key_changes_with_inputs():
+    key = result_key(CASE, MAPPING, "1.0")
+    assert key == result_key(CASE, MAPPING, "1.0")
+    assert key != result_key(CASE, MAPPING, "1.1")
+    assert key != result_key(CASE, MAPPING._replace(should_pass=False), "1.0")
+    assert key != result_key(CASE._replace(result=CaseLiteral(2, "i32")), MAPPING, "1.0")
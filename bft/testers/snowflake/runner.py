@@ -1,16 +1,22 @@
+import asyncio
 import datetime
 import math
 import os
+import queue
+import threading
 import yaml
-from typing import Dict, NamedTuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterator, List, NamedTuple, Tuple
 from cryptography.hazmat.primitives.serialization import load_der_private_key
 from cryptography.hazmat.backends import default_backend
 
 from snowflake.connector import connect
 from snowflake.connector.errors import Error
 
-from bft.cases.runner import SqlCaseResult, SqlCaseRunner
-from bft.cases.types import Case
+from bft.cases.async_runner import AsyncSqlCaseRunner, ConnectionPool
+from bft.cases.runner import SqlCaseResult, SqlCaseRunner, select_query
+from bft.cases.types import Case, case_signature
 from bft.dialects.types import SqlMapping
 from bft.utils.utils import type_to_dialect_type
 
@@ -66,120 +72,335 @@ def is_datetype(arg):
     return type(arg) in [datetime.datetime, datetime.date, datetime.timedelta]
 
 
-class SnowflakeRunner(SqlCaseRunner):
-    def __init__(self, dialect):
-        super().__init__(dialect)
-        with open("testers/snowflake/config.yaml", "r") as file:
-            config = yaml.safe_load(file)
-            sf_config = config["snowflake"]
-        print(f"Connecting to {sf_config['account']} as {sf_config['username']}")
-        private_key_path = os.environ["SNOWSQL_PRIVATE_KEY_PATH"]
-        with open(private_key_path, "rb") as f:
-            private_key = f.read()
-
-        self.conn = connect(
+# Seconds between checks on whether a query submitted with execute_async finished
+POLL_INTERVAL = 0.05
+
+
+def cases_in_flight() -> int:
+    """
+    Number of cases run concurrently with async queries, set SNOWFLAKE_IN_FLIGHT
+    above 1 to use AsyncSnowflakeRunner
+    """
+    return int(os.environ.get("SNOWFLAKE_IN_FLIGHT", "1"))
+
+
+# Set when a session is opened rather than with a statement per case
+SESSION_PARAMETERS = {"TIMEZONE": "UTC"}
+
+
+def connect_from_config(config_path: str = "testers/snowflake/config.yaml"):
+    """
+    Reads the settings in config_path
+
+    Returns a function opening a new Snowflake session and the number of sessions
+    cases may run on concurrently.
+    """
+    with open(config_path, "r") as file:
+        config = yaml.safe_load(file)
+        sf_config = config["snowflake"]
+    print(f"Connecting to {sf_config['account']} as {sf_config['username']}")
+    private_key_path = os.environ["SNOWSQL_PRIVATE_KEY_PATH"]
+    with open(private_key_path, "rb") as f:
+        private_key = f.read()
+
+    def connect_session():
+        return connect(
             user=sf_config["username"],
             private_key=private_key,
             account=sf_config["account"],
             database=sf_config["database"],
             schema=sf_config["schema"],
             warehouse=sf_config["warehouse"],
+            session_parameters=SESSION_PARAMETERS,
+        )
+
+    return connect_session, sf_config.get("sessions", 1)
+
+
+class ScratchSession(object):
+    """
+    A Snowflake session and the temporary tables it holds case args in
+
+    Temporary tables are private to the session, so sessions running cases
+    concurrently never see each other's rows.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        # table schema -> temporary table with that schema
+        self.__tables: Dict[str, str] = {}
+
+    def table_for(self, schema: str) -> str:
+        table = self.__tables.get(schema, None)
+        if table is None:
+            table = f"bft_args{len(self.__tables)}"
+            self.cursor.execute(f"CREATE TEMPORARY TABLE {table}({schema});")
+            self.__tables[schema] = table
+        return table
+
+    def close(self):
+        self.cursor.close()
+        self.conn.close()
+
+
+class SessionPool(object):
+    """
+    A pool of at most size sessions, each used by one caller at a time
+
+    Sessions are opened the first time they are needed and kept open until
+    close is called.
+    """
+
+    def __init__(self, connect_session: Callable[[], Any], size: int = 1):
+        self.size = size
+        self.__connect_session = connect_session
+        self.__idle: queue.LifoQueue[ScratchSession] = queue.LifoQueue()
+        self.__slots = threading.BoundedSemaphore(size)
+        self.__lock = threading.Lock()
+        self.__sessions: List[ScratchSession] = []
+
+    @contextmanager
+    def session(self) -> Iterator[ScratchSession]:
+        with self.__slots:
+            try:
+                session = self.__idle.get_nowait()
+            except queue.Empty:
+                session = ScratchSession(self.__connect_session())
+                with self.__lock:
+                    self.__sessions.append(session)
+            try:
+                yield session
+            finally:
+                self.__idle.put(session)
+
+    def close(self):
+        with self.__lock:
+            for session in self.__sessions:
+                session.close()
+            self.__sessions = []
+            self.__idle = queue.LifoQueue()
+
+
+class AsyncScratchSession(object):
+    """
+    A Snowflake session whose statements are submitted with execute_async
+
+    While a statement runs the session only polls its status, so other sessions
+    can submit theirs in the meantime.  The connector's calls block, they run in
+    threads.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        # table schema -> temporary table with that schema
+        self.__tables: Dict[str, str] = {}
+
+    async def execute(self, sql: str):
+        cursor = self.conn.cursor()
+        await asyncio.to_thread(cursor.execute_async, sql)
+        query_id = cursor.sfqid
+        while True:
+            status = await asyncio.to_thread(
+                self.conn.get_query_status_throw_if_error, query_id
+            )
+            if not self.conn.is_still_running(status):
+                break
+            await asyncio.sleep(POLL_INTERVAL)
+        await asyncio.to_thread(cursor.get_results_from_sfqid, query_id)
+        return cursor
+
+    async def table_for(self, schema: str) -> str:
+        table = self.__tables.get(schema, None)
+        if table is None:
+            table = f"bft_args{len(self.__tables)}"
+            await self.execute(f"CREATE TEMPORARY TABLE {table}({schema});")
+            self.__tables[schema] = table
+        return table
+
+    async def close(self):
+        await asyncio.to_thread(self.conn.close)
+
+
+def schema_for(case: Case) -> Tuple[str, SqlCaseResult]:
+    """Returns the schema of the table holding the args of case, or why it can't be made"""
+    arg_defs = []
+    for idx, arg in enumerate(case.args):
+        arg_type = type_to_snowflake_type(arg.type)
+        if arg_type is None:
+            return None, SqlCaseResult.unsupported(f"Unsupported type {arg.type}")
+        arg_defs.append(f"arg{idx} {arg_type}")
+    return ",".join(arg_defs), None
+
+
+def load_statements(case: Case, mapping: SqlMapping, table: str) -> Tuple[List[str], str]:
+    """
+    Returns the statements that replace the rows of table with the args of case,
+    and the SQL text of the first arg
+    """
+    arg_names = [f"arg{idx}" for idx in range(len(case.args))]
+    joined_arg_names = ",".join(arg_names)
+    arg_vals_list = list()
+    for arg in case.args:
+        if is_string_type(arg):
+            arg_vals_list.append("'" + literal_to_str(arg.value) + "'")
+        else:
+            arg_vals_list.append(literal_to_str(arg.value))
+    arg_vals = ", ".join(arg_vals_list)
+    statements = []
+    # INSERT OVERWRITE replaces the rows left by the previous case using
+    # this table, saving a round trip to clear it
+    if mapping.aggregate:
+        arg_vals_list = list()
+        for arg in case.args:
+            arg_vals = ""
+            for value in arg.value:
+                if is_string_type(arg):
+                    if value:
+                        arg_vals += f"('{literal_to_str(value)}'),"
+                    else:
+                        arg_vals += f"({literal_to_str(value)}),"
+                elif is_float_type(arg):
+                    if value:
+                        arg_vals += f"({literal_to_float(value)}),"
+                    else:
+                        arg_vals += f"({literal_to_str(value)}),"
+                else:
+                    arg_vals += f"({literal_to_str(value)}),"
+            arg_vals_list.append([arg_vals[:-1]])
+        insert = "INSERT OVERWRITE"
+        for arg_name, arg_vals in zip(arg_names, arg_vals_list):
+            if len(arg_vals[0]):
+                statements.append(f"{insert} INTO {table} ({arg_name}) VALUES {arg_vals[0]};")
+                insert = "INSERT"
+        if insert == "INSERT OVERWRITE":
+            statements.append(f"TRUNCATE TABLE {table};")
+    else:
+        statements.append(
+            f"INSERT OVERWRITE INTO {table} ({joined_arg_names}) VALUES ({arg_vals});"
+        )
+    field = arg_vals_list[0] if arg_vals_list else None
+    return statements, field
+
+
+def compare_result(case: Case, result) -> SqlCaseResult:
+    if case.result == "undefined":
+        return SqlCaseResult.success()
+    elif case.result == "error":
+        return SqlCaseResult.unexpected_pass(str(result))
+    # Issues with python float comparison:
+    # https://tutorpython.com/python-mathisclose/#The_problem_with_using_for_float_comparison
+    # https://stackoverflow.com/questions/5595425/what-is-the-best-way-to-compare-floats-for-almost-equality-in-python
+    elif case.result.type.startswith("fp") and case.result.value and result:
+        if math.isclose(result, case.result.value, rel_tol=1e-7):
+            return SqlCaseResult.success()
+    else:
+        if result == case.result.value:
+            return SqlCaseResult.success()
+        elif is_datetype(result) and str(result) == case.result.value:
+            return SqlCaseResult.success()
+        else:
+            return SqlCaseResult.mismatch(str(result))
+
+
+class SnowflakeRunner(SqlCaseRunner):
+    def __init__(self, dialect, connect_session: Callable[[], Any] = None, sessions: int = None):
+        super().__init__(dialect)
+        if connect_session is None:
+            connect_session, config_sessions = connect_from_config()
+            if sessions is None:
+                sessions = config_sessions
+        self.sessions = SessionPool(connect_session, sessions or 1)
+        self.__executor = None
+        if self.sessions.size > 1:
+            self.__executor = ThreadPoolExecutor(self.sessions.size)
+
+    def batch_key(self, case: Case) -> Hashable:
+        if self.__executor is None:
+            return None
+        return case_signature(case)
+
+    def run_sql_batch(
+        self, cases: List[Case], mapping: SqlMapping
+    ) -> List[SqlCaseResult]:
+        # Cases of a batch are independent, run them on as many sessions as the
+        # pool allows
+        return list(
+            self.__executor.map(lambda case: self.run_sql_case(case, mapping), cases)
         )
 
     def run_sql_case(self, case: Case, mapping: SqlMapping) -> SqlCaseResult:
+        self.timings.phase("setup")
+        with self.sessions.session() as session:
+            return self.__run_sql_case(session, case, mapping)
 
+    def __run_sql_case(
+        self, session: ScratchSession, case: Case, mapping: SqlMapping
+    ) -> SqlCaseResult:
         try:
             print(f"Running testcase {case} {mapping}")
-            cursor = self.conn.cursor()
-            arg_defs = []
-            for idx, arg in enumerate(case.args):
-                arg_type = type_to_snowflake_type(arg.type)
-                if arg_type is None:
-                    return SqlCaseResult.unsupported(f"Unsupported type {arg.type}")
-                arg_defs.append(f"arg{idx} {arg_type}")
-            schema = ",".join(arg_defs)
-            cursor.execute(f"CREATE TABLE my_table({schema});")
-            cursor.execute(f"SET TimeZone='UTC';")
-            print(f"Running case: {case} create table my_table({schema});")
+            cursor = session.cursor
+            schema, unsupported = schema_for(case)
+            if unsupported is not None:
+                return unsupported
+            table = session.table_for(schema)
+
+            self.timings.phase("load")
+            statements, field = load_statements(case, mapping, table)
+            for sql in statements:
+                cursor.execute(sql)
 
+            self.timings.phase("query")
             arg_names = [f"arg{idx}" for idx in range(len(case.args))]
-            joined_arg_names = ",".join(arg_names)
-            arg_vals_list = list()
-            for arg in case.args:
-                if is_string_type(arg):
-                    arg_vals_list.append("'" + literal_to_str(arg.value) + "'")
-                else:
-                    arg_vals_list.append(literal_to_str(arg.value))
-            arg_vals = ", ".join(arg_vals_list)
-            if mapping.aggregate:
-                arg_vals_list = list()
-                for arg in case.args:
-                    arg_vals = ""
-                    for value in arg.value:
-                        if is_string_type(arg):
-                            if value:
-                                arg_vals += f"('{literal_to_str(value)}'),"
-                            else:
-                                arg_vals += f"({literal_to_str(value)}),"
-                        elif is_float_type(arg):
-                            if value:
-                                arg_vals += f"({literal_to_float(value)}),"
-                            else:
-                                arg_vals += f"({literal_to_str(value)}),"
-                        else:
-                            arg_vals += f"({literal_to_str(value)}),"
-                    arg_vals_list.append([arg_vals[:-1]])
-                for arg_name, arg_vals in zip(arg_names, arg_vals_list):
-                    if len(arg_vals[0]):
-                        cursor.execute(
-                            f"INSERT INTO my_table ({arg_name}) VALUES {arg_vals[0]};"
-                        )
-            else:
-                cursor.execute(
-                    f"INSERT INTO my_table ({joined_arg_names}) VALUES ({arg_vals});"
-                )
-
-            if mapping.infix:
-                if len(arg_names) != 2:
-                    raise Exception(f"Infix function with {len(arg_names)} args")
-                expr = f"SELECT {arg_names[0]} {mapping.local_name} {arg_names[1]} FROM my_table;"
-            elif mapping.postfix:
-                if len(arg_names) != 1:
-                    raise Exception(f"Postfix function with {len(arg_names)} args")
-                expr = f"SELECT {arg_names[0]} {mapping.local_name} FROM my_table;"
-            elif mapping.extract:
-                if len(arg_names) != 2:
-                    raise Exception(f"Extract function with {len(arg_names)} args")
-                expr = f"SELECT {mapping.local_name}({arg_vals_list[0]} FROM {arg_names[1]}) FROM my_table;"
-            elif mapping.local_name == "count(*)":
-                expr = f"SELECT {mapping.local_name} FROM my_table;"
-            elif mapping.aggregate:
-                if len(arg_names) < 1:
-                    raise Exception(f"Aggregate function with {len(arg_names)} args")
-                expr = f"SELECT {mapping.local_name}({arg_names[0]}) FROM my_table;"
-            else:
-                expr = f"SELECT {mapping.local_name}({joined_arg_names}) FROM my_table;"
+            expr = select_query(mapping, table, arg_names, field)
             result = cursor.execute(expr).fetchone()[0]
 
-            if case.result == "undefined":
-                return SqlCaseResult.success()
-            elif case.result == "error":
-                return SqlCaseResult.unexpected_pass(str(result))
-            # Issues with python float comparison:
-            # https://tutorpython.com/python-mathisclose/#The_problem_with_using_for_float_comparison
-            # https://stackoverflow.com/questions/5595425/what-is-the-best-way-to-compare-floats-for-almost-equality-in-python
-            elif case.result.type.startswith("fp") and case.result.value and result:
-                if math.isclose(result, case.result.value, rel_tol=1e-7):
-                    return SqlCaseResult.success()
-            else:
-                if result == case.result.value:
-                    return SqlCaseResult.success()
-                elif is_datetype(result) and str(result) == case.result.value:
-                    return SqlCaseResult.success()
-                else:
-                    return SqlCaseResult.mismatch(str(result))
+            self.timings.phase("compare")
+            return compare_result(case, result)
         except Error as err:
             return SqlCaseResult.error(str(err))
-        finally:
-            cursor.execute("DROP TABLE IF EXISTS my_table")
-            cursor.close()
+
+
+class AsyncSnowflakeRunner(AsyncSqlCaseRunner):
+    """Runs cases like SnowflakeRunner on a pool of sessions submitting async queries"""
+
+    def __init__(self, dialect, connect_session: Callable[[], Any] = None, sessions: int = None):
+        super().__init__(dialect)
+        if connect_session is None:
+            connect_session, config_sessions = connect_from_config()
+            if sessions is None:
+                sessions = config_sessions
+
+        async def open_session():
+            return AsyncScratchSession(await asyncio.to_thread(connect_session))
+
+        self.sessions = ConnectionPool(
+            open_session, sessions or 1, lambda session: session.close()
+        )
+
+    async def run_sql_case(self, case: Case, mapping: SqlMapping) -> SqlCaseResult:
+        self.timings.phase("setup")
+        schema, unsupported = schema_for(case)
+        if unsupported is not None:
+            return unsupported
+        async with self.sessions.connection() as session:
+            try:
+                table = await session.table_for(schema)
+
+                self.timings.phase("load")
+                statements, field = load_statements(case, mapping, table)
+                for sql in statements:
+                    await session.execute(sql)
+
+                self.timings.phase("query")
+                arg_names = [f"arg{idx}" for idx in range(len(case.args))]
+                cursor = await session.execute(select_query(mapping, table, arg_names, field))
+                result = (await asyncio.to_thread(cursor.fetchone))[0]
+
+                self.timings.phase("compare")
+                return compare_result(case, result)
+            except Error as err:
+                return SqlCaseResult.error(str(err))
+
+    async def close(self):
+        await self.sessions.close()
@@ -0,0 +1,128 @@
+import re
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("snowflake.connector")
+
+from bft.cases.types import Case, CaseGroup, CaseLiteral
+from bft.dialects.loader import load_dialects
+from bft.cases.async_runner import ConcurrentCaseRunner
+from bft.testers.snowflake.runner import AsyncSnowflakeRunner, SnowflakeRunner
+
+STRING_URI = "https://github.com/substrait-io/substrait/blob/main/extensions/substrait/extensions/functions_string.yaml"
+
+
+class FakeServer(object):
+    """Stands in for Snowflake, evaluating lower() on the last inserted value"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections = []
+        self.statements = []
+        self.active = 0
+        self.max_active = 0
+
+    def connect(self):
+        conn = FakeConnection(self)
+        with self.lock:
+            self.connections.append(conn)
+        return conn
+
+
+class FakeConnection(object):
+    def __init__(self, server: FakeServer):
+        self.server = server
+        self.value = None
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def get_query_status_throw_if_error(self, query_id):
+        return "SUCCESS"
+
+    def is_still_running(self, status):
+        return False
+
+    def close(self):
+        pass
+
+
+class FakeCursor(object):
+    def __init__(self, conn: FakeConnection):
+        self.conn = conn
+        self.result = None
+
+    def execute(self, sql: str):
+        server = self.conn.server
+        with server.lock:
+            server.statements.append(sql)
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        time.sleep(0.005)
+        if sql.startswith("INSERT OVERWRITE"):
+            self.conn.value = re.search(r"VALUES \('(.*)'\);", sql).group(1)
+        elif sql.startswith("SELECT"):
+            self.result = (self.conn.value.lower(),)
+        with server.lock:
+            server.active -= 1
+        return self
+
+    def execute_async(self, sql: str):
+        self.execute(sql)
+        self.sfqid = len(self.conn.server.statements)
+
+    def get_results_from_sfqid(self, query_id):
+        pass
+
+    def fetchone(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+def make_case(value, result):
+    args = [CaseLiteral(value, "string")]
+    return Case("lower", STRING_URI, CaseGroup("basic", ""), args, CaseLiteral(result, "string"), [])
+
+
+def test_cases_share_pooled_sessions():
+    dialects_dir = Path(__file__).parent.parent.parent.parent / "dialects"
+    dialect = load_dialects(str(dialects_dir)).get_dialect_by_name("snowflake")
+    cases = [make_case(f"ABC{idx}", f"abc{idx}") for idx in range(20)]
+    cases.append(make_case("XYZ", "XYZ"))
+
+    serial_server = FakeServer()
+    serial_runner = SnowflakeRunner(dialect, serial_server.connect, sessions=1)
+    expected = [serial_runner.run_case(case) for case in cases]
+    assert [bool(result.passed) for result in expected] == [True] * 20 + [False]
+    assert len(serial_server.connections) == 1
+
+    server = FakeServer()
+    runner = SnowflakeRunner(dialect, server.connect, sessions=3)
+    runner.batch_cases(cases)
+    assert [runner.run_case(case) for case in cases] == expected
+    assert 1 < len(server.connections) <= 3
+    assert server.max_active <= 3
+    # The scratch table is created once per session, never dropped
+    creates = [sql for sql in server.statements if sql.startswith("CREATE")]
+    assert len(creates) == len(server.connections)
+    assert not [sql for sql in server.statements if sql.startswith(("DROP", "SET"))]
+
+
+def test_async_runner_matches_sync_runner():
+    dialects_dir = Path(__file__).parent.parent.parent.parent / "dialects"
+    dialect = load_dialects(str(dialects_dir)).get_dialect_by_name("snowflake")
+    cases = [make_case(f"ABC{idx}", f"abc{idx}") for idx in range(20)]
+    cases.append(make_case("XYZ", "XYZ"))
+    expected = [SnowflakeRunner(dialect, FakeServer().connect).run_case(case) for case in cases]
+
+    server = FakeServer()
+    runner = ConcurrentCaseRunner(AsyncSnowflakeRunner(dialect, server.connect, sessions=3), 6)
+    runner.batch_cases(cases)
+    assert [runner.run_case(case) for case in cases] == expected
+    assert 1 < len(server.connections) <= 3
+    runner.close()
@@ -1,12 +1,28 @@
+import snowflake.connector
+
+from bft.cases.async_runner import ConcurrentCaseRunner
 from bft.dialects.types import Dialect, DialectsLibrary
 from bft.testers.base_tester import BaseTester
 
-from .runner import SnowflakeRunner
+from .runner import AsyncSnowflakeRunner, SnowflakeRunner, cases_in_flight, connect_from_config
 
 
 class SnowflakeTester(BaseTester):
     def get_runner(self, dialect: Dialect):
+        in_flight = cases_in_flight()
+        if in_flight > 1:
+            return ConcurrentCaseRunner(AsyncSnowflakeRunner(dialect), in_flight)
         return SnowflakeRunner(dialect)
 
     def get_dialect(self, library: DialectsLibrary):
         return library.get_dialect_by_name("snowflake")
+
+    def engine_version(self) -> str:
+        # The results come from the server, not the client library
+        connect_session, _ = connect_from_config()
+        conn = connect_session()
+        try:
+            server_version = conn.cursor().execute("SELECT CURRENT_VERSION()").fetchone()[0]
+        finally:
+            conn.close()
+        return f"{snowflake.connector.__version__} {server_version}"
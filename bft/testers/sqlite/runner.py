@@ -1,9 +1,9 @@
 import math
 import sqlite3
-from typing import Dict, NamedTuple
+from typing import Dict, List, NamedTuple, Tuple
 
-from bft.cases.runner import SqlCaseResult, SqlCaseRunner
-from bft.cases.types import Case, CaseLiteral
+from bft.cases.runner import SqlCaseResult, SqlCaseRunner, select_expr, select_query
+from bft.cases.types import Case, CaseLiteral, case_signature
 from bft.dialects.types import SqlMapping
 from bft.utils.utils import type_to_dialect_type
 
@@ -52,12 +52,46 @@ def extract_argument_values(case: Case, mapping: SqlMapping):
     return arg_vals_list
 
 
+# Rows per INSERT statement when loading a batch
+INSERT_CHUNK_SIZE = 500
+
+
+def insert_rows(conn: sqlite3.Connection, table: str, columns: List[str], rows: List[str]):
+    """Inserts rows, each the SQL text of a parenthesized tuple of values"""
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        values = ",".join(rows[start : start + INSERT_CHUNK_SIZE])
+        conn.execute(f"INSERT INTO {table} ({','.join(columns)}) VALUES {values};")
+
+
+def compare_result(case: Case, result) -> SqlCaseResult:
+    if case.result == "undefined":
+        return SqlCaseResult.success()
+    elif case.result == "error":
+        return SqlCaseResult.unexpected_pass(str(result))
+    elif case.result == "nan":
+        return SqlCaseResult.error(str(result))
+    # Issues with python float comparison:
+    # https://tutorpython.com/python-mathisclose/#The_problem_with_using_for_float_comparison
+    # https://stackoverflow.com/questions/5595425/what-is-the-best-way-to-compare-floats-for-almost-equality-in-python
+    elif case.result.type.startswith("fp") and case.result.value and result:
+        if math.isclose(result, case.result.value, rel_tol=1e-7):
+            return SqlCaseResult.success()
+    else:
+        if result == case.result.value:
+            return SqlCaseResult.success()
+        else:
+            return SqlCaseResult.mismatch(str(result))
+
+
 class SqliteRunner(SqlCaseRunner):
     def __init__(self, dialect):
         super().__init__(dialect)
         self.conn = sqlite3.connect(":memory:")
+        # SQLite types of the args -> table used to evaluate batches of them
+        self.__bulk_tables: Dict[Tuple[str, ...], str] = {}
 
     def run_sql_case(self, case: Case, mapping: SqlMapping) -> SqlCaseResult:
+        self.timings.phase("setup")
         self.conn.execute("BEGIN;")
 
         try:
@@ -76,6 +110,7 @@ class SqliteRunner(SqlCaseRunner):
             arg_vals_list = extract_argument_values(case, mapping)
             arg_vals = ', '.join(flatten(arg_vals_list))
 
+            self.timings.phase("load")
             if mapping.aggregate:
                 for arg_name, arg_vals in zip(arg_names, arg_vals_list):
                     str_arg_vals = ",".join(f"({val})" for val in arg_vals)
@@ -88,46 +123,98 @@ class SqliteRunner(SqlCaseRunner):
                     f"INSERT INTO my_table ({joined_arg_names}) VALUES ({arg_vals});"
                 )
 
-            if mapping.infix:
-                if len(arg_names) != 2:
-                    raise Exception(f"Infix function with {len(arg_names)} args")
-                expr = f"SELECT {arg_names[0]} {mapping.local_name} {arg_names[1]} FROM my_table;"
-            elif mapping.postfix:
-                if len(arg_names) != 1:
-                    raise Exception(f"Postfix function with {len(arg_names)} args")
-                expr = f"SELECT {arg_names[0]} {mapping.local_name} FROM my_table;"
-            elif mapping.between:
-                if len(arg_names) != 3:
-                    raise Exception(f"Between function with {len(arg_names)} args")
-                expr = f"SELECT {arg_names[0]} BETWEEN {arg_names[1]} AND {arg_names[2]} FROM my_table;"
-            elif mapping.local_name == 'count(*)':
-                expr = f"SELECT {mapping.local_name} FROM my_table;"
-            elif mapping.aggregate:
-                if len(arg_names) < 1:
-                    raise Exception(f"Aggregate function with {len(arg_names)} args")
-                expr = f"SELECT {mapping.local_name}({arg_names[0]}) FROM my_table;"
-            else:
-                expr = f"SELECT {mapping.local_name}({joined_arg_names}) FROM my_table;"
+            self.timings.phase("query")
+            expr = select_query(mapping, "my_table", arg_names)
             result = self.conn.execute(expr).fetchone()[0]
-
-            if case.result == "undefined":
-                return SqlCaseResult.success()
-            elif case.result == "error":
-                return SqlCaseResult.unexpected_pass(str(result))
-            elif case.result == "nan":
-                return SqlCaseResult.error(str(result))
-            # Issues with python float comparison:
-            # https://tutorpython.com/python-mathisclose/#The_problem_with_using_for_float_comparison
-            # https://stackoverflow.com/questions/5595425/what-is-the-best-way-to-compare-floats-for-almost-equality-in-python
-            elif case.result.type.startswith("fp") and case.result.value and result:
-                if math.isclose(result, case.result.value, rel_tol=1e-7):
-                    return SqlCaseResult.success()
-            else:
-                if result == case.result.value:
-                    return SqlCaseResult.success()
-                else:
-                    return SqlCaseResult.mismatch(str(result))
+            self.timings.phase("compare")
+            return compare_result(case, result)
         except sqlite3.Error as err:
             return SqlCaseResult.error(str(err))
         finally:
+            self.timings.phase("teardown")
+            self.conn.rollback()
+
+    def batch_key(self, case: Case):
+        if not len(case.args):
+            return None
+        # String aggregates are inserted as a single value by run_sql_case
+        if any(arg.type == "string" and isinstance(arg.value, list) for arg in case.args):
+            return None
+        return case_signature(case)
+
+    def run_sql_batch(
+        self, cases: List[Case], mapping: SqlMapping
+    ) -> List[SqlCaseResult]:
+        if len(cases) < 2:
+            return super().run_sql_batch(cases, mapping)
+        arg_types = tuple(type_to_sqlite_type(arg.type) for arg in cases[0].args)
+        if None in arg_types:
+            return super().run_sql_batch(cases, mapping)
+        try:
+            rows = self.__select_batch(cases, mapping, arg_types)
+        except sqlite3.Error:
+            # A single bad row fails the whole query.  Fall back to running the
+            # cases one at a time so the error is attributed to the right case.
+            return super().run_sql_batch(cases, mapping)
+        self.timings.phase("compare")
+        results = []
+        for case_id, case in enumerate(cases):
+            if case_id in rows:
+                results.append(compare_result(case, rows[case_id]))
+            else:
+                # An aggregate over no rows produces no group
+                results.append(self.run_sql_case(case, mapping))
+        return results
+
+    def __bulk_table(self, arg_types: Tuple[str, ...]) -> str:
+        table = self.__bulk_tables.get(arg_types, None)
+        if table is None:
+            table = f"bulk_table{len(self.__bulk_tables)}"
+            arg_defs = ["case_id INTEGER"] + [
+                f"arg{idx} {arg_type}" for idx, arg_type in enumerate(arg_types)
+            ]
+            # Created outside of a transaction, so it outlives the batch
+            self.conn.execute(f"CREATE TABLE {table}({','.join(arg_defs)});")
+            self.__bulk_tables[arg_types] = table
+        return table
+
+    def __select_batch(
+        self, cases: List[Case], mapping: SqlMapping, arg_types: Tuple[str, ...]
+    ) -> Dict[int, object]:
+        """
+        Evaluates every case in one query against a table holding one row per
+        case (or, for aggregates, one group of rows per case) keyed by case_id
+
+        Values are written as the same SQL text run_sql_case uses, so a case
+        gets the same result whether or not it is batched.
+        """
+        self.timings.phase("setup")
+        table = self.__bulk_table(arg_types)
+        arg_names = [f"arg{idx}" for idx in range(len(arg_types))]
+        arg_vals = [extract_argument_values(case, mapping) for case in cases]
+        self.conn.execute("BEGIN;")
+        try:
+            self.timings.phase("load")
+            if mapping.aggregate:
+                for arg_idx, arg_name in enumerate(arg_names):
+                    rows = [
+                        f"({case_id}, {val})"
+                        for case_id, arg_vals_list in enumerate(arg_vals)
+                        for val in arg_vals_list[arg_idx]
+                    ]
+                    insert_rows(self.conn, table, ["case_id", arg_name], rows)
+                group_by = " GROUP BY case_id"
+            else:
+                rows = [
+                    f"({case_id}, {', '.join(flatten(arg_vals_list))})"
+                    for case_id, arg_vals_list in enumerate(arg_vals)
+                ]
+                insert_rows(self.conn, table, ["case_id"] + arg_names, rows)
+                group_by = ""
+
+            self.timings.phase("query")
+            expr = f"SELECT case_id, {select_expr(mapping, arg_names)} FROM {table}{group_by};"
+            return dict(self.conn.execute(expr).fetchall())
+        finally:
+            self.timings.phase("teardown")
             self.conn.rollback()
@@ -0,0 +1,27 @@
+from bft.cases.testing import STRING_URI, load_dialect, make_case, run_batched_and_single
+from bft.testers.sqlite.runner import SqliteRunner
+
+
+def test_batched_cases_match_individual_cases():
+    dialect = load_dialect("sqlite")
+    silent = [("overflow", "SILENT"), ("rounding", "TIE_TO_EVEN")]
+    cases = [
+        make_case("add", [(1, "i32"), (2, "i32")], (3, "i32"), options=silent),
+        make_case("add", [(5, "i32"), (None, "i32")], (None, "i32"), options=silent),
+        make_case("add", [(5, "i32"), (5, "i32")], (11, "i32"), options=silent),
+        make_case("add", [(1.5, "fp64"), ("inf", "fp64")], (float("inf"), "fp64"), options=silent),
+        make_case("add", [(1.5, "fp64"), (2.25, "fp64")], (3.75, "fp64"), options=silent),
+        make_case("sum", [([1, 2, None], "i32")], (3, "i64")),
+        make_case("sum", [([], "i32")], (None, "i64")),
+        make_case("sum", [([4, 5], "i32")], (9, "i64")),
+        make_case("add", [("nan", "fp64"), (None, "fp64")], (None, "fp64"), options=silent),
+        make_case("add", [(1.0, "fp64"), ("-inf", "fp64")], (float("-inf"), "fp64"), options=silent),
+        make_case("sum", [(["nan", 1.0], "fp64")], "nan"),
+        make_case("sum", [(["inf", 1.0], "fp64")], (float("inf"), "fp64")),
+        make_case("lower", [("ABC", "string")], ("abc", "string"), uri=STRING_URI),
+        make_case("lower", [("It's", "string")], ("it's", "string"), uri=STRING_URI),
+        make_case("lower", [("Q", "string")], ("q", "string"), uri=STRING_URI),
+    ]
+
+    batched, expected = run_batched_and_single(lambda: SqliteRunner(dialect), cases)
+    assert batched == expected
@@ -1,3 +1,5 @@
+import sqlite3
+
 from bft.dialects.types import Dialect, DialectsLibrary
 from bft.testers.base_tester import BaseTester
 
@@ -10,3 +12,6 @@ class SqliteTester(BaseTester):
 
     def get_dialect(self, library: DialectsLibrary):
         return library.get_dialect_by_name("sqlite")
+
+    def engine_version(self) -> str:
+        return sqlite3.sqlite_version
@@ -1,65 +1,134 @@
 import math
+from typing import Dict, List, Tuple
 
 import pyvelox.pyvelox as pv
 
 from bft.cases.runner import Case, SqlCaseResult, SqlCaseRunner, SqlMapping
+from bft.cases.types import case_signature
 from bft.dialects.types import Dialect
 
+# Vectors are created with an explicit type so that null values, which carry no
+# type of their own, can be part of them
+type_map = {
+    "i64": pv.BigintType(),
+    "fp64": pv.DoubleType(),
+    "boolean": pv.BooleanType(),
+    "string": pv.VarcharType(),
+}
+
 
 def is_type_supported(type):
-    return type in set({"i64", "fp64", "boolean", "string"})
+    return type in type_map
+
+
+def arg_value(arg_type: str, value):
+    if arg_type == "fp64" and value is not None:
+        return float(value)
+    return value
+
+
+def expr_string(mapping: SqlMapping, num_args: int) -> str:
+    arg_names = [f"arg{idx}" for idx in range(num_args)]
+    if mapping.infix:
+        if num_args != 2:
+            raise Exception(f"Infix function with {num_args} args")
+        return f"arg0 {mapping.local_name} arg1"
+    elif mapping.postfix:
+        if num_args != 1:
+            raise Exception(f"Postfix function with {num_args} args")
+        return f"arg0 {mapping.local_name}"
+    elif mapping.between:
+        if num_args != 3:
+            raise Exception(f"between function with {num_args} args")
+        return f"arg0 {mapping.local_name} arg1 and arg2"
+    else:
+        joined_args = ", ".join(arg_names)
+        return f"{mapping.local_name}({joined_args})"
+
+
+def compare_result(case: Case, result) -> SqlCaseResult:
+    if case.result == "undefined":
+        return SqlCaseResult.success()
+    elif case.result == "error":
+        return SqlCaseResult.unexpected_pass(str(result))
+    elif case.result == "nan":
+        if math.isnan(result):
+            return SqlCaseResult.success()
+    else:
+        if result == case.result.value:
+            return SqlCaseResult.success()
+        else:
+            return SqlCaseResult.mismatch(str(result))
 
 
 class VeloxRunner(SqlCaseRunner):
     def __init__(self, dialect: Dialect):
         super().__init__(dialect)
+        # (mapping, number of args) -> parsed expression
+        self.__expressions: Dict[Tuple[SqlMapping, int], pv.Expression] = {}
 
-    def run_sql_case(self, case: Case, mapping: SqlMapping) -> SqlCaseResult:
+    def __expression(self, mapping: SqlMapping, num_args: int) -> pv.Expression:
+        key = (mapping, num_args)
+        expr = self.__expressions.get(key, None)
+        if expr is None:
+            expr = pv.Expression.from_string(expr_string(mapping, num_args))
+            self.__expressions[key] = expr
+        return expr
+
+    def __evaluate(self, cases: List[Case], mapping: SqlMapping) -> List:
+        """Evaluates the expression for mapping once over a vector per arg holding one row per case"""
+        num_args = len(cases[0].args)
+        arg_names = [f"arg{idx}" for idx in range(num_args)]
+        self.timings.phase("load")
         arg_vectors = []
-        arg_names = []
-        for arg_idx, arg in enumerate(case.args):
+        for arg_idx, arg in enumerate(cases[0].args):
+            values = [
+                arg_value(arg.type, case.args[arg_idx].value) for case in cases
+            ]
+            arg_vectors.append(pv.from_list(values, type_map[arg.type]))
+        self.timings.phase("setup")
+        expr = self.__expression(mapping, num_args)
+        self.timings.phase("query")
+        return [v for v in expr.evaluate(arg_names, arg_vectors)]
+
+    def run_sql_case(self, case: Case, mapping: SqlMapping) -> SqlCaseResult:
+        for arg in case.args:
             if not is_type_supported(arg.type):
                 return SqlCaseResult.unsupported(
                     f"The type {arg.type} is not supported"
                 )
-            arg_vectors.append(pv.from_list([arg.value]))
-            arg_names.append(f"arg{arg_idx}")
-        if mapping.infix:
-            if len(case.args) != 2:
-                raise Exception(f"Infix function with {len(case.args)} args")
-            expr_str = f"arg0 {mapping.local_name} arg1"
-        elif mapping.postfix:
-            if len(arg_names) != 1:
-                raise Exception(f"Postfix function with {len(arg_names)} args")
-            expr_str = f"arg0 {mapping.local_name}"
-        elif mapping.between:
-            if len(arg_names) != 3:
-                raise Exception(f"between function with {len(arg_names)} args")
-            expr_str = f"arg0 {mapping.local_name} arg1 and arg2"
-        else:
-            joined_args = ", ".join(arg_names)
-            expr_str = f"{mapping.local_name}({joined_args})"
+        # Raised outside of the try, an arity mismatch is a bug in the dialect
+        expr_string(mapping, len(case.args))
 
         try:
-            expr = pv.Expression.from_string(expr_str)
-            answer = expr.evaluate(arg_names, arg_vectors)
-            result = [v for v in answer]
+            result = self.__evaluate([case], mapping)
         except RuntimeError as err:
             return SqlCaseResult.error(str(err))
 
         if len(result) != 1:
             raise Exception("Scalar function with one row output more than one row")
-        result = result[0]
+        self.timings.phase("compare")
+        return compare_result(case, result[0])
 
-        if case.result == "undefined":
-            return SqlCaseResult.success()
-        elif case.result == "error":
-            return SqlCaseResult.unexpected_pass(str(result))
-        elif case.result == "nan":
-            if math.isnan(result):
-                return SqlCaseResult.success()
-        else:
-            if result == case.result.value:
-                return SqlCaseResult.success()
-            else:
-                return SqlCaseResult.mismatch(str(result))
+    def batch_key(self, case: Case):
+        return case_signature(case)
+
+    def run_sql_batch(
+        self, cases: List[Case], mapping: SqlMapping
+    ) -> List[SqlCaseResult]:
+        if len(cases) < 2 or not len(cases[0].args):
+            return super().run_sql_batch(cases, mapping)
+        for arg in cases[0].args:
+            if not is_type_supported(arg.type):
+                return super().run_sql_batch(cases, mapping)
+        try:
+            results = self.__evaluate(cases, mapping)
+        except RuntimeError:
+            # Velox fails the whole vector when one row errors.  Fall back to
+            # evaluating the cases one at a time so the error is attributed to
+            # the right case.
+            return super().run_sql_batch(cases, mapping)
+        if len(results) != len(cases):
+            raise Exception("Scalar function with one row per case output a different number of rows")
+        self.timings.phase("compare")
+        return [compare_result(case, result) for case, result in zip(cases, results)]
@@ -0,0 +1,23 @@
+import pytest
+
+pytest.importorskip("pyvelox.pyvelox")
+
+from bft.cases.testing import load_dialect, make_case, run_batched_and_single
+from bft.testers.velox.runner import VeloxRunner
+
+
+def test_batched_cases_match_individual_cases():
+    dialect = load_dialect("velox_presto")
+    error = [("overflow", "ERROR"), ("rounding", "TIE_TO_EVEN")]
+    cases = [
+        make_case("add", [(1, "i64"), (2, "i64")], (3, "i64"), options=error),
+        make_case("add", [(5, "i64"), (None, "i64")], (None, "i64"), options=error),
+        make_case("add", [(None, "i64"), (None, "i64")], (None, "i64"), options=error),
+        make_case("add", [(5, "i64"), (5, "i64")], (11, "i64"), options=error),
+        make_case("add", [(2**63 - 1, "i64"), (1, "i64")], "error", options=error),
+    ]
+
+    batched, expected = run_batched_and_single(lambda: VeloxRunner(dialect), cases)
+    # Null args are evaluated like any other value
+    assert expected[1].passed and expected[2].passed
+    assert batched == expected
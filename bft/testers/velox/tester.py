@@ -1,3 +1,5 @@
+import pyvelox
+
 from bft.cases.runner import CaseRunner
 from bft.dialects.types import Dialect, DialectsLibrary
 from bft.testers.base_tester import BaseTester
@@ -10,3 +12,6 @@ class VeloxTester(BaseTester):
 
     def get_dialect(self, library: DialectsLibrary) -> Dialect:
         return library.get_dialect_by_name("velox_presto")
+
+    def engine_version(self) -> str:
+        return pyvelox.__version__
@@ -1,32 +1,61 @@
-from pathlib import Path
+import os
 from typing import List
 
 import pytest
 
-from bft.cases.parser import CaseFileParser
+from bft.cases.loader import CaseFilter
+from bft.cases.selection import Selection
 from bft.cases.types import Case
-from bft.testers.base_tester import BaseTester
-from tools.convert_testcases.convert_testcases_to_yaml_format import (
-    convert_directory as convert_directory_from_substrait,
-)
+from bft.cli import load_corpus
+from bft.testers.base_tester import FAILED, XFAILED, BaseTester, classify
+
+
+def case_filter_from_env() -> CaseFilter:
+    """
+    Reads a filter from the comma separated BFT_FUNCTIONS, BFT_BASE_URIS and
+    BFT_GROUPS environment variables, e.g. BFT_FUNCTIONS=add,subtract
+
+    Case files for other functions or URIs are then never parsed.
+    """
+
+    def values(name: str):
+        value = os.environ.get(name, "")
+        if not value:
+            return None
+        return {item.strip() for item in value.split(",")}
+
+    case_filter = CaseFilter(
+        values("BFT_FUNCTIONS"), values("BFT_BASE_URIS"), values("BFT_GROUPS")
+    )
+    if case_filter == CaseFilter():
+        return None
+    return case_filter
 
 
 # Would be nice to have this as a session-scoped fixture but it doesn't seem that
 # parameter values can be a fixture
-def cases() -> List[Case]:
-    cases = []
-    bft_dir = Path(__file__).parent.parent.parent
-    parser = CaseFileParser()
-    cases_dir = bft_dir / "cases"
-    substrait_cases_dir = bft_dir / "substrait" / "tests" / "cases"
-    convert_directory_from_substrait(substrait_cases_dir, cases_dir)
-    for case_path in cases_dir.resolve().rglob("*.yaml"):
-        with open(case_path, "rb") as case_f:
-            for case_file in parser.parse(case_f):
-                for case in case_file.cases:
-                    case = transform_case(case)
-                    cases.append(case)
-    return cases
+def cases(dialect: str = None) -> List[Case]:
+    """
+    Loads the cases, limited to those selected for dialect if BFT_SELECTION is the
+    path of a selection written by python -m bft impact
+    """
+    case_filter = case_filter_from_env()
+    selection_path = os.environ.get("BFT_SELECTION", "")
+    if not selection_path:
+        return [transform_case(case) for case in load_corpus(case_filter)]
+    selection = Selection.load(selection_path)
+    functions = selection.functions()
+    if case_filter is None:
+        case_filter = CaseFilter(functions)
+    elif case_filter.functions is None:
+        case_filter = case_filter._replace(functions=functions)
+    else:
+        case_filter = case_filter._replace(functions=case_filter.functions & functions)
+    return [
+        transform_case(case)
+        for case in load_corpus(case_filter)
+        if selection.selects(dialect, case)
+    ]
 
 
 def transform_case(case):
@@ -46,23 +75,11 @@ def case_id_fn(case: Case):
 
 
 def run_test(case: Case, tester: BaseTester):
-    if tester.runner.__class__.__name__ == "VeloxRunner":
-        for case_literal in case.args:
-            if case_literal.value is None:
-                pytest.skip("Skipping. Pyvelox does not support null input")
-    if tester.runner.__class__.__name__ == "PostgresRunner":
-        if type(case.result) != str and "inf" in str(case.result[0]):
-            pytest.skip(
-                "Skipping. Postgres errors out when dealing with infinite addition"
-            )
-    result = tester.run_test(case)
-    if result.passed:
-        if not result.should_have_passed:
-            pytest.fail(f"Unexpected pass: {result.reason}")
-        else:
-            assert result.passed
-    else:
-        if result.should_have_passed:
-            pytest.fail(f"Unexpected fail: {result.reason}")
-        else:
-            pytest.xfail(result.reason)
+    skip_reason = tester.skip_reason(case)
+    if skip_reason is not None:
+        pytest.skip(skip_reason)
+    outcome, reason = classify(tester.run_test(case))
+    if outcome == FAILED:
+        pytest.fail(reason)
+    elif outcome == XFAILED:
+        pytest.xfail(reason)
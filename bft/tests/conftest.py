@@ -1,10 +1,98 @@
+import os
 from pathlib import Path
 from typing import List
 
 import pytest
 
+from bft.cases.timing import TIMINGS_ENV, case_timings
 from bft.dialects.loader import load_dialects
 from bft.dialects.types import DialectsLibrary
+from bft.testers.result_cache import ResultCache
+
+# Number of functions listed in the timing summary
+SLOWEST_FUNCTIONS = 10
+
+# The store of the result_cache fixture, reported on at the end of the session
+_result_cache: ResultCache = None
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--bft-jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes to run cases with",
+    )
+    parser.addoption(
+        "--bft-cache-results",
+        action="store_true",
+        help="Reuse stored results of cases whose content, mapping and engine version are unchanged",
+    )
+    parser.addoption(
+        "--bft-force",
+        action="store_true",
+        help="Run every case again and replace the stored results (implies --bft-cache-results)",
+    )
+    parser.addoption(
+        "--bft-timings",
+        default=None,
+        metavar="PATH",
+        help="Record the time spent per function and phase and write it to PATH (.json or .csv)",
+    )
+
+
+def pytest_configure(config):
+    if config.getoption("--bft-timings") is not None:
+        # Set in the environment so that worker processes record timings too
+        os.environ[TIMINGS_ENV] = "1"
+        case_timings.enabled = True
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    if _result_cache is not None:
+        terminalreporter.write_line(
+            f"bft: {_result_cache.hits} results reused, {_result_cache.misses} cases run"
+        )
+    if not case_timings.enabled:
+        return
+    phases = {}
+    for timing in case_timings.phase_timings():
+        phases.setdefault((timing.dialect, timing.function), []).append(timing)
+    terminalreporter.section("bft timings")
+    for dialect, seconds in sorted(case_timings.dialect_timings().items()):
+        terminalreporter.write_line(f"{dialect}: {seconds:.3f}s")
+    terminalreporter.write_line(f"Slowest {SLOWEST_FUNCTIONS} functions:")
+    for timing in case_timings.function_timings()[:SLOWEST_FUNCTIONS]:
+        breakdown = ", ".join(
+            f"{phase.phase} {phase.seconds:.3f}s"
+            for phase in sorted(
+                phases[(timing.dialect, timing.function)],
+                key=lambda phase: phase.seconds,
+                reverse=True,
+            )
+        )
+        terminalreporter.write_line(
+            f"{timing.seconds:8.3f}s {timing.dialect} {timing.function} "
+            f"({timing.cases} cases: {breakdown})"
+        )
+    report_path = config.getoption("--bft-timings")
+    if report_path is not None:
+        case_timings.write_report(report_path)
+        terminalreporter.write_line(f"Timings written to {report_path}")
+
+
+@pytest.fixture(scope="session")
+def bft_jobs(request) -> int:
+    return request.config.getoption("--bft-jobs")
+
+
+@pytest.fixture(scope="session")
+def result_cache(request) -> ResultCache:
+    global _result_cache
+    force = request.config.getoption("--bft-force")
+    if request.config.getoption("--bft-cache-results") or force:
+        _result_cache = ResultCache(force=force)
+    return _result_cache
 
 
 @pytest.fixture(scope="session")
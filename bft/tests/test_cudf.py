@@ -4,14 +4,18 @@ from bft.testers.cudf.tester import CudfTester
 
 from .base import cases, run_test
 
+cudf_cases = cases("cudf")
+
 
 @pytest.fixture(scope="module")
-def tester(dialects):
+def tester(dialects, result_cache, bft_jobs):
     instance = CudfTester()
-    instance.prepare(dialects)
+    instance.prepare(dialects, result_cache)
+    instance.batch_cases(cudf_cases)
+    instance.precompute(cudf_cases, bft_jobs)
     return instance
 
 
-@pytest.mark.parametrize("case", cases())
+@pytest.mark.parametrize("case", cudf_cases)
 def test_functions(case, tester):
     run_test(case, tester)
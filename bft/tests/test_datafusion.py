@@ -4,14 +4,18 @@ from bft.testers.datafusion.tester import DatafustionTester
 
 from .base import cases, run_test
 
+datafusion_cases = cases("datafusion")
+
 
 @pytest.fixture(scope="module")
-def tester(dialects):
+def tester(dialects, result_cache, bft_jobs):
     instance = DatafustionTester()
-    instance.prepare(dialects)
+    instance.prepare(dialects, result_cache)
+    instance.batch_cases(datafusion_cases)
+    instance.precompute(datafusion_cases, bft_jobs)
     return instance
 
 
-@pytest.mark.parametrize("case", cases())
+@pytest.mark.parametrize("case", datafusion_cases)
 def test_functions(case, tester):
     run_test(case, tester)
@@ -4,14 +4,18 @@ from bft.testers.duckdb.tester import DuckDBTester
 
 from .base import cases, run_test
 
+duckdb_cases = cases("duckdb")
+
 
 @pytest.fixture(scope="module")
-def tester(dialects):
+def tester(dialects, result_cache, bft_jobs):
     instance = DuckDBTester()
-    instance.prepare(dialects)
+    instance.prepare(dialects, result_cache)
+    instance.batch_cases(duckdb_cases)
+    instance.precompute(duckdb_cases, bft_jobs)
     return instance
 
 
-@pytest.mark.parametrize("case", cases())
+@pytest.mark.parametrize("case", duckdb_cases)
 def test_functions(case, tester):
     run_test(case, tester)
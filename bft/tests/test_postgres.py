@@ -4,14 +4,18 @@ from bft.testers.postgres.tester import PostgresTester
 
 from .base import cases, run_test
 
+postgres_cases = cases("postgres")
+
 
 @pytest.fixture(scope="module")
-def tester(dialects):
+def tester(dialects, result_cache, bft_jobs):
     instance = PostgresTester()
-    instance.prepare(dialects)
+    instance.prepare(dialects, result_cache)
+    instance.batch_cases(postgres_cases)
+    instance.precompute(postgres_cases, bft_jobs)
     return instance
 
 
-@pytest.mark.parametrize("case", cases())
+@pytest.mark.parametrize("case", postgres_cases)
 def test_functions(case, tester):
     run_test(case, tester)
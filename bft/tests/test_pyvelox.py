@@ -4,14 +4,18 @@ from bft.testers.velox.tester import VeloxTester
 
 from .base import cases, run_test
 
+velox_cases = cases("velox_presto")
+
 
 @pytest.fixture(scope="module")
-def tester(dialects):
+def tester(dialects, result_cache, bft_jobs):
     instance = VeloxTester()
-    instance.prepare(dialects)
+    instance.prepare(dialects, result_cache)
+    instance.batch_cases(velox_cases)
+    instance.precompute(velox_cases, bft_jobs)
     return instance
 
 
-@pytest.mark.parametrize("case", cases())
+@pytest.mark.parametrize("case", velox_cases)
 def test_functions(case, tester):
     run_test(case, tester)
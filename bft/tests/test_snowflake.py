@@ -4,14 +4,18 @@ from bft.testers.snowflake.tester import SnowflakeTester
 
 from .base import cases, run_test
 
+snowflake_cases = cases("snowflake")
+
 
 @pytest.fixture(scope="module")
-def tester(dialects):
+def tester(dialects, result_cache, bft_jobs):
     instance = SnowflakeTester()
-    instance.prepare(dialects)
+    instance.prepare(dialects, result_cache)
+    instance.batch_cases(snowflake_cases)
+    instance.precompute(snowflake_cases, bft_jobs)
     return instance
 
 
-@pytest.mark.parametrize("case", cases())
+@pytest.mark.parametrize("case", snowflake_cases)
 def test_functions(case, tester):
     run_test(case, tester)
@@ -4,14 +4,18 @@ from bft.testers.sqlite.tester import SqliteTester
 
 from .base import cases, run_test
 
+sqlite_cases = cases("sqlite")
+
 
 @pytest.fixture(scope="module")
-def tester(dialects):
+def tester(dialects, result_cache, bft_jobs):
     instance = SqliteTester()
-    instance.prepare(dialects)
+    instance.prepare(dialects, result_cache)
+    instance.batch_cases(sqlite_cases)
+    instance.precompute(sqlite_cases, bft_jobs)
     return instance
 
 
-@pytest.mark.parametrize("case", cases())
+@pytest.mark.parametrize("case", sqlite_cases)
 def test_functions(case, tester):
     run_test(case, tester)
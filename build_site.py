@@ -1,35 +1,42 @@
+import argparse
 import shutil
 from pathlib import Path
 
-from bft.html.builder import build_site
+from bft.html.builder import build_site, copy_with_progress
 
 
-def copy_with_progress(src, dst, copy_function=shutil.copy2):
-    for source_path in Path(src).rglob('*'):
-        relative_path = source_path.relative_to(src)
-        destination_path = dst / relative_path
+def main():
+    parser = argparse.ArgumentParser(description="Builds the BFT static site")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Keep the existing output and only re-render pages that changed",
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=1, help="Number of processes to render pages with"
+    )
+    args = parser.parse_args()
 
-        if source_path.is_file():
-            destination_path.parent.mkdir(parents=True, exist_ok=True)
-            copy_function(source_path, destination_path)
-            print(f"Copying: {source_path} -> {destination_path}")
+    root = Path(__file__).parent.resolve()
+    index = root / "index.yaml"
+    dest = root / "dist"
 
-root = Path(__file__).parent.resolve()
-index = root / "index.yaml"
-dest = root / "dist"
+    # Remove the destination directory if it exists
+    if dest.exists() and not args.incremental:
+        shutil.rmtree(dest)
 
-# Remove the destination directory if it exists
-if dest.exists():
-    shutil.rmtree(dest)
+    # Create the destination directory
+    dest.mkdir(exist_ok=True)
 
-# Create the destination directory
-dest.mkdir()
+    build_site(index, dest, incremental=args.incremental, jobs=args.jobs)
 
-build_site(index, dest)
+    static_content_dir = root / "static_site"
 
-static_content_dir = root / "static_site"
+    # Use the custom copy_with_progress function
+    copy_with_progress(static_content_dir, dest)
 
-# Use the custom copy_with_progress function
-copy_with_progress(static_content_dir, dest)
+    print("Copying static files completed.")
 
-print("Copying static files completed.")
+
+if __name__ == "__main__":
+    main()
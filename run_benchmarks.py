@@ -0,0 +1,80 @@
+import argparse
+import sys
+
+from bft.benchmarks.suite import (
+    STAGES,
+    find_regressions,
+    load_baseline,
+    run_benchmarks,
+    save_baseline,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Times the BFT pipeline stages on synthetic corpora"
+    )
+    parser.add_argument(
+        "--stages",
+        nargs="+",
+        choices=list(STAGES.keys()),
+        default=list(STAGES.keys()),
+        help="Stages to benchmark (default: all)",
+    )
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        type=int,
+        default=[1, 10],
+        help="Corpus sizes, in copies of each template function",
+    )
+    parser.add_argument(
+        "--cases-per-function", type=int, default=20, help="Cases generated per function"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Runs per stage, the best time is kept"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the corpus")
+    parser.add_argument(
+        "--save-baseline", metavar="PATH", help="Write the results to PATH as a baseline"
+    )
+    parser.add_argument(
+        "--baseline", metavar="PATH", help="Compare the results to the baseline at PATH"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Fraction a stage may be slower than the baseline before it is reported",
+    )
+    args = parser.parse_args()
+
+    results = run_benchmarks(
+        args.stages, args.sizes, args.cases_per_function, args.repeat, args.seed
+    )
+    print(f"{'stage':<20} {'size':>6} {'items':>8} {'seconds':>10} {'items/s':>12}")
+    for result in results:
+        print(
+            f"{result.stage:<20} {result.size:>6} {result.items:>8} "
+            f"{result.seconds:>10.4f} {result.items_per_second:>12.1f}"
+        )
+
+    if args.save_baseline is not None:
+        save_baseline(args.save_baseline, results)
+        print(f"Baseline written to {args.save_baseline}")
+
+    if args.baseline is not None:
+        regressions = find_regressions(
+            results, load_baseline(args.baseline), args.tolerance
+        )
+        for regression in regressions:
+            print(
+                f"Regression: {regression.stage} (size {regression.size}) took "
+                f"{regression.seconds:.4f}s, the baseline is {regression.baseline_seconds:.4f}s"
+            )
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,15 @@
+import hashlib
+import io
+import json
 import os
+from pathlib import Path
 
 from ruamel.yaml import YAML
 from tests.coverage.nodes import (
     TestFile,
     AggregateArgument,
 )
-from tests.coverage.case_file_parser import load_all_testcases
+from tests.coverage.case_file_parser import load_all_testcases, parse_one_file
 from tools.convert_testcases.convert_testcase_helper import (
     convert_to_yaml_value,
     convert_to_long_type,
@@ -18,6 +22,9 @@ yaml = YAML()
 yaml.indent(mapping=2, sequence=4, offset=2)  # Adjust indentations as needed
 yaml.width = 4096  # Extend line width to prevent line breaks
 
+# Written to the output directory by incremental conversions
+MANIFEST_FILE = ".convert_manifest.json"
+
 
 def convert_result(test_case):
     """Convert the result section based on specific conditions."""
@@ -146,39 +153,138 @@ def convert_test_file_to_yaml(testFile: TestFile):
 
 
 def output_test_data(output_file, input_path, yaml_data):
-    with open(output_file, "w") as f:
-        yaml.dump(yaml_data, f)
+    stream = io.StringIO()
+    yaml.dump(yaml_data, stream)
+    content = fix_quotes(stream.getvalue())
 
-    fix_quotes(output_file)
+    # Write to a temporary file first so an interrupted run never leaves a
+    # truncated case file behind
+    tmp_file = f"{output_file}.{os.getpid()}.tmp"
+    with open(tmp_file, "w") as f:
+        f.write(content)
+    os.replace(tmp_file, output_file)
 
     print(f"Converted '{input_path}' to '{output_file}'.")
 
 
-def fix_quotes(file_path):
-    with open(file_path, "r") as file:
-        content = file.read()
-
+def fix_quotes(content):
     # Remove all single quotes
-    content = (
+    return (
         content.replace("'", "")
         .replace('"', "")
         .replace(SQUOTE_PLACEHOLDER, "'")
         .replace(DQUOTE_PLACEHOLDER, '"')
     )
 
-    with open(file_path, "w") as file:
-        file.write(content)
-
 
-def convert_directory(input_dir, output_dir):
+def output_path_for(input_file, input_dir, output_dir):
+    relative_path = os.path.relpath(input_file, input_dir)
+    return os.path.join(output_dir, relative_path).replace(".test", ".yaml")
+
+
+def convert_file(input_test_file, input_dir, output_dir):
+    output_file = output_path_for(input_test_file.path, input_dir, output_dir)
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    yaml_data = convert_test_file_to_yaml(input_test_file)
+    output_test_data(output_file, input_test_file.path, yaml_data)
+    return output_file
+
+
+def hash_file(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def converter_version():
+    """A hash of the converter source, so a converter change regenerates every output"""
+    hasher = hashlib.sha256()
+    for module_file in [__file__, Path(__file__).parent / "convert_testcase_helper.py"]:
+        with open(module_file, "rb") as f:
+            hasher.update(f.read())
+    return hasher.hexdigest()
+
+
+def load_manifest(manifest_path):
+    try:
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    if manifest.get("converter_version") != converter_version():
+        return {}
+    return manifest.get("files", {})
+
+
+def save_manifest(manifest_path, files):
+    tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(
+            {"converter_version": converter_version(), "files": files},
+            f,
+            indent=2,
+            sort_keys=True,
+        )
+    os.replace(tmp_path, manifest_path)
+
+
+def is_up_to_date(entry, input_file, input_stat, output_file):
+    """
+    Checks a manifest entry against the input and output files
+
+    The input is only hashed if its mtime or size changed.  The output is always
+    hashed so an edited or deleted output is regenerated.
+    """
+    if entry is None or not os.path.exists(output_file):
+        return False
+    if (entry["mtime_ns"], entry["size"]) != (input_stat.st_mtime_ns, input_stat.st_size):
+        if entry["hash"] != hash_file(input_file):
+            return False
+    return entry["output_hash"] == hash_file(output_file)
+
+
+def convert_directory_incremental(input_dir, output_dir):
+    """
+    Converts only the .test files that changed since the last incremental run
+
+    A manifest in the output directory records, for each input, its mtime, size
+    and hash along with the hash of the output generated from it.  Outputs whose
+    input was removed are deleted.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+    old_files = load_manifest(manifest_path)
+    new_files = {}
+    for input_path in sorted(Path(input_dir).rglob("*.test")):
+        input_file = str(input_path)
+        relative_path = os.path.relpath(input_file, input_dir)
+        output_file = output_path_for(input_file, input_dir, output_dir)
+        input_stat = os.stat(input_file)
+        entry = old_files.get(relative_path)
+        if not is_up_to_date(entry, input_file, input_stat, output_file):
+            convert_file(parse_one_file(input_file), input_dir, output_dir)
+            entry = {"hash": hash_file(input_file), "output_hash": hash_file(output_file)}
+        entry["mtime_ns"] = input_stat.st_mtime_ns
+        entry["size"] = input_stat.st_size
+        new_files[relative_path] = entry
+
+    for relative_path in old_files.keys() - new_files.keys():
+        stale_output = output_path_for(
+            os.path.join(input_dir, relative_path), input_dir, output_dir
+        )
+        if os.path.exists(stale_output):
+            os.remove(stale_output)
+            print(f"Removed '{stale_output}', its source no longer exists.")
+
+    save_manifest(manifest_path, new_files)
+
+
+def convert_directory(input_dir, output_dir, incremental=False):
+    if incremental:
+        convert_directory_incremental(input_dir, output_dir)
+        return
     input_test_files = load_all_testcases(input_dir)
     for input_test_file in input_test_files:
-        input_file = input_test_file.path
-        relative_path = os.path.relpath(input_file, input_dir)
-        output_file = os.path.join(output_dir, relative_path).replace(".test", ".yaml")
-        os.makedirs(os.path.dirname(output_file), exist_ok=True)
-        yaml_data = convert_test_file_to_yaml(input_test_file)
-        output_test_data(output_file, input_test_file.path, yaml_data)
+        convert_file(input_test_file, input_dir, output_dir)
 
 
 def main():
@@ -1,5 +1,6 @@
 import pytest
 
+import convert_testcases_to_yaml_format
 from convert_testcases_to_yaml_format import convert_test_file_to_yaml
 from tests.coverage.nodes import (
     TestFile,
@@ -236,3 +237,59 @@ from tests.coverage.nodes import (
 def test_convert_test_file_to_yaml(test_file, expected_yaml):
     result = convert_test_file_to_yaml(test_file)
     assert result == expected_yaml
+
+
+def test_convert_directory_incremental(tmp_path, monkeypatch):
+    input_dir = tmp_path / "cases"
+    output_dir = tmp_path / "bft_cases"
+    input_file = input_dir / "arithmetic" / "power.test"
+    input_file.parent.mkdir(parents=True)
+    input_file.write_text("8 ^ 2")
+    parsed = []
+
+    def parse_one_file(path):
+        parsed.append(path)
+        return TestFile(
+            path=path,
+            version="v1.0",
+            include="/extensions/functions_arithmetic.yaml",
+            testcases=[
+                TestCase(
+                    func_name="power",
+                    base_uri="https://github.com/substrait-io/substrait",
+                    group=CaseGroup(name="basic: Basic examples", description=""),
+                    options={},
+                    rows=None,
+                    args=[
+                        CaseLiteral(value=8, type="i64"),
+                        CaseLiteral(value=2, type="i64"),
+                    ],
+                    result=CaseLiteral(value=64, type="i64"),
+                    comment="",
+                )
+            ],
+        )
+
+    monkeypatch.setattr(convert_testcases_to_yaml_format, "parse_one_file", parse_one_file)
+    output_file = output_dir / "arithmetic" / "power.yaml"
+
+    convert_testcases_to_yaml_format.convert_directory(input_dir, output_dir, incremental=True)
+    assert len(parsed) == 1
+    assert "function: power" in output_file.read_text()
+
+    # Nothing changed, nothing is converted
+    convert_testcases_to_yaml_format.convert_directory(input_dir, output_dir, incremental=True)
+    assert len(parsed) == 1
+
+    # A changed source or a modified output is converted again
+    input_file.write_text("8 ^ 3")
+    convert_testcases_to_yaml_format.convert_directory(input_dir, output_dir, incremental=True)
+    assert len(parsed) == 2
+    output_file.write_text("")
+    convert_testcases_to_yaml_format.convert_directory(input_dir, output_dir, incremental=True)
+    assert len(parsed) == 3
+
+    # Outputs of deleted sources are removed
+    input_file.unlink()
+    convert_testcases_to_yaml_format.convert_directory(input_dir, output_dir, incremental=True)
+    assert not output_file.exists()
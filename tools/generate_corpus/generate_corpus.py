@@ -0,0 +1,534 @@
+import argparse
+import random
+from decimal import Decimal
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple
+
+import yaml
+
+try:
+    from yaml import CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeDumper
+
+EXTENSIONS_URI = "https://github.com/substrait-io/substrait/blob/main/extensions/"
+
+SCALAR_CATEGORIES = ["arithmetic", "comparison", "string", "datetime"]
+AGGREGATE_CATEGORIES = ["aggregate_generic", "arithmetic"]
+
+# Case type -> type used in dialect kernels
+SHORT_TYPES = {
+    "i8": "i8",
+    "i16": "i16",
+    "i32": "i32",
+    "i64": "i64",
+    "fp32": "fp32",
+    "fp64": "fp64",
+    "boolean": "bool",
+    "string": "str",
+    "date": "date",
+    "timestamp": "ts",
+    "decimal<38, 2>": "dec",
+}
+DECIMAL_TYPE = "decimal<38, 2>"
+
+OPTIONS = {
+    "overflow": ["SILENT", "SATURATE", "ERROR"],
+    "rounding": ["TIE_TO_EVEN", "TIE_AWAY_FROM_ZERO", "TRUNCATE"],
+    "on_domain_error": ["NAN", "NULL", "ERROR"],
+}
+
+FLOAT_SPECIALS = ["inf", "-inf", "nan"]
+
+# Dialects of engines that can evaluate the functions of an evaluable corpus
+EVALUABLE_DIALECTS = ["sqlite", "duckdb", "datafusion"]
+
+
+class Template(NamedTuple):
+    """A real engine function that the functions of an evaluable corpus copy"""
+
+    name: str
+    category: str
+    arg_types: List[str]
+    return_type: str
+    local_name: str
+    infix: bool
+    aggregate: bool
+    make_args: Callable[[random.Random], List]
+    evaluate: Callable
+
+
+def random_int(rng: random.Random) -> int:
+    return rng.randint(-1000, 1000)
+
+
+def random_string(rng: random.Random) -> str:
+    return "".join(rng.choice("abcXYZ ") for _ in range(rng.randint(0, 8)))
+
+
+TEMPLATES = [
+    Template(
+        "add",
+        "arithmetic",
+        ["i32", "i32"],
+        "i32",
+        "+",
+        True,
+        False,
+        lambda rng: [random_int(rng), random_int(rng)],
+        lambda x, y: x + y,
+    ),
+    Template(
+        "abs",
+        "arithmetic",
+        ["i32"],
+        "i32",
+        "abs",
+        False,
+        False,
+        lambda rng: [random_int(rng)],
+        abs,
+    ),
+    Template(
+        "sum",
+        "arithmetic",
+        ["i64"],
+        "i64",
+        "sum",
+        False,
+        True,
+        lambda rng: [[random_int(rng) for _ in range(rng.randint(1, 5))]],
+        sum,
+    ),
+    Template(
+        "lower",
+        "string",
+        ["string"],
+        "string",
+        "lower",
+        False,
+        False,
+        lambda rng: [random_string(rng)],
+        str.lower,
+    ),
+]
+
+
+class CorpusSpec(NamedTuple):
+    """Sizes and distributions of a generated corpus, fractions are probabilities"""
+
+    functions: int = 100
+    groups_per_function: int = 3
+    cases_per_group: int = 5
+    dialects: int = 3
+    # Largest number of rows in the columns of an aggregate case
+    max_rows: int = 5
+    aggregate_fraction: float = 0.2
+    decimal_fraction: float = 0.1
+    option_fraction: float = 0.3
+    null_fraction: float = 0.1
+    # Of fp values, how many are inf/-inf/nan.  Of results, how many are error/undefined
+    special_fraction: float = 0.05
+    # Chance a dialect has a function, and then each of its kernels
+    kernel_coverage: float = 0.8
+    seed: int = 0
+    # Copies the TEMPLATES functions, in turn, with correct results instead.  The
+    # dialects, of EVALUABLE_DIALECTS, then support every function and kernel so
+    # that every case runs and passes.  The fractions above don't apply.
+    evaluable: bool = False
+
+
+class DecimalList(list):
+    """A column of decimal values, written with the !decimallist tag"""
+
+
+class Function(NamedTuple):
+    name: str
+    category: str
+    aggregate: bool
+    kernels: List[List[str]]
+    options: Dict[str, List[str]]
+    # The function copied, for evaluable corpora
+    template: Template = None
+
+
+class Corpus(NamedTuple):
+    """The files written by CorpusGenerator.write"""
+
+    index_path: Path
+    extension_paths: List[Path]
+    case_paths: List[Path]
+    dialects_dir: Path
+    dialects: List[str]
+    supplements_dir: Path
+    num_functions: int
+    num_cases: int
+
+
+class CorpusDumper(SafeDumper):
+    pass
+
+
+def represent_decimal(dumper: CorpusDumper, value: Decimal):
+    return dumper.represent_scalar("!decimal", str(value))
+
+
+def represent_decimal_list(dumper: CorpusDumper, values: DecimalList):
+    items = [
+        dumper.represent_none(None)
+        if value is None
+        else dumper.represent_scalar("tag:yaml.org,2002:float", str(value))
+        for value in values
+    ]
+    return yaml.SequenceNode("!decimallist", items, flow_style=True)
+
+
+CorpusDumper.add_representer(Decimal, represent_decimal)
+CorpusDumper.add_representer(DecimalList, represent_decimal_list)
+
+
+def write_yaml(path: Path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        yaml.dump(data, f, Dumper=CorpusDumper, sort_keys=False, allow_unicode=True)
+
+
+def extension_file_name(category: str) -> str:
+    # Named like the substrait files so the site derives the same categories
+    return f"functions_{category}.yaml"
+
+
+def extension_uri(category: str) -> str:
+    return EXTENSIONS_URI + extension_file_name(category)
+
+
+def extension_function(func: Function):
+    impls = []
+    for kernel in func.kernels:
+        impl = {
+            "args": [
+                {"name": f"arg{arg_idx}", "value": arg_type}
+                for arg_idx, arg_type in enumerate(kernel)
+            ],
+        }
+        if func.options:
+            impl["options"] = {
+                name: {"values": values} for name, values in func.options.items()
+            }
+        impl["return"] = func.template.return_type if func.template else kernel[0]
+        impls.append(impl)
+    return {
+        "name": func.name,
+        "description": f"Generated function {func.name}",
+        "impls": impls,
+    }
+
+
+def supplement_doc(name: str) -> str:
+    return f"# {name}\n\n## Details\n\n### Generated\n\nGenerated function.\n"
+
+
+class CorpusGenerator(object):
+    """
+    Generates case and dialect YAML files from a CorpusSpec
+
+    All randomness comes from one generator seeded with spec.seed, so the same
+    spec always produces the same files.
+    """
+
+    def __init__(self, spec: CorpusSpec):
+        self.spec = spec
+        self.rng = random.Random(spec.seed)
+
+    def __chance(self, fraction: float) -> bool:
+        return self.rng.random() < fraction
+
+    def __arg_type(self) -> str:
+        if self.__chance(self.spec.decimal_fraction):
+            return DECIMAL_TYPE
+        return self.rng.choice([t for t in SHORT_TYPES if t != DECIMAL_TYPE])
+
+    def __function(self, idx: int) -> Function:
+        if self.spec.evaluable:
+            template = TEMPLATES[idx % len(TEMPLATES)]
+            return Function(
+                f"fn_{idx:05d}",
+                template.category,
+                template.aggregate,
+                [template.arg_types],
+                {},
+                template,
+            )
+        aggregate = self.__chance(self.spec.aggregate_fraction)
+        if aggregate:
+            category = self.rng.choice(AGGREGATE_CATEGORIES)
+            num_args = 1
+        else:
+            category = self.rng.choice(SCALAR_CATEGORIES)
+            num_args = self.rng.randint(1, 3)
+        kernels = []
+        for _ in range(self.rng.randint(1, 3)):
+            kernel = [self.__arg_type()] * num_args
+            if kernel not in kernels:
+                kernels.append(kernel)
+        options = {}
+        if self.__chance(self.spec.option_fraction):
+            for name in self.rng.sample(sorted(OPTIONS), self.rng.randint(1, 2)):
+                options[name] = OPTIONS[name]
+        return Function(f"fn_{idx:05d}", category, aggregate, kernels, options)
+
+    def functions(self) -> List[Function]:
+        return [self.__function(idx) for idx in range(self.spec.functions)]
+
+    def __value(self, arg_type: str, in_column: bool = False):
+        if self.__chance(self.spec.null_fraction):
+            return None
+        rng = self.rng
+        if arg_type.startswith("i"):
+            bits = int(arg_type[1:])
+            return rng.randint(-(2 ** (bits - 1)), 2 ** (bits - 1) - 1)
+        elif arg_type.startswith("fp"):
+            if self.__chance(self.spec.special_fraction):
+                special = rng.choice(FLOAT_SPECIALS)
+                # Special values in a column are quoted, see CaseFileParser
+                return f"'{special}'" if in_column else special
+            return round(rng.uniform(-1e6, 1e6), 3)
+        elif arg_type == "boolean":
+            return rng.random() < 0.5
+        elif arg_type == "string":
+            return "".join(rng.choice("abcdefXYZ _") for _ in range(rng.randint(0, 12)))
+        elif arg_type == "date":
+            return f"{rng.randint(1970, 2100)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        elif arg_type == "timestamp":
+            return (
+                f"{rng.randint(1970, 2100)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} "
+                f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}"
+            )
+        elif arg_type == DECIMAL_TYPE:
+            return Decimal(rng.randint(-(10**8), 10**8)).scaleb(-2)
+        raise Exception(f"Unexpected type {arg_type}")
+
+    def __column(self, arg_type: str):
+        values = [
+            self.__value(arg_type, in_column=True)
+            for _ in range(self.rng.randint(0, self.spec.max_rows))
+        ]
+        if arg_type == DECIMAL_TYPE:
+            return DecimalList(values)
+        return values
+
+    def __result(self, result_type: str):
+        if self.__chance(self.spec.special_fraction):
+            if result_type.startswith("fp") and self.__chance(0.5):
+                return {"special": "nan"}
+            return {"special": self.rng.choice(["error", "undefined"])}
+        return {"value": self.__value(result_type), "type": result_type}
+
+    def __evaluable_case(self, template: Template, group):
+        values = template.make_args(self.rng)
+        return {
+            "group": group,
+            "args": [
+                {"value": value, "type": arg_type}
+                for value, arg_type in zip(values, template.arg_types)
+            ],
+            "result": {"value": template.evaluate(*values), "type": template.return_type},
+        }
+
+    def __case(self, func: Function, kernel: List[str], group):
+        if func.template is not None:
+            return self.__evaluable_case(func.template, group)
+        if func.aggregate:
+            args = [{"value": self.__column(arg_type), "type": arg_type} for arg_type in kernel]
+        else:
+            args = [{"value": self.__value(arg_type), "type": arg_type} for arg_type in kernel]
+        case = {"group": group, "args": args}
+        if func.options:
+            case["options"] = {
+                name: self.rng.choice(values) for name, values in func.options.items()
+            }
+        case["result"] = self.__result(kernel[0])
+        return case
+
+    def case_file(self, func: Function):
+        cases = []
+        for group_idx in range(self.spec.groups_per_function):
+            group_id = f"group_{group_idx}"
+            kernel = self.rng.choice(func.kernels)
+            for case_idx in range(self.spec.cases_per_group):
+                if case_idx == 0:
+                    group = {"id": group_id, "description": f"Generated group {group_idx}"}
+                else:
+                    group = group_id
+                cases.append(self.__case(func, kernel, group))
+        return {
+            "base_uri": extension_uri(func.category),
+            "function": func.name,
+            "cases": cases,
+        }
+
+    def __evaluable_dialect_function(self, func: Function):
+        template = func.template
+        dfunc = {"name": f"{func.category}.{func.name}", "local_name": template.local_name}
+        if template.aggregate:
+            dfunc["aggregate"] = True
+        elif template.infix:
+            dfunc["infix"] = True
+        dfunc["supported_kernels"] = [
+            "_".join(SHORT_TYPES[arg_type] for arg_type in template.arg_types)
+        ]
+        return dfunc
+
+    def __dialect_function(self, func: Function):
+        if func.template is not None:
+            return self.__evaluable_dialect_function(func)
+        kernels = [
+            "_".join(SHORT_TYPES[arg_type] for arg_type in kernel)
+            for kernel in func.kernels
+            if self.__chance(self.spec.kernel_coverage)
+        ]
+        if self.__chance(self.spec.special_fraction):
+            # A generic kernel, matched against the dialect's supported types
+            kernels.append("_".join(["any1"] * len(func.kernels[0])))
+        dfunc = {"name": f"{func.category}.{func.name}", "local_name": func.name}
+        if func.aggregate:
+            dfunc["aggregate"] = True
+        elif len(func.kernels[0]) == 2 and self.__chance(0.5):
+            dfunc["infix"] = True
+        required_options = {
+            name: self.rng.choice(values)
+            for name, values in func.options.items()
+            if self.__chance(0.5)
+        }
+        if required_options:
+            dfunc["required_options"] = required_options
+        dfunc["supported_kernels"] = kernels
+        return dfunc
+
+    def dialect_file(self, name: str, functions: List[Function]):
+        scalar_functions = []
+        aggregate_functions = []
+        for func in functions:
+            if not self.spec.evaluable and not self.__chance(self.spec.kernel_coverage):
+                continue
+            if func.aggregate:
+                aggregate_functions.append(self.__dialect_function(func))
+            else:
+                scalar_functions.append(self.__dialect_function(func))
+        categories = sorted(set(SCALAR_CATEGORIES + AGGREGATE_CATEGORIES))
+        return {
+            "name": name,
+            "type": "sql",
+            "dependencies": {category: extension_uri(category) for category in categories},
+            "supported_types": {
+                short_type: {"sql_type_name": short_type}
+                for short_type in SHORT_TYPES.values()
+            },
+            "scalar_functions": scalar_functions,
+            "aggregate_functions": aggregate_functions,
+        }
+
+    def dialect_names(self) -> List[str]:
+        if self.spec.evaluable:
+            return EVALUABLE_DIALECTS[: self.spec.dialects]
+        return [f"dialect_{idx}" for idx in range(self.spec.dialects)]
+
+    def write(self, dest_dir: str | Path) -> Corpus:
+        """
+        Writes a corpus in the layout of the real tree under dest_dir: extensions/,
+        cases/<category>/, dialects/, supplemental/ and an index.yaml pointing at them
+        """
+        dest_dir = Path(dest_dir)
+        functions = self.functions()
+        case_paths = []
+        for func in functions:
+            path = dest_dir / "cases" / func.category / f"{func.name}.yaml"
+            write_yaml(path, self.case_file(func))
+            case_paths.append(path)
+        dialects = self.dialect_names()
+        for name in dialects:
+            write_yaml(
+                dest_dir / "dialects" / f"{name}.yaml", self.dialect_file(name, functions)
+            )
+
+        extension_paths = []
+        for category in sorted(set(func.category for func in functions)):
+            scalar_functions = []
+            aggregate_functions = []
+            for func in functions:
+                if func.category != category:
+                    continue
+                if func.aggregate:
+                    aggregate_functions.append(extension_function(func))
+                else:
+                    scalar_functions.append(extension_function(func))
+            path = dest_dir / "extensions" / extension_file_name(category)
+            write_yaml(
+                path,
+                {
+                    "scalar_functions": scalar_functions,
+                    "aggregate_functions": aggregate_functions,
+                },
+            )
+            extension_paths.append(path)
+
+        supplements_dir = dest_dir / "supplemental"
+        supplements_dir.mkdir(parents=True, exist_ok=True)
+        for func in functions:
+            with open(supplements_dir / f"{func.name}.md", "w") as f:
+                f.write(supplement_doc(func.name))
+
+        index_path = dest_dir / "index.yaml"
+        write_yaml(
+            index_path,
+            {
+                "substrait": {
+                    "extensions": [
+                        {
+                            "location": f"./extensions/{path.name}",
+                            "canonical": EXTENSIONS_URI + path.name,
+                        }
+                        for path in extension_paths
+                    ]
+                },
+                "cases": ["./cases"],
+                "dialects": ["./dialects"],
+                "supplements": ["./supplemental"],
+            },
+        )
+
+        return Corpus(
+            index_path,
+            extension_paths,
+            case_paths,
+            dest_dir / "dialects",
+            dialects,
+            supplements_dir,
+            len(functions),
+            len(functions) * self.spec.groups_per_function * self.spec.cases_per_group,
+        )
+
+
+def generate_corpus(dest_dir: str | Path, spec: CorpusSpec = CorpusSpec()) -> Corpus:
+    return CorpusGenerator(spec).write(dest_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generates a synthetic corpus of case and dialect files"
+    )
+    parser.add_argument("dest_dir", help="Directory to write cases/ and dialects/ to")
+    for field, default in CorpusSpec._field_defaults.items():
+        if isinstance(default, bool):
+            parser.add_argument(f"--{field.replace('_', '-')}", action="store_true")
+        else:
+            parser.add_argument(
+                f"--{field.replace('_', '-')}", type=type(default), default=default
+            )
+    args = parser.parse_args()
+    spec = CorpusSpec(**{field: getattr(args, field) for field in CorpusSpec._fields})
+    generate_corpus(args.dest_dir, spec)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import math
+from decimal import Decimal
+from pathlib import Path
+
+from bft.cases.loader import load_cases
+from bft.core.index_parser import load_index
+from bft.dialects.loader import load_dialects
+from tools.generate_corpus.generate_corpus import CorpusSpec, generate_corpus
+
+SPEC = CorpusSpec(
+    functions=40,
+    groups_per_function=2,
+    cases_per_group=3,
+    dialects=2,
+    aggregate_fraction=0.5,
+    decimal_fraction=0.5,
+    special_fraction=0.2,
+    seed=7,
+)
+
+
+def read_tree(root: Path):
+    return {
+        path.relative_to(root): path.read_bytes()
+        for path in sorted(root.rglob("*.yaml"))
+    }
+
+
+def test_generated_files_load(tmp_path):
+    corpus = generate_corpus(tmp_path, SPEC)
+    assert len(corpus.case_paths) == corpus.num_functions == 40
+    load_index(corpus.index_path)
+
+    cases = load_cases(tmp_path / "cases", use_cache=False)
+    assert len(cases) == 40 * 2 * 3
+    dialects = load_dialects(tmp_path / "dialects")
+    assert sorted(dialects.dialects) == ["dialect_0", "dialect_1"]
+    mappings = [
+        dialect.mapping_for_case(case)
+        for dialect in dialects.dialects.values()
+        for case in cases
+        if dialect.supports_function(case)
+    ]
+    assert any(mapping.should_pass for mapping in mappings)
+    assert any(not mapping.should_pass for mapping in mappings)
+
+    values = [arg.value for case in cases for arg in case.args]
+    scalars = [value for value in values if not isinstance(value, list)]
+    columns = [value for value in values if isinstance(value, list)]
+    assert any(isinstance(value, Decimal) for value in scalars)
+    assert any(isinstance(value, Decimal) for column in columns for value in column)
+    assert any(
+        isinstance(value, float) and math.isinf(value)
+        for column in columns
+        for value in column
+    )
+    assert {"error", "undefined"} <= {
+        case.result for case in cases if isinstance(case.result, str)
+    }
+
+
+def test_same_seed_same_files(tmp_path):
+    generate_corpus(tmp_path / "a", SPEC)
+    generate_corpus(tmp_path / "b", SPEC)
+    generate_corpus(tmp_path / "c", SPEC._replace(seed=8))
+    assert read_tree(tmp_path / "a") == read_tree(tmp_path / "b")
+    assert read_tree(tmp_path / "a") != read_tree(tmp_path / "c")